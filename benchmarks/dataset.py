@@ -0,0 +1,247 @@
+# benchmarks/dataset.py
+# تولید داده مصنوعی قابل تکرار (seeded) برای بنچمارک‌ها: کاربران، گراف فالو
+# با توزیع توانی (power-law)، توییت‌ها با هشتگ/mention/رسانه، لایک‌ها و تایم‌لاین
+#
+# اجرا:  python -m benchmarks.dataset --database-url sqlite:///./bench.db --reset [--users 1000] [--seed 42]
+#        (پیش‌فرض آدرس همان SQLALCHEMY_DATABASE_URL تنظیمات، یعنی PostgreSQL محلی)
+#
+# محبوبیت کاربر i با وزن 1/(i+1)^alpha تعیین می‌شود: هم تعداد دنبال‌کنندگان و هم
+# لایک‌های توییت‌هایش از همین وزن پیروی می‌کنند. همه کاربران رمز عبور یکسان
+# DEFAULT_PASSWORD دارند (فقط یک بار هش می‌شود) و API Key قابل پیش‌بینی.
+# شمارنده‌ها (followers_count، following_count، like_count)، جداول هشتگ/mention و
+# تایم‌لاین مادی‌شده همانند مسیر عادی نوشتن پر می‌شوند؛ ایندکس متنی (FTS5 یا
+# tsvector) توسط خود پایگاه داده به‌روز می‌شود.
+
+import argparse
+import hashlib
+import random
+from bisect import bisect_left
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from itertools import accumulate
+from typing import Dict, List, Sequence
+
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.engine import Engine
+
+from src.core.config import settings
+from src.core.storage import shard_key
+from src.db import models
+from src.db.base import Base
+from src.db.hashtags import extract_hashtags, extract_mentions
+from src.utils import get_password_hash
+
+DEFAULT_PASSWORD = "benchmark-password"
+EMAIL_DOMAIN = "bench.example.com"
+# زمان ثابت تا داده (و cursorها) در هر اجرا یکسان باشد
+EPOCH = datetime(2025, 1, 1)
+CHUNK_SIZE = 5000
+
+WORDS = (
+    "fast api python cache feed timeline query index latency tweet media like follow "
+    "graph cursor batch async pool search trend metric profile replica bench load"
+).split()
+
+
+@dataclass
+class DatasetConfig:
+    users: int = 1000
+    avg_following: int = 20
+    avg_tweets: int = 5
+    avg_likes: int = 4
+    media_ratio: float = 0.2
+    hashtags: int = 50
+    alpha: float = 1.1  # شیب توزیع توانی محبوبیت
+    days: int = 30
+    seed: int = 42
+
+
+def api_key_for(index: int, seed: int) -> str:
+    return f"bench-{seed}-{index:07d}"
+
+
+def email_for(index: int) -> str:
+    return f"user{index}@{EMAIL_DOMAIN}"
+
+
+def _cumulative(weights: Sequence[float]) -> List[float]:
+    return list(accumulate(weights))
+
+
+def _sample(rng: random.Random, cum_weights: List[float], k: int) -> List[int]:
+    """k اندیس (با تکرار) متناسب با وزن‌ها؛ O(k log n)"""
+    total = cum_weights[-1]
+    return [bisect_left(cum_weights, rng.random() * total) for _ in range(k)]
+
+
+def _content(rng: random.Random, tag_cum: List[float], users: int) -> str:
+    words = rng.choices(WORDS, k=rng.randint(4, 14))
+    if rng.random() < 0.4:
+        words.append(f"#tag{_sample(rng, tag_cum, 1)[0]}")
+    if rng.random() < 0.15:
+        words.append(f"@user{rng.randrange(users)}")
+    return " ".join(words)
+
+
+def _insert(conn, table, rows: List[dict]) -> None:
+    for start in range(0, len(rows), CHUNK_SIZE):
+        conn.execute(insert(table), rows[start:start + CHUNK_SIZE])
+
+
+def generate(engine: Engine, config: DatasetConfig, reset: bool = False) -> Dict[str, int]:
+    """ساخت کامل مجموعه داده در پایگاه داده engine؛ تعداد سطرهای هر جدول را برمی‌گرداند"""
+    if reset:
+        Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    rng = random.Random(config.seed)
+    n = config.users
+    popularity = _cumulative([1.0 / (i + 1) ** config.alpha for i in range(n)])
+    tag_popularity = _cumulative([1.0 / (i + 1) ** config.alpha for i in range(config.hashtags)])
+
+    with engine.begin() as conn:
+        if conn.execute(select(models.User.id).limit(1)).first() is not None:
+            raise SystemExit("database is not empty; use --reset")
+
+        # 1. گراف فالو: درجه خروجی نمایی، مقصدها بر اساس محبوبیت
+        following: List[set] = []
+        for i in range(n):
+            degree = min(n - 1, int(rng.expovariate(1.0 / config.avg_following)))
+            targets = {t for t in _sample(rng, popularity, degree) if t != i}
+            following.append(targets)
+        followers_count = [0] * n
+        for targets in following:
+            for t in targets:
+                followers_count[t] += 1
+
+        # 2. کاربران (id = اندیس + 1)
+        hashed_password = get_password_hash(DEFAULT_PASSWORD)
+        fanout_on_read = [c > settings.TIMELINE_FANOUT_MAX_FOLLOWERS for c in followers_count]
+        _insert(conn, models.User.__table__, [
+            {
+                "id": i + 1,
+                "name": f"user{i}",
+                "email": email_for(i),
+                "hashed_password": hashed_password,
+                "api_key": api_key_for(i, config.seed),
+                "is_active": True,
+                "is_superuser": False,
+                "fanout_on_read": fanout_on_read[i],
+                "followers_count": followers_count[i],
+                "following_count": len(following[i]),
+            }
+            for i in range(n)
+        ])
+        follow_time = EPOCH - timedelta(days=config.days + 1)
+        _insert(conn, models.follows_table, [
+            {"follower_id": i + 1, "followed_id": t + 1, "created_at": follow_time}
+            for i, targets in enumerate(following) for t in sorted(targets)
+        ])
+
+        # 3. توییت‌ها به ترتیب زمانی (id صعودی با created_at)
+        span = config.days * 86400
+        drafts = []
+        for i in range(n):
+            for _ in range(int(rng.expovariate(1.0 / config.avg_tweets))):
+                drafts.append((rng.randrange(span), i, _content(rng, tag_popularity, n)))
+        drafts.sort()
+        tweets, hashtag_rows, mention_rows = [], [], []
+        for tweet_id, (offset, author, content) in enumerate(drafts, start=1):
+            created_at = EPOCH - timedelta(seconds=span - offset)
+            tweets.append({
+                "id": tweet_id, "content": content, "author_id": author + 1,
+                "created_at": created_at, "like_count": 0,
+            })
+            hashtag_rows += [
+                {"tweet_id": tweet_id, "tag": tag, "created_at": created_at}
+                for tag in extract_hashtags(content)
+            ]
+            mention_rows += [{"tweet_id": tweet_id, "name": name} for name in extract_mentions(content)]
+
+        # 4. رسانه (فقط متادیتا؛ فایل‌ها در media storage نوشته نمی‌شوند)
+        media_rows, tweet_media_rows = [], []
+        for tweet in tweets:
+            if rng.random() < config.media_ratio:
+                media_id = len(media_rows) + 1
+                sha = hashlib.sha256(f"{config.seed}:{media_id}".encode()).hexdigest()
+                media_rows.append({
+                    "id": media_id, "file_path": shard_key(sha), "file_type": "image/jpeg",
+                    "sha256": sha, "size": rng.randint(20_000, 400_000), "ref_count": 1,
+                })
+                tweet_media_rows.append({"tweet_id": tweet["id"], "media_id": media_id})
+
+        # 5. لایک‌ها: توییت‌های کاربران محبوب لایک بیشتری می‌گیرند
+        likes = set()
+        if tweets:
+            weight = [popularity[0]] + [b - a for a, b in zip(popularity, popularity[1:])]
+            tweet_cum = _cumulative([weight[t["author_id"] - 1] for t in tweets])
+            for index in _sample(rng, tweet_cum, len(tweets) * config.avg_likes):
+                likes.add((rng.randrange(n) + 1, tweets[index]["id"]))
+        like_count: Dict[int, int] = {}
+        for _, tweet_id in likes:
+            like_count[tweet_id] = like_count.get(tweet_id, 0) + 1
+        for tweet in tweets:
+            tweet["like_count"] = like_count.get(tweet["id"], 0)
+
+        # 6. تایم‌لاین مادی‌شده (fan-out-on-write، مثل timeline.fan_out_tweet)
+        followers: List[List[int]] = [[] for _ in range(n)]
+        for i, targets in enumerate(following):
+            for t in targets:
+                followers[t].append(i)
+        timeline_rows = []
+        for tweet in tweets:
+            author = tweet["author_id"] - 1
+            readers = [author] if fanout_on_read[author] else [author] + followers[author]
+            timeline_rows += [
+                {"user_id": u + 1, "tweet_id": tweet["id"], "author_id": author + 1,
+                 "created_at": tweet["created_at"]}
+                for u in readers
+            ]
+
+        _insert(conn, models.Tweet.__table__, tweets)
+        _insert(conn, models.TweetHashtag.__table__, hashtag_rows)
+        _insert(conn, models.TweetMention.__table__, mention_rows)
+        _insert(conn, models.Media.__table__, media_rows)
+        _insert(conn, models.tweet_media_table, tweet_media_rows)
+        _insert(conn, models.likes_table, [
+            {"user_id": user_id, "tweet_id": tweet_id} for user_id, tweet_id in sorted(likes)
+        ])
+        _insert(conn, models.TimelineEntry.__table__, timeline_rows)
+
+        if engine.dialect.name == "postgresql":
+            # idها صریح درج شده‌اند؛ sequenceها باید از بیشترین id ادامه دهند
+            for table in ("user", "tweet", "media"):
+                conn.exec_driver_sql(
+                    f"SELECT setval(pg_get_serial_sequence('\"{table}\"', 'id'), "
+                    f"COALESCE((SELECT MAX(id) FROM \"{table}\"), 0) + 1, false)"
+                )
+
+    return {
+        "users": n,
+        "follows": sum(len(t) for t in following),
+        "tweets": len(tweets),
+        "hashtags": len(hashtag_rows),
+        "mentions": len(mention_rows),
+        "media": len(media_rows),
+        "likes": len(likes),
+        "timeline": len(timeline_rows),
+    }
+
+
+def main(argv=None) -> None:
+    defaults = DatasetConfig()
+    parser = argparse.ArgumentParser(description="Generate a synthetic social-graph dataset")
+    parser.add_argument("--database-url", default=settings.SQLALCHEMY_DATABASE_URL)
+    parser.add_argument("--reset", action="store_true", help="drop and recreate all tables first")
+    for name, value in asdict(defaults).items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=type(value), default=value)
+    args = vars(parser.parse_args(argv))
+
+    engine = create_engine(args.pop("database_url"))
+    reset = args.pop("reset")
+    counts = generate(engine, DatasetConfig(**args), reset=reset)
+    print(" ".join(f"{name}={count}" for name, count in counts.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+# benchmarks/load.py
+# سناریوهای بار روی API و گزارش p50/p95/p99 و درخواست در ثانیه برای هر endpoint
+#
+# اجرا (درون پردازه، روی داده ساخته شده با benchmarks.dataset):
+#   python -m benchmarks.load --database-url sqlite:///./bench.db --scenario mixed --duration 10
+# روی سرور در حال اجرا (داده همان پایگاه داده سرور):
+#   python -m benchmarks.load --base-url http://localhost:8000 --scenario feed --concurrency 32
+# ذخیره و مقایسه بین commitها:
+#   python -m benchmarks.load ... --output before.json
+#   python -m benchmarks.load ... --compare before.json
+#
+# سناریوها: feed، home، like_storm، follow_churn، upload، login، search و mixed (ترکیب وزن‌دار).
+# هر worker با random.Random(seed + شماره worker) کار می‌کند تا ترتیب عملیات قابل تکرار باشد.
+
+import argparse
+import asyncio
+import os
+import random
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import httpx
+from sqlalchemy import create_engine, desc, select
+from sqlalchemy.orm import sessionmaker
+
+from src.core.config import settings
+from src.db import models
+
+from . import report
+from .dataset import DEFAULT_PASSWORD, WORDS
+
+
+@dataclass
+class Account:
+    id: int
+    email: str
+    api_key: str
+
+
+class Context:
+    """وضعیت مشترک workerها: client، حساب‌ها (محبوب‌ترین اول) و ثبت زمان‌ها"""
+
+    def __init__(self, client: httpx.AsyncClient, accounts: List[Account], hot_tweets: List[int],
+                 recorder: report.Recorder, prefix: str = ""):
+        self.client = client
+        self.accounts = accounts
+        self.hot_tweets = hot_tweets
+        self.recorder = recorder
+        self.prefix = prefix
+
+    async def call(self, endpoint: str, method: str, path: str, **kwargs) -> httpx.Response:
+        """یک درخواست؛ endpoint برچسب گزارش است (الگوی route، نه مسیر واقعی)"""
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, self.prefix + path, **kwargs)
+        except httpx.HTTPError:
+            self.recorder.record(endpoint, time.perf_counter() - start, ok=False)
+            raise
+        self.recorder.record(endpoint, time.perf_counter() - start, ok=response.status_code < 400)
+        return response
+
+
+def _auth(account: Account) -> dict:
+    return {"Api-Key": account.api_key}
+
+
+def _popular(ctx: Context, rng: random.Random) -> Account:
+    # یک درصد اول حساب‌ها (id کوچک‌تر = محبوب‌تر در dataset)
+    return ctx.accounts[rng.randrange(max(1, len(ctx.accounts) // 100))]
+
+
+async def feed(ctx: Context, rng: random.Random) -> None:
+    params = {"limit": 20}
+    for _ in range(rng.randint(1, 3)):
+        body = (await ctx.call("GET /tweets", "GET", "/tweets", params=params)).json()
+        if not body.get("next_cursor"):
+            break
+        params["cursor"] = body["next_cursor"]
+
+
+async def home(ctx: Context, rng: random.Random) -> None:
+    account = rng.choice(ctx.accounts)
+    await ctx.call("GET /tweets/home", "GET", "/tweets/home", params={"limit": 20}, headers=_auth(account))
+
+
+async def like_storm(ctx: Context, rng: random.Random) -> None:
+    # بسیاری از کاربران روی چند توییت داغ لایک/آنلایک می‌کنند (رقابت روی like_count)
+    tweet_id = rng.choice(ctx.hot_tweets[:5])
+    account = rng.choice(ctx.accounts)
+    path = f"/tweets/{tweet_id}/likes"
+    await ctx.call("POST /tweets/{tweet_id}/likes", "POST", path, headers=_auth(account))
+    if rng.random() < 0.5:
+        await ctx.call("DELETE /tweets/{tweet_id}/likes", "DELETE", path, headers=_auth(account))
+
+
+async def follow_churn(ctx: Context, rng: random.Random) -> None:
+    account = rng.choice(ctx.accounts)
+    target = _popular(ctx, rng)
+    if target.id == account.id:
+        return
+    path = f"/users/{target.id}/follow"
+    await ctx.call("POST /users/{user_id}/follow", "POST", path, headers=_auth(account))
+    if rng.random() < 0.5:
+        await ctx.call("DELETE /users/{user_id}/follow", "DELETE", path, headers=_auth(account))
+
+
+async def upload(ctx: Context, rng: random.Random) -> None:
+    # محتوای غیرتصویری تا زمان ساخت نسخه‌های کوچک‌شده در نتیجه وارد نشود
+    data = rng.randbytes(rng.randint(1024, 64 * 1024))
+    await ctx.call(
+        "POST /medias", "POST", "/medias",
+        files={"file": ("bench.bin", data, "application/octet-stream")},
+        headers=_auth(rng.choice(ctx.accounts)),
+    )
+
+
+async def login(ctx: Context, rng: random.Random) -> None:
+    account = rng.choice(ctx.accounts)
+    await ctx.call(
+        "POST /auth/access-token", "POST", "/auth/access-token",
+        data={"username": account.email, "password": DEFAULT_PASSWORD},
+    )
+
+
+async def search(ctx: Context, rng: random.Random) -> None:
+    q = " ".join(rng.sample(WORDS, rng.randint(1, 2)))
+    await ctx.call("GET /tweets/search", "GET", "/tweets/search", params={"q": q, "limit": 20})
+
+
+Scenario = Callable[[Context, random.Random], Awaitable[None]]
+
+SCENARIOS: Dict[str, Scenario] = {
+    "feed": feed,
+    "home": home,
+    "like_storm": like_storm,
+    "follow_churn": follow_churn,
+    "upload": upload,
+    "login": login,
+    "search": search,
+}
+
+# وزن هر سناریو در mixed (تقریباً نسبت خواندن به نوشتن در یک شبکه اجتماعی)
+MIXED_WEIGHTS = {
+    "feed": 40, "home": 25, "like_storm": 15, "follow_churn": 8, "search": 7, "upload": 3, "login": 2,
+}
+
+
+def load_accounts(database_url: str, hot: int = 20):
+    """حساب‌ها (به ترتیب id) و پرلایک‌ترین توییت‌ها از پایگاه داده بنچمارک"""
+    engine = create_engine(database_url)
+    with engine.connect() as conn:
+        accounts = [
+            Account(*row) for row in conn.execute(
+                select(models.User.id, models.User.email, models.User.api_key).order_by(models.User.id)
+            )
+        ]
+        hot_tweets = list(conn.execute(
+            select(models.Tweet.id).order_by(desc(models.Tweet.like_count), models.Tweet.id).limit(hot)
+        ).scalars())
+    engine.dispose()
+    if not accounts or not hot_tweets:
+        raise SystemExit("benchmark database is empty; run python -m benchmarks.dataset first")
+    return accounts, hot_tweets
+
+
+def in_process_client(database_url: str) -> httpx.AsyncClient:
+    """client روی خود app (ASGI، بدون شبکه) با get_db متصل به پایگاه داده بنچمارک"""
+    from src.db.session import get_db
+    from src.main import app
+
+    engine = create_engine(database_url, connect_args=(
+        {"check_same_thread": False} if database_url.startswith("sqlite") else {}
+    ))
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def get_benchmark_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = get_benchmark_db
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench")
+
+
+async def run(
+    client: httpx.AsyncClient, accounts: List[Account], hot_tweets: List[int], scenario: str,
+    concurrency: int, duration: float, max_operations: Optional[int] = None, seed: int = 1,
+    prefix: str = "",
+) -> dict:
+    """اجرای سناریو با concurrency worker همزمان تا پایان duration یا max_operations"""
+    recorder = report.Recorder()
+    ctx = Context(client, accounts, hot_tweets, recorder, prefix)
+    names = list(MIXED_WEIGHTS) if scenario == "mixed" else [scenario]
+    weights = [MIXED_WEIGHTS[name] for name in names] if scenario == "mixed" else None
+    remaining = [max_operations]
+    deadline = time.perf_counter() + duration
+
+    async def worker(index: int) -> None:
+        rng = random.Random(seed * 1000 + index)
+        while time.perf_counter() < deadline:
+            if remaining[0] is not None:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+            name = rng.choices(names, weights)[0] if weights else names[0]
+            try:
+                await SCENARIOS[name](ctx, rng)
+            except httpx.HTTPError:
+                pass  # در Recorder به عنوان خطا ثبت شده است
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    wall = time.perf_counter() - start
+    return {
+        "commit": report.git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "scenario": scenario,
+        "concurrency": concurrency,
+        "seed": seed,
+        "wall_seconds": wall,
+        "endpoints": recorder.summary(wall),
+    }
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Load-test scenarios with per-endpoint latency percentiles")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS) + ["mixed"], default="mixed")
+    parser.add_argument("--database-url", default=settings.SQLALCHEMY_DATABASE_URL)
+    parser.add_argument("--base-url", help="target a running server instead of the in-process app")
+    parser.add_argument("--prefix", default="", help="path prefix of the API routes, e.g. /api")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds")
+    parser.add_argument("--operations", type=int, help="stop after this many scenario operations")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--compare", help="JSON results of a previous run to diff against")
+    args = parser.parse_args(argv)
+
+    accounts, hot_tweets = load_accounts(args.database_url)
+    if args.base_url:
+        client = httpx.AsyncClient(base_url=args.base_url, timeout=30.0)
+    else:
+        client = in_process_client(args.database_url)
+
+    async def _main():
+        async with client:
+            return await run(
+                client, accounts, hot_tweets, args.scenario, args.concurrency, args.duration,
+                args.operations, args.seed, args.prefix,
+            )
+
+    result = asyncio.run(_main())
+    result["target"] = args.base_url or "in-process"
+    result["cpu_count"] = os.cpu_count()
+
+    baseline = report.load(args.compare)["endpoints"] if args.compare else None
+    print(f"scenario={result['scenario']} concurrency={result['concurrency']} "
+          f"wall={result['wall_seconds']:.1f}s commit={result['commit']}")
+    print(report.format_table(result["endpoints"], baseline))
+    if args.output:
+        report.save(args.output, result)
+
+
+if __name__ == "__main__":
+    main()
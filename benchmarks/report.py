@@ -0,0 +1,98 @@
+# benchmarks/report.py
+# خلاصه نتایج بار: p50/p95/p99 و درخواست در ثانیه برای هر endpoint،
+# ذخیره به JSON و مقایسه با نتیجه یک commit دیگر
+
+import json
+import math
+import subprocess
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """صدک به روش nearest-rank روی لیست مرتب"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class Recorder:
+    """جمع‌آوری زمان هر درخواست بر اساس endpoint (مثلاً "GET /tweets/{tweet_id}/likes")"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    def record(self, endpoint: str, seconds: float, ok: bool) -> None:
+        self.latencies[endpoint].append(seconds)
+        if not ok:
+            self.errors[endpoint] += 1
+
+    def summary(self, wall_seconds: float, total: bool = True) -> Dict[str, dict]:
+        """آمار هر endpoint؛ total=False ردیف TOTAL (همه نمونه‌ها با هم) را حذف می‌کند"""
+        endpoints = {}
+        everything: List[float] = []
+        for endpoint, values in sorted(self.latencies.items()):
+            everything += values
+            endpoints[endpoint] = _stats(values, self.errors[endpoint], wall_seconds)
+        if total:
+            endpoints["TOTAL"] = _stats(everything, sum(self.errors.values()), wall_seconds)
+        return endpoints
+
+
+def _stats(values: List[float], errors: int, wall_seconds: float) -> dict:
+    ordered = sorted(values)
+    stats = {
+        "count": len(ordered),
+        "errors": errors,
+        "rps": len(ordered) / wall_seconds if wall_seconds else 0.0,
+    }
+    for p in PERCENTILES:
+        stats[f"p{p}_ms"] = percentile(ordered, p) * 1000
+    return stats
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def format_table(endpoints: Dict[str, dict], baseline: Optional[Dict[str, dict]] = None) -> str:
+    """جدول متنی؛ با baseline درصد تغییر rps و صدک‌ها هم نمایش داده می‌شود"""
+    # (ستون، عرض، تعداد رقم اعشار)
+    columns: List[Tuple[str, int, int]] = [("count", 7, 0), ("errors", 6, 0), ("rps", 9, 1)]
+    columns += [(f"p{p}_ms", 9, 2) for p in PERCENTILES]
+    compared = ["rps"] + [f"p{p}_ms" for p in PERCENTILES]
+    width = max([len(e) for e in endpoints] + [8])
+
+    header = f"{'endpoint':<{width}}" + "".join(f" {name:>{w}}" for name, w, _ in columns)
+    lines = [header, "-" * len(header)]
+    for endpoint, stats in endpoints.items():
+        line = f"{endpoint:<{width}}" + "".join(
+            f" {stats[name]:>{w}.{digits}f}" for name, w, digits in columns
+        )
+        old = (baseline or {}).get(endpoint)
+        if old:
+            line += "   " + ", ".join(
+                f"{name} {(stats[name] - old[name]) / old[name] * 100:+.1f}%"
+                for name in compared if old.get(name)
+            )
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def save(path: str, result: dict) -> None:
+    with open(path, "w") as f:
+        json.dump(result, f, indent=2, sort_keys=True)
+
+
+def load(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
@@ -0,0 +1,74 @@
+# benchmarks/serialization.py
+# هزینه سریال‌سازی هر توییت در پاسخ فید: مسیر استاندارد FastAPI در برابر مسیر سریع
+#
+# اجرا:  python -m benchmarks.serialization [--tweets 100] [--rounds 200]
+#
+# مسیرها:
+#   standard      DTOها -> اعتبارسنجی response_model -> dump_json (همان کاری که FastAPI می‌کند)
+#   prebuilt      ساخت TweetListResponse از قبل -> model_dump_json
+#   fast          DTOها -> responses.dumps (orjson)، بدون اعتبارسنجی
+
+import argparse
+import asyncio
+import time
+
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from src.core.responses import dumps
+from src.schemas.user import TweetListResponse, media_url, media_variant_urls
+
+
+def _tweets(count: int) -> list:
+    """DTOهای مشابه خروجی feed.assemble_tweets (۲ پیوست و ۵ لایک برای هر توییت)"""
+    return [
+        {
+            "id": i,
+            "content": "Benchmarking the feed serializer " * 3,
+            "attachments": [
+                {"id": m, "url": media_url(m), "variants": media_variant_urls(m)} for m in (i, i + 1)
+            ],
+            "author": {"id": i % 50, "name": f"user{i % 50}"},
+            "likes": [{"user_id": u, "name": f"user{u}"} for u in range(5)],
+            "like_count": 5,
+        }
+        for i in range(count)
+    ]
+
+
+def _per_tweet_us(fn, tweets: int, rounds: int) -> float:
+    fn()  # warm-up
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - start) / rounds / tweets * 1e6
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Per-tweet feed serialization cost")
+    parser.add_argument("--tweets", type=int, default=100)
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    page = {"result": True, "tweets": _tweets(args.tweets), "next_cursor": None}
+    field = create_model_field(name="response", type_=TweetListResponse, mode="serialization")
+
+    def standard():
+        return asyncio.run(
+            serialize_response(field=field, response_content=page, dump_json=True)
+        )
+
+    def prebuilt():
+        return TweetListResponse.model_validate(page).model_dump_json()
+
+    def fast():
+        return dumps(page)
+
+    assert standard() == fast()
+
+    for name, fn in (("standard", standard), ("prebuilt", prebuilt), ("fast", fast)):
+        print(f"{name:<10} {_per_tweet_us(fn, args.tweets, args.rounds):8.2f} us/tweet")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+# benchmarks/startup.py
+# زمان cold start برنامه: import ماژول src.main، create_app، startup (lifespan) و اولین درخواست هر مسیر
+#
+# هر اجرا در یک پردازه پایتون تازه انجام می‌شود (کش ماژول‌ها خالی است، مانند راه‌اندازی یک worker):
+#   python -m benchmarks.startup --runs 10
+#   python -m benchmarks.startup --database-url sqlite:///./bench.db --path / --path /tweets
+# ذخیره و مقایسه بین commitها مانند benchmarks.load:
+#   python -m benchmarks.startup --output before.json
+#   python -m benchmarks.startup --compare before.json
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from . import report
+
+DEFAULT_PATHS = ["/", "/tweets"]
+
+
+def _child(paths: List[str]) -> Dict[str, dict]:
+    """یک cold start در همین پردازه؛ زمان هر مرحله به ثانیه"""
+    started = time.perf_counter()
+    from src import main
+
+    imported = time.perf_counter()
+    app = main.create_app()
+    created = time.perf_counter()
+    phases = {
+        "import src.main": {"seconds": imported - started, "ok": True},
+        "create_app": {"seconds": created - imported, "ok": True},
+    }
+
+    # کلاینت benchmark خارج از زمان‌سنجی بارگذاری می‌شود
+    import httpx
+
+    async def _serve():
+        begin = time.perf_counter()
+        async with app.router.lifespan_context(app):
+            phases["startup"] = {"seconds": time.perf_counter() - begin, "ok": True}
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                for path in paths:
+                    begin = time.perf_counter()
+                    try:
+                        ok = (await client.get(path)).status_code < 500
+                    except Exception:  # مثلاً پایگاه داده در دسترس نیست
+                        ok = False
+                    phases[f"first GET {path}"] = {"seconds": time.perf_counter() - begin, "ok": ok}
+
+    asyncio.run(_serve())
+    # مجموع مراحل (بدون زمان بارگذاری کلاینت benchmark)
+    phases["cold start"] = {
+        "seconds": sum(sample["seconds"] for sample in phases.values()),
+        "ok": all(sample["ok"] for sample in phases.values()),
+    }
+    return phases
+
+
+def measure(
+    runs: int, paths: List[str], database_url: Optional[str] = None, python: str = sys.executable
+) -> dict:
+    """runs بار راه‌اندازی در پردازه تازه؛ صدک‌های زمان هر مرحله"""
+    env = dict(os.environ)
+    if database_url:
+        env["SQLALCHEMY_DATABASE_URL"] = database_url
+    command = [python, "-m", "benchmarks.startup", "--child"] + [f"--path={path}" for path in paths]
+    recorder = report.Recorder()
+    for _ in range(runs):
+        output = subprocess.run(command, env=env, capture_output=True, text=True, check=True).stdout
+        for phase, sample in json.loads(output.splitlines()[-1]).items():
+            recorder.record(phase, sample["seconds"], sample["ok"])
+    # مراحل پشت سر هم اجرا می‌شوند؛ جمع نمونه‌های آن‌ها (TOTAL) معنایی ندارد
+    phases = recorder.summary(wall_seconds=0, total=False)
+    return {
+        "commit": report.git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "runs": runs,
+        "paths": paths,
+        "endpoints": phases,
+    }
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Cold-start latency: import, app creation, startup and first requests")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--path", action="append", dest="paths", help=f"first request paths (default {DEFAULT_PATHS})")
+    parser.add_argument("--database-url", help="SQLALCHEMY_DATABASE_URL of the measured app")
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--compare", help="JSON results of a previous run to diff against")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    paths = args.paths or DEFAULT_PATHS
+
+    if args.child:
+        print(json.dumps(_child(paths)))
+        return
+
+    result = measure(args.runs, paths, args.database_url)
+    baseline = report.load(args.compare)["endpoints"] if args.compare else None
+    print(f"runs={result['runs']} commit={result['commit']}")
+    print(report.format_table(result["endpoints"], baseline))
+    if args.output:
+        report.save(args.output, result)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,40 +1,30 @@
 # src/api/auth.py
 
 from typing import Any
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
-from sqlalchemy import select
+from sqlalchemy import select, update
 
 from ..db import models
-from ..db.session import get_db
+from ..db.session import DBSession, get_db, mark_credential_issued, run_db
 from ..schemas import user as schemas_user
+from ..schemas import token as schemas_token
 from ..core import security
+from ..core.config import settings
+from ..core.hashing import hashing_pool
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
 
 # 1. روتر ثبت نام (POST /auth/register)
-# FIX: response_model باید از شمای Pydantic (schemas_user.User) باشد.
-@router.post("/register", response_model=schemas_user.User)
-def register_user(
-        user_in: schemas_user.UserCreate,
-        db: Session = Depends(get_db),
-) -> Any:
-    """
-    ثبت نام کاربر جدید و بازگرداندن اطلاعات کاربر (شامل API Key).
-    """
-    # 1. بررسی وجود کاربر
-    user = db.execute(select(models.User).filter(models.User.email == user_in.email)).scalar_one_or_none()
-    if user:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="User with this email already exists."
-        )
+def _email_taken(db: Session, email: str) -> bool:
+    return db.execute(
+        select(models.User.id).filter(models.User.email == email)
+    ).first() is not None
 
-    # 2. هش کردن رمز عبور
-    hashed_password = security.get_password_hash(user_in.password)
 
+def _create_user(db: Session, user_in: schemas_user.UserCreate, hashed_password: str) -> schemas_user.User:
     # 3. ایجاد API Key منحصر به فرد
     api_key = security.create_api_key()
 
@@ -50,27 +40,82 @@ def register_user(
     db.commit()
     db.refresh(db_user)
 
-    return db_user
+    return schemas_user.User.model_validate(db_user)
+
+
+# FIX: response_model باید از شمای Pydantic (schemas_user.User) باشد.
+@router.post("/register", response_model=schemas_user.User)
+async def register_user(
+        user_in: schemas_user.UserCreate,
+        db: DBSession = Depends(get_db),
+) -> Any:
+    """
+    ثبت نام کاربر جدید و بازگرداندن اطلاعات کاربر (شامل API Key).
+    """
+    # 1. بررسی وجود کاربر
+    if await run_db(db, _email_taken, user_in.email):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="User with this email already exists."
+        )
+
+    # 2. هش کردن رمز عبور (پردازش سنگین؛ روی executor اختصاصی، 503 در صورت اشباع)
+    hashed_password = await hashing_pool.run(
+        "hash", security.get_password_hash, user_in.password, settings.PASSWORD_BCRYPT_ROUNDS
+    )
+
+    return await run_db(db, _create_user, user_in, hashed_password)
 
 
 # 2. روتر دریافت توکن (POST /auth/access-token)
-@router.post("/access-token", response_model=schemas_user.Token)
-def login_access_token(
-        db: Session = Depends(get_db),
+def _get_credentials(db: Session, email: str) -> models.User | None:
+    return db.execute(
+        select(models.User).filter(models.User.email == email)
+    ).scalar_one_or_none()
+
+
+def _store_password_hash(db: Session, user_id: int, hashed_password: str) -> None:
+    db.execute(
+        update(models.User).where(models.User.id == user_id).values(hashed_password=hashed_password)
+    )
+    db.commit()
+
+
+@router.post("/access-token", response_model=schemas_token.Token)
+async def login_access_token(
+        request: Request,
+        db: DBSession = Depends(get_db),
         form_data: OAuth2PasswordRequestForm = Depends(),
 ) -> Any:
     """
     دریافت توکن JWT برای ورود.
     """
-    user = db.execute(select(models.User).filter(models.User.email == form_data.username)).scalar_one_or_none()
+    user = await run_db(db, _get_credentials, form_data.username)
 
-    if not user or not security.verify_password(form_data.password, user.hashed_password):
+    if not user or not user.is_active or not await hashing_pool.run(
+        "verify", security.verify_password, form_data.password, user.hashed_password
+    ):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Incorrect username or password"
         )
 
-    return {
-        "access_token": security.create_access_token(subject=user.email),
-        "token_type": "bearer",
-    }
\ No newline at end of file
+    # اگر هزینه bcrypt تغییر کرده باشد، هش با تنظیمات جدید بازسازی می‌شود
+    if security.password_needs_rehash(user.hashed_password):
+        try:
+            new_hash = await hashing_pool.run(
+                "rehash", security.get_password_hash, form_data.password, settings.PASSWORD_BCRYPT_ROUNDS
+            )
+        except HTTPException:
+            new_hash = None  # best-effort؛ در ورود بعدی دوباره تلاش می‌شود
+        if new_hash:
+            await run_db(db, _store_password_hash, user.id, new_hash)
+
+    # شناسه عددی و نسخه توکن کاربر؛ بقیه اطلاعات principal از دیتابیس (با کش کوتاه) خوانده می‌شود
+    access_token = security.create_access_token(
+        subject=user.id,
+        claims={"ver": user.token_version},
+    )
+    # درخواست‌های بعدی با توکن تازه در پنجره read-your-writes از primary خوانده می‌شوند
+    mark_credential_issued(request, access_token)
+    return {"access_token": access_token, "token_type": "bearer"}
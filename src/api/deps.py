@@ -1,66 +1,89 @@
 # src/api/deps.py
 # این فایل شامل توابع مورد نیاز برای مدیریت JWT و Session پایگاه داده است.
 
-import os
+import hashlib
+import time
 from datetime import datetime, timedelta
-from typing import Generator, Any
+from typing import Any, List
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, Header, HTTPException, Query, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 from pydantic import ValidationError
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
-from ..db.session import SessionLocal
+from ..core.auth_cache import UserPrincipal, api_key_cache, user_principals
+from ..core.cache import TTLCache
+from ..core.config import PerSettings, settings
+from ..db import models
+from ..db.session import DBSession, get_db, run_db
 from ..schemas.token import TokenPayload
 
 
-# تنظیمات JWT را از متغیرهای محیطی می‌خوانیم
-SECRET_KEY = os.environ.get("SECRET_KEY", "default_secret_key")
-ALGORITHM = os.environ.get("ALGORITHM", "HS256")
-ACCESS_TOKEN_EXPIRE_MINUTES = int(
-    os.environ.get("ACCESS_TOKEN_EXPIRE_MINUTES", 30)
-)
-
-
 # تعریف طرح امنیتی OAuth2
 reusable_oauth2 = OAuth2PasswordBearer(
     tokenUrl="/api/v1/auth/access-token"
 )
 
+# نسخه اختیاری برای مسیرهایی که هم Api-Key و هم Bearer را می‌پذیرند
+optional_oauth2 = OAuth2PasswordBearer(
+    tokenUrl="/api/v1/auth/access-token", auto_error=False
+)
 
-def get_db() -> Generator[Session, None, None]:
-    """توابع وابستگی برای دریافت Session دیتابیس (Dependency)"""
-    try:
-        db = SessionLocal()
-        yield db
-    finally:
-        db.close()
+
+# payloadهای تأیید شده، با کلید digest توکن، تا زمان exp نگهداری می‌شوند
+token_cache = PerSettings(lambda: TTLCache(
+    max_entries=settings.TOKEN_CACHE_MAX_ENTRIES,
+    ttl=settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+))
 
 
-def create_access_token(subject: str | Any, expires_delta: timedelta = None) -> str:
-    """ایجاد توکن دسترسی (Access Token)"""
+def create_access_token(
+    subject: str | Any,
+    expires_delta: timedelta = None,
+    claims: dict | None = None,
+) -> str:
+    """ایجاد توکن دسترسی (Access Token)؛ subject شناسه عددی کاربر است"""
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
-        # اگر زمان انقضا مشخص نشد، از متغیر محیطی استفاده کن
-        expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+        # اگر زمان انقضا مشخص نشد، از تنظیمات استفاده کن
+        expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     
-    to_encode = {"exp": expire, "sub": str(subject)}
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    to_encode = {**(claims or {}), "exp": expire, "sub": str(subject)}
+    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
 
+def decode_access_token(token: str) -> dict:
+    """
+    تأیید امضا و دیکد توکن با memoization.
+    در حالت پایدار هزینه آن یک hash و یک lookup در دیکشنری است؛ JWTError در صورت نامعتبر بودن.
+    """
+    key = hashlib.sha256(token.encode()).digest()
+    payload = token_cache.get(key)
+    if payload is None:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        # فقط تا زمان انقضای توکن نگهداری می‌شود
+        ttl = payload.get("exp", 0) - time.time()
+        if ttl > 0:
+            token_cache.set(key, payload, ttl=ttl)
+    return payload
+
+
+def _token_data(payload: dict) -> TokenPayload:
+    # استفاده از مدل Pydantic برای اعتبارسنجی ساختار Payload
+    return TokenPayload(
+        user_id=payload.get("sub"),
+        token_version=payload.get("ver", 0),
+    )
+
+
 def get_token_payload(token: str = Depends(reusable_oauth2)) -> TokenPayload:
     """اعتبارسنجی و دیکد کردن توکن و برگرداندن Payload"""
     try:
-        payload = jwt.decode(
-            token, 
-            SECRET_KEY, 
-            algorithms=[ALGORITHM]
-        )
-        # استفاده از مدل Pydantic برای اعتبارسنجی ساختار Payload
-        token_data = TokenPayload(user_id=payload.get("sub"))
+        token_data = _token_data(decode_access_token(token))
     except (JWTError, ValidationError):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -76,3 +99,69 @@ def get_token_payload(token: str = Depends(reusable_oauth2)) -> TokenPayload:
             headers={"WWW-Authenticate": "Bearer"},
         )
     return token_data
+
+
+def batch_ids(ids: List[int] = Query(..., min_length=1)) -> List[int]:
+    """IDهای endpointهای دسته‌ای؛ سقف BATCH_MAX_ITEMS از تنظیمات برنامه جاری خوانده می‌شود"""
+    if len(ids) > settings.BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+            detail=f"At most {settings.BATCH_MAX_ITEMS} ids are allowed.",
+        )
+    return ids
+
+
+def _get_user_by_api_key(db: Session, api_key: str) -> models.User | None:
+    return db.execute(
+        select(models.User).filter(models.User.api_key == api_key)
+    ).scalar_one_or_none()
+
+
+def _get_user_by_id(db: Session, user_id: int) -> models.User | None:
+    return db.get(models.User, user_id)
+
+
+async def get_current_user_by_api_key(
+    api_key: str | None = Header(None, alias="api-key"),
+    token: str | None = Depends(optional_oauth2),
+    db: DBSession = Depends(get_db),
+) -> UserPrincipal:
+    """
+    دریافت کاربر فعلی بر اساس هدر Api-Key (یا در نبود آن، توکن Bearer).
+    نتیجه API Key در api_key_cache نگهداری می‌شود تا درخواست‌های بعدی بدون کوئری احراز شوند؛
+    امضای توکن Bearer پس از اولین تأیید از token_cache خوانده می‌شود و کاربر آن از user_principals
+    (TTL کوتاه)؛ توکن فقط وقتی پذیرفته می‌شود که نسخه‌اش با User.token_version برابر باشد.
+    توکن‌های قدیمی که subject آن‌ها ایمیل است (بدون ver) رد می‌شوند و کاربر باید دوباره وارد شود.
+    """
+    principal = None
+    if api_key:
+        principal = api_key_cache.get(api_key)
+        if principal is None:
+            user = await run_db(db, _get_user_by_api_key, api_key)
+            if user:
+                principal = UserPrincipal.from_user(user)
+                if principal.is_active:
+                    api_key_cache.set(api_key, principal)
+    elif token:
+        try:
+            payload = decode_access_token(token)
+        except JWTError:
+            payload = {}
+        subject = str(payload.get("sub", ""))
+        if subject.isdigit():
+            token_data = _token_data(payload)
+            principal = user_principals.get(token_data.user_id)
+            if principal is None:
+                user = await run_db(db, _get_user_by_id, token_data.user_id)
+                if user:
+                    principal = UserPrincipal.from_user(user)
+                    user_principals.set(user.id, principal)
+            if principal and principal.token_version != token_data.token_version:
+                principal = None  # صادرشده پیش از غیرفعال‌سازی کاربر
+
+    if not principal or not principal.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or missing API key.",
+        )
+    return principal
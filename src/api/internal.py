@@ -0,0 +1,61 @@
+# src/api/internal.py
+# مسیرهای داخلی برای مشاهده وضعیت زیرسیستم‌ها (کش، connection pool، ...)
+
+from typing import Any
+from fastapi import APIRouter
+
+from ..core.auth_cache import api_key_cache
+from ..core.cache import feed_cache
+from ..core.derivatives import derivative_pool
+from ..core.hashing import hashing_pool
+from .deps import token_cache
+from .media import media_cache, variant_cache
+from ..db.pool import pool_stats
+from ..db.session import replica_router
+
+router = APIRouter(prefix="/internal", tags=["Internal"])
+
+
+@router.get("/cache")
+def read_cache_stats() -> Any:
+    """
+    شمارنده‌های hit/miss کش فید، کش‌های احراز هویت (API Key و توکن JWT)، کش رسانه
+    و کش وجود نسخه‌های کوچک‌شده.
+    """
+    return {
+        "result": True,
+        "feed": feed_cache.stats(),
+        "api_key": api_key_cache.stats(),
+        "token": token_cache.stats(),
+        "media": media_cache.stats(),
+        "media_variants": variant_cache.stats(),
+    }
+
+
+@router.get("/pool")
+def read_pool_stats() -> Any:
+    """
+    وضعیت لحظه‌ای connection pool: اشغال، overflow و زمان انتظار checkout،
+    و مسیریابی replica: تأخیر، خواندن‌ها از replica/primary و بازگشت‌ها به primary.
+    """
+    return {
+        "result": True,
+        "pools": {name: stats.snapshot() for name, stats in pool_stats.items()},
+        "replica": replica_router.stats(),
+    }
+
+
+@router.get("/hashing")
+def read_hashing_stats() -> Any:
+    """
+    وضعیت executor هش رمز عبور: صف، ردشده‌ها و تأخیر هر عملیات.
+    """
+    return {"result": True, "hashing": hashing_pool.stats()}
+
+
+@router.get("/derivatives")
+def read_derivative_stats() -> Any:
+    """
+    وضعیت صف ساخت نسخه‌های کوچک‌شده تصویر: در حال اجرا، انجام شده، ناموفق و ردشده.
+    """
+    return {"result": True, "derivatives": derivative_pool.stats()}
@@ -1,90 +1,297 @@
 # src/api/media.py
 
+import hashlib
+import logging
 import os
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, status
-from fastapi.responses import FileResponse
+import tempfile
+from typing import Any, BinaryIO, Callable, Iterator, List, Optional, Tuple
+
+from fastapi import (
+    APIRouter, BackgroundTasks, Depends, UploadFile, File, HTTPException, Query, Request, Response, status,
+)
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from fastapi.routing import APIRoute
 from sqlalchemy.orm import Session
-from sqlalchemy import select
-from typing import Any
+from sqlalchemy import delete, select, update
 
+from ..core.auth_cache import UserPrincipal
+from ..core.cache import TTLCache
+from ..core.config import PerSettings, settings
+from ..core.derivatives import derivative_pool, variant_key, variant_media_type, variants
+from ..core.storage import media_storage, shard_key
 from ..db import models
+from ..db.statements import insert_ignore
 from ..schemas.user import MediaResponse, StatusResponse
+from ..db.session import DBSession, run_db
 from .deps import get_db, get_current_user_by_api_key
 
-router = APIRouter(tags=["Media"])
+logger = logging.getLogger(__name__)
+
+# فضای اضافه بدنه multipart (boundary و سرآیندهای هر بخش) روی MEDIA_MAX_UPLOAD_BYTES
+MULTIPART_OVERHEAD_BYTES = 16 * 1024
+
+
+class UploadLimitRoute(APIRoute):
+    """
+    رد درخواست با Content-Length بزرگ‌تر از حد آپلود (413) پیش از خواندن بدنه؛ FastAPI
+    فرم را قبل از اجرای dependencyها و endpoint می‌خواند. بدنه‌های بدون Content-Length
+    (chunked) همچنان هنگام کپی در _store_upload محدود می‌شوند.
+    """
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+
+        async def limited_handler(request: Request) -> Response:
+            length = request.headers.get("content-length", "")
+            if length.isdigit() and int(length) > settings.MEDIA_MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES:
+                return JSONResponse(
+                    status_code=status.HTTP_413_CONTENT_TOO_LARGE,
+                    content={"detail": f"Media file exceeds {settings.MEDIA_MAX_UPLOAD_BYTES} bytes."},
+                )
+            return await handler(request)
+
+        return limited_handler
+
+
+router = APIRouter(tags=["Media"], route_class=UploadLimitRoute)
+
+
 
-# مسیر محلی برای ذخیره فایل‌ها
-MEDIA_ROOT = "media"
+def _store_upload(source: BinaryIO) -> tuple[str, int, str]:
+    """
+    کپی تکه‌تکه فایل آپلود شده همراه با محاسبه SHA-256 (I/O همگام؛ در threadpool اجرا می‌شود).
+    ابتدا در یک فایل موقت نوشته و سپس با کلید مبتنی بر هش به media_storage سپرده می‌شود؛
+    اگر همان محتوا قبلاً ذخیره شده باشد دوباره نوشته نمی‌شود. خروجی: (sha256, size, storage_key)
+    """
+    digest = hashlib.sha256()
+    size = 0
+    fd, temp_path = tempfile.mkstemp(dir=media_storage.temp_dir, prefix=".upload-")
+    try:
+        with os.fdopen(fd, "wb") as buffer:
+            while chunk := source.read(settings.MEDIA_UPLOAD_CHUNK_BYTES):
+                size += len(chunk)
+                if size > settings.MEDIA_MAX_UPLOAD_BYTES:
+                    raise HTTPException(
+                        status_code=status.HTTP_413_CONTENT_TOO_LARGE,
+                        detail=f"Media file exceeds {settings.MEDIA_MAX_UPLOAD_BYTES} bytes.",
+                    )
+                digest.update(chunk)
+                buffer.write(chunk)
+        sha256 = digest.hexdigest()
+        key = shard_key(sha256)
+        media_storage.put_file(key, temp_path)
+        return sha256, size, key
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
 
-# مطمئن می‌شویم که پوشه ذخیره‌سازی وجود داشته باشد
-if not os.path.exists(MEDIA_ROOT):
-    os.makedirs(MEDIA_ROOT)
+
+def _register_media(db: Session, sha256: str, size: int, file_path: str, file_type: str | None) -> int:
+    """
+    ثبت رسانه بر اساس هش محتوا: سطر جدید یا افزایش ref_count سطر موجود.
+    INSERT ... ON CONFLICT DO NOTHING آپلودهای هم‌زمان یک محتوا را هم درست ادغام می‌کند.
+    """
+    db.execute(
+        insert_ignore(db, models.Media.__table__).values(
+            file_path=file_path, file_type=file_type, sha256=sha256, size=size, ref_count=0,
+        )
+    )
+    media_id = db.execute(
+        update(models.Media)
+        .where(models.Media.sha256 == sha256)
+        .values(ref_count=models.Media.ref_count + 1)
+        .returning(models.Media.id)
+    ).scalar_one()
+    db.commit()
+    return media_id
+
+
+def release_media(db: Session, media_ids: List[int]) -> List[Tuple[int, str, Optional[str]]]:
+    """
+    کاهش ref_count رسانه‌هایی که پیوندشان با یک توییت حذف شده است (commit با فراخواننده).
+    سطرهایی که به صفر رسیده‌اند و به توییت دیگری پیوست نیستند حذف می‌شوند و
+    (media_id, file_path, sha256) آن‌ها برای delete_media_files پس از commit برگردانده می‌شود.
+    """
+    if not media_ids:
+        return []
+    media, links = models.Media, models.tweet_media_table
+    db.execute(update(media).where(media.id.in_(media_ids)).values(ref_count=media.ref_count - 1))
+    still_linked = select(links.c.media_id).where(links.c.media_id == media.id).exists()
+    rows = db.execute(
+        delete(media)
+        .where(media.id.in_(media_ids), media.ref_count <= 0, ~still_linked)
+        .returning(media.id, media.file_path, media.sha256)
+    ).all()
+    return [tuple(row) for row in rows]
+
+
+def delete_media_files(released: List[Tuple[int, str, Optional[str]]]) -> None:
+    """حذف فایل اصلی و نسخه‌های رسانه‌های حذف شده از storage و کش‌ها (I/O همگام)"""
+    for media_id, file_path, sha256 in released:
+        media_cache.pop(media_id)
+        # رسانه قدیمی (پیش از reshard_media) در media_storage نیست
+        if not sha256 or file_path != shard_key(sha256):
+            continue
+        for key in [file_path] + [variant_key(file_path, name) for name in variants()]:
+            variant_cache.pop((media_id, key))
+            try:
+                media_storage.delete(key)
+            except Exception:
+                logger.exception("Could not delete media file %s", key)
 
 
 @router.post("/medias", response_model=MediaResponse)
-def upload_media(
+async def upload_media(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
-    db: Session = Depends(get_db),
+    db: DBSession = Depends(get_db),
     # نیاز به اعتبارسنجی کاربر برای آپلود
-    current_user: models.User = Depends(get_current_user_by_api_key), 
+    current_user: UserPrincipal = Depends(get_current_user_by_api_key), 
 ) -> Any:
     """
     آپلود یک فایل رسانه‌ای (تصویر).
+    فایل‌های بزرگ‌تر از MEDIA_MAX_UPLOAD_BYTES با 413 رد می‌شوند و آپلودهای
+    یکسان همان media_id قبلی را برمی‌گردانند. نسخه‌های thumb/medium در پس‌زمینه ساخته می‌شوند.
     """
-    
-    # 1. ساخت مسیر ذخیره‌سازی
-    # از UUID یا هش برای نام‌گذاری مطمئن استفاده می‌شود (اینجا برای سادگی از ID + نام فایل)
-    # در محیط واقعی، باید نام فایل را امن کنیم
-    
-    file_extension = file.filename.split(".")[-1] if "." in file.filename else "file"
-    # نام فایل موقت را بر اساس زمان فعلی و user ID می‌سازیم
-    temp_filename = f"{current_user.id}_{int(os.time())}.{file_extension}" 
-    file_path = os.path.join(MEDIA_ROOT, temp_filename)
-    
-    # 2. ذخیره فایل روی سیستم فایل
+    # 1. ذخیره فایل روی سیستم فایل (مسیر بر اساس هش محتوا)
     try:
-        with open(file_path, "wb") as buffer:
-            # کپی کردن محتوای فایل آپلود شده به فایل محلی
-            for chunk in file.file:
-                buffer.write(chunk)
-    except Exception as e:
+        sha256, size, file_path = await run_in_threadpool(_store_upload, file.file)
+    except HTTPException:
+        raise
+    except Exception:
         # در صورت بروز خطا در ذخیره فایل
-        print(f"File upload error: {e}")
+        logger.exception("File upload error")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Could not save media file."
         )
 
-    # 3. ایجاد رکورد در دیتابیس
-    db_media = models.Media(
-        file_path=file_path,
-        file_type=file.content_type,
-    )
-    db.add(db_media)
-    db.commit()
-    db.refresh(db_media)
+    # 2. ایجاد رکورد در دیتابیس یا افزایش شمارنده ارجاع
+    media_id = await run_db(db, _register_media, sha256, size, file_path, file.content_type)
+
+    # 3. ساخت نسخه‌های کوچک‌شده پس از ارسال پاسخ (روی process pool محدود)
+    background_tasks.add_task(derivative_pool.schedule, media_storage, file_path, file.content_type)
+
+    return {"result": True, "media_id": media_id}
+
+
+# رسانه پس از آپلود تغییر نمی‌کند؛ مرورگر و CDN می‌توانند آن را برای همیشه نگه دارند
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# پاسخ جایگزین (فایل اصلی به جای نسخه‌ای که هنوز ساخته نشده)
+FALLBACK_CACHE_CONTROL = "public, max-age=60"
+
+# media_id -> (file_path, file_type, sha256)؛ درخواست‌های تکراری به دیتابیس نمی‌روند
+media_cache = PerSettings(lambda: TTLCache(
+    max_entries=settings.MEDIA_CACHE_MAX_ENTRIES, ttl=settings.MEDIA_CACHE_TTL_SECONDS
+))
+# (media_id, variant_key) -> True برای نسخه‌های ساخته شده؛ جدا از media_cache تا آمار hit/miss
+# جستجوی رسانه با بررسی وجود نسخه‌ها مخلوط نشود
+variant_cache = PerSettings(lambda: TTLCache(
+    max_entries=settings.MEDIA_CACHE_MAX_ENTRIES, ttl=settings.MEDIA_CACHE_TTL_SECONDS
+))
+
+
+def _get_media_file(db: Session, media_id: int) -> tuple[str, str | None, str | None] | None:
+    """(file_path, file_type, sha256) یک رسانه یا None"""
+    row = db.execute(
+        select(models.Media.file_path, models.Media.file_type, models.Media.sha256)
+        .filter(models.Media.id == media_id)
+    ).first()
+    return tuple(row) if row else None
 
-    return {"result": True, "media_id": db_media.id}
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """مقایسه ضعیف If-None-Match با ETag (لیست جدا شده با کاما یا *)"""
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def _variant_stored(media_id: int, key: str) -> bool:
+    """وجود نسخه در storage؛ نتیجه مثبت کش می‌شود (نسخه‌ها هم تغییرناپذیرند)"""
+    if variant_cache.get((media_id, key)):
+        return True
+    if media_storage.exists(key):
+        variant_cache.set((media_id, key), True)
+        return True
+    return False
 
 
 @router.get("/medias/{media_id}")
-def get_media(
+async def get_media(
     media_id: int,
-    db: Session = Depends(get_db),
+    request: Request,
+    variant: Optional[str] = Query(None, description="thumb یا medium؛ بدون آن فایل اصلی"),
+    db: DBSession = Depends(get_db),
     # این روتر نیاز به کاربر احراز هویت شده ندارد، چون فایل‌ها عمومی هستند
 ) -> Any:
     """
     دریافت یک فایل رسانه‌ای (تصویر) بر اساس ID آن.
+    ETag قوی از هش محتوا ساخته می‌شود و If-None-Match پاسخ 304 می‌گیرد؛
+    درخواست‌های Range (تکی و چندتایی) توسط FileResponse پاسخ داده می‌شوند.
+    اگر نسخه درخواستی هنوز ساخته نشده باشد، فایل اصلی (با کش کوتاه) برگردانده
+    و ساخت نسخه صف می‌شود.
     """
-    media = db.execute(
-        select(models.Media).filter(models.Media.id == media_id)
-    ).scalar_one_or_none()
-    
-    if not media:
+    if variant is not None and variant not in variants():
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Media not found."
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown media variant. Expected one of: {', '.join(variants())}.",
         )
-        
+
+    media = media_cache.get(media_id)
+    if media is None:
+        media = await run_db(db, _get_media_file, media_id)
+        if not media:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Media not found."
+            )
+        media_cache.set(media_id, media)
+
+    file_path, file_type, sha256 = media
+    # رسانه قدیمی که هنوز با reshard_media منتقل نشده: file_path مسیر روی دیسک است
+    in_storage = bool(sha256) and file_path == shard_key(sha256)
+    headers = {"Cache-Control": IMMUTABLE_CACHE_CONTROL}
+    etag = f'"{sha256}"' if sha256 else None
+
+    if variant is not None:
+        key = variant_key(file_path, variant)
+        if in_storage and await run_in_threadpool(_variant_stored, media_id, key):
+            file_path, file_type = key, variant_media_type(file_type)
+            etag = f'"{key.rsplit("/", 1)[-1]}"'
+        else:
+            # همین URL بعداً نسخه کوچک را برمی‌گرداند؛ فایل اصلی نباید immutable کش شود
+            headers["Cache-Control"] = FALLBACK_CACHE_CONTROL
+            if in_storage:
+                await run_in_threadpool(derivative_pool.schedule, media_storage, file_path, file_type)
+
+    if etag:
+        # رسانه‌های قدیمی بدون هش، ETag مبتنی بر mtime/size خود FileResponse را دارند
+        headers["ETag"] = etag
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and _etag_matches(if_none_match, etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
     # ارسال فایل به عنوان پاسخ
-    return FileResponse(media.file_path, media_type=media.file_type)
+    if not in_storage:
+        return FileResponse(file_path, media_type=file_type, headers=headers)
+    local_path = media_storage.local_path(file_path)
+    if local_path is not None:
+        return FileResponse(local_path, media_type=file_type, headers=headers)
+    # object store: پاسخ کامل به صورت جریانی (Range را CDN جلوی bucket پاسخ می‌دهد)
+    body = await run_in_threadpool(media_storage.open, file_path)
+    return StreamingResponse(
+        _iter_body(body), media_type=file_type, headers=headers
+    )
+
+
+def _iter_body(body: BinaryIO) -> Iterator[bytes]:
+    """خواندن تکه‌تکه بدنه object store (در threadpool توسط StreamingResponse)"""
+    try:
+        while chunk := body.read(settings.MEDIA_UPLOAD_CHUNK_BYTES):
+            yield chunk
+    finally:
+        body.close()
@@ -21,3 +21,5 @@ router.include_router(auth.router)
 router.include_router(tweet.router)
 router.include_router(media.router)
 router.include_router(user_profile.router)
+
+# مسیرهای داخلی (آمار و وضعیت) فقط با INTERNAL_ENDPOINTS_ENABLED در create_app اضافه می‌شوند
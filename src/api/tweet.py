@@ -1,17 +1,35 @@
 # src/api/tweet.py
 
-from typing import Any, List
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Any, List, Optional, Set, Tuple
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from sqlalchemy import select, desc, insert, delete
 from datetime import datetime
 
+from ..core.auth_cache import UserPrincipal
+from ..core.cache import feed_cache
+from ..core.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from ..core.profiling import QueryBudget
+from ..core.responses import dumps, json_response
+from ..core.trending import trending
 from ..db import models
-from ..schemas.user import TweetCreate, TweetCreateResponse, TweetListResponse, TweetResponseBase, StatusResponse
-from .deps import get_db, get_current_user_by_api_key
+from ..db import hashtags, likes, search, timeline
+from ..db.feed import get_feed_page, get_tweets_by_ids
+from ..db.session import DBSession, run_db
+from ..schemas.user import (
+    BatchResponse, LikeAction, LikeBatchRequest, TweetCreate, TweetCreateResponse, TweetListResponse,
+    StatusResponse, TrendingResponse,
+)
+from .deps import batch_ids, get_db, get_current_user_by_api_key
+from .media import delete_media_files, release_media
 
 router = APIRouter(tags=["Tweets"])
 
+# سقف کوئری مسیرهای خواندن فید: تعداد کوئری‌ها مستقل از اندازه صفحه است
+# (صفحه + نویسندگان/پیوست‌ها/لایک‌ها + احراز هویت)، پس رشد آن یعنی N+1
+FEED_QUERY_BUDGET = QueryBudget(8)
+
 
 def get_tweet_by_id(db: Session, tweet_id: int) -> models.Tweet:
     """دریافت توییت بر اساس ID، یا پرتاب 404"""
@@ -25,16 +43,10 @@ def get_tweet_by_id(db: Session, tweet_id: int) -> models.Tweet:
 
 
 # 1. روتر ایجاد توییت (POST /api/tweets)
-@router.post("/tweets", response_model=TweetCreateResponse)
-def create_tweet(
-    tweet_in: TweetCreate,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user_by_api_key), 
-) -> Any:
-    """
-    ایجاد یک توییت جدید.
-    """
-    
+def _create_tweet(
+    db: Session, tweet_in: TweetCreate, current_user: UserPrincipal
+) -> int:
+    """ذخیره توییت جدید و درج آن در تایم‌لاین‌ها؛ ID توییت را برمی‌گرداند"""
     # 1. ایجاد مدل توییت
     db_tweet = models.Tweet(
         content=tweet_in.tweet_data,
@@ -57,43 +69,158 @@ def create_tweet(
         db_tweet.attachments.extend(media_files)
 
     db.add(db_tweet)
+    db.flush()
+
+    # 3. درج در تایم‌لاین دنبال‌کنندگان (fan-out-on-write)
+    timeline.fan_out_tweet(db, db_tweet)
+
+    # 4. استخراج هشتگ‌ها و mentionها در جداول ایندکس (و شمارنده‌های trending پس از commit)
+    hashtags.index_tweet(db, db_tweet.id, db_tweet.content, db_tweet.created_at)
+    tweet_id = db_tweet.id
     db.commit()
-    db.refresh(db_tweet)
+    return tweet_id
+
 
-    return {"result": True, "tweet_id": db_tweet.id}
+@router.post("/tweets", response_model=TweetCreateResponse)
+async def create_tweet(
+    tweet_in: TweetCreate,
+    db: DBSession = Depends(get_db),
+    current_user: UserPrincipal = Depends(get_current_user_by_api_key), 
+) -> Any:
+    """
+    ایجاد یک توییت جدید.
+    """
+    tweet_id = await run_db(db, _create_tweet, tweet_in, current_user)
+
+    # 5. ابطال صفحه اول فید کش شده
+    feed_cache.tweet_created()
+
+    return {"result": True, "tweet_id": tweet_id}
 
 
 # 2. روتر دریافت فید (GET /api/tweets)
-@router.get("/tweets", response_model=TweetListResponse)
-def get_feed(db: Session = Depends(get_db)) -> Any:
+@router.get(
+    "/tweets", response_model=TweetListResponse, dependencies=[Depends(FEED_QUERY_BUDGET)]
+)
+async def get_feed(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None),
+    tag: Optional[str] = Query(None, min_length=1, max_length=hashtags.MAX_TAG_LENGTH + 1),
+    db: DBSession = Depends(get_db),
+) -> Any:
     """
-    دریافت فید تمام توییت‌ها (شامل لایک‌ها و مدیا).
+    دریافت فید توییت‌ها به صورت صفحه‌بندی keyset روی (created_at, id).
+    هزینه هر صفحه مستقل از عمق اسکرول است، چون از ایندکس ix_tweet_created_at_id
+    به صورت range scan استفاده می‌شود (بدون OFFSET).
+    صفحات سریال‌شده در feed_cache نگهداری می‌شوند و با نوشتن‌ها باطل می‌شوند.
+    با tag فقط توییت‌های دارای آن هشتگ (از ایندکس tweet_hashtag، بدون کش) برگردانده می‌شوند.
     """
-    # دریافت همه توییت‌ها به ترتیب زمان (جدیدترین اول)
-    tweets = db.execute(
-        select(models.Tweet)
-        .order_by(desc(models.Tweet.created_at))
-    ).scalars().all()
+    if tag is not None:
+        tweet_responses, next_cursor = await run_db(
+            db, hashtags.get_tag_page, tag, limit=limit, cursor=cursor
+        )
+        return json_response({"result": True, "tweets": tweet_responses, "next_cursor": next_cursor})
 
-    # تبدیل مدل‌های دیتابیس به شمای پاسخ
-    # این تابع به صورت خودکار اطلاعات author, attachments و likes را از روابط SQLAlchemy دریافت می‌کند
-    tweet_responses = [
-        TweetResponseBase.model_validate(tweet)
-        for tweet in tweets
-    ]
+    if not feed_cache.enabled:
+        tweet_responses, next_cursor = await run_db(db, get_feed_page, limit=limit, cursor=cursor)
+        return json_response({"result": True, "tweets": tweet_responses, "next_cursor": next_cursor})
 
-    return {"result": True, "tweets": tweet_responses}
+    cache_key = feed_cache.page_key(limit, cursor)
+    body = feed_cache.get_page(cache_key)
+    if body is None:
+        # ابطال‌های بعد از این نقطه مانع ذخیره صفحه (احتمالاً کهنه) می‌شوند
+        since = feed_cache.generation()
+        # نویسنده، پیوست‌ها و لایک‌های کل صفحه با تعداد ثابتی کوئری بارگذاری می‌شوند
+        tweet_responses, next_cursor = await run_db(db, get_feed_page, limit=limit, cursor=cursor)
+        # DTOها به شکل TweetListResponse ساخته شده‌اند؛ مستقیماً سریال می‌شوند
+        body = dumps({"result": True, "tweets": tweet_responses, "next_cursor": next_cursor})
+        feed_cache.set_page(cache_key, body, [t["id"] for t in tweet_responses], since=since)
 
+    return Response(content=body, media_type="application/json")
 
-# 3. روتر حذف توییت (DELETE /api/tweets/<id>)
-@router.delete("/tweets/{tweet_id}", response_model=TweetCreateResponse)
-def delete_tweet(
-    tweet_id: int,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user_by_api_key),
+
+# روتر تایم‌لاین خانگی (GET /api/tweets/home)
+@router.get(
+    "/tweets/home", response_model=TweetListResponse, dependencies=[Depends(FEED_QUERY_BUDGET)]
+)
+async def get_home_timeline(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None),
+    db: DBSession = Depends(get_db),
+    current_user: UserPrincipal = Depends(get_current_user_by_api_key),
 ) -> Any:
     """
-    حذف یک توییت توسط نویسنده آن.
+    دریافت تایم‌لاین خانگی: توییت‌های خود کاربر و کاربرانی که دنبال می‌کند.
+    """
+    tweet_responses, next_cursor = await run_db(
+        db, timeline.get_home_page, current_user.id, limit=limit, cursor=cursor
+    )
+
+    return json_response({"result": True, "tweets": tweet_responses, "next_cursor": next_cursor})
+
+
+# روتر دریافت دسته‌ای توییت‌ها (GET /api/tweets/batch?ids=1&ids=2)
+@router.get(
+    "/tweets/batch", response_model=TweetListResponse, dependencies=[Depends(FEED_QUERY_BUDGET)]
+)
+async def get_tweets_batch(
+    ids: List[int] = Depends(batch_ids),
+    db: DBSession = Depends(get_db),
+) -> Any:
+    """
+    دریافت چند توییت با یک درخواست، به ترتیب ids (IDهای ناموجود حذف می‌شوند).
+    مستقل از تعداد IDها سه کوئری اجرا می‌شود.
+    """
+    tweet_responses = await run_db(db, get_tweets_by_ids, list(dict.fromkeys(ids)))
+
+    return json_response({"result": True, "tweets": tweet_responses, "next_cursor": None})
+
+
+# روتر هشتگ‌های پرطرفدار (GET /api/tweets/trending)
+@router.get("/tweets/trending", response_model=TrendingResponse)
+async def get_trending(
+    limit: int = Query(10, ge=1, le=MAX_PAGE_SIZE),
+    db: DBSession = Depends(get_db),
+) -> Any:
+    """
+    پرتکرارترین هشتگ‌ها در TRENDING_WINDOW_MINUTES دقیقه اخیر.
+    از سطل‌های یک دقیقه‌ای hashtag_bucket جمع زده و برای TRENDING_CACHE_TTL_SECONDS کش می‌شود.
+    """
+    top = trending.get(limit)
+    if top is None:
+        top = await run_db(db, hashtags.top_hashtags, limit)
+        trending.set(limit, top)
+    return {"result": True, "hashtags": top}
+
+
+# روتر جستجوی متن کامل (GET /api/tweets/search?q=)
+@router.get(
+    "/tweets/search", response_model=TweetListResponse, dependencies=[Depends(FEED_QUERY_BUDGET)]
+)
+async def search_tweets(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None),
+    db: DBSession = Depends(get_db),
+) -> Any:
+    """
+    جستجوی توییت‌ها بر اساس کلمات محتوا (همه کلمات باید وجود داشته باشند).
+    نتایج به ترتیب رتبه از ایندکس متنی (tsvector/GIN یا FTS5) و با cursor صفحه‌بندی می‌شوند.
+    """
+    tweet_responses, next_cursor = await run_db(
+        db, search.search_tweets, q, limit=limit, cursor=cursor
+    )
+
+    return json_response({"result": True, "tweets": tweet_responses, "next_cursor": next_cursor})
+
+
+# 3. روتر حذف توییت (DELETE /api/tweets/<id>)
+def _delete_tweet(
+    db: Session, tweet_id: int, current_user: UserPrincipal
+) -> List[Tuple[int, str, Optional[str]]]:
+    """
+    حذف توییت (فقط توسط نویسنده) و پاک کردن آن از تایم‌لاین‌ها و شمارنده‌های trending؛
+    رسانه‌هایی را که دیگر ارجاعی ندارند برای حذف فایلشان برمی‌گرداند.
     """
     tweet = get_tweet_by_id(db, tweet_id)
 
@@ -104,8 +231,36 @@ def delete_tweet(
             detail="You do not have permission to delete this tweet."
         )
 
-    db.delete(tweet)
+    timeline.remove_tweet(db, tweet_id)
+    hashtags.remove_tweet(db, tweet_id)
+    # حذف مستقیم ردیف‌های واسط و خود توییت؛ db.delete(tweet) لایک‌کنندگان و پیوست‌ها را
+    # از طریق relationshipهای secondary بارگذاری می‌کرد
+    db.execute(delete(models.likes_table).where(models.likes_table.c.tweet_id == tweet_id))
+    media_ids = db.execute(
+        delete(models.tweet_media_table)
+        .where(models.tweet_media_table.c.tweet_id == tweet_id)
+        .returning(models.tweet_media_table.c.media_id)
+    ).scalars().all()
+    db.execute(delete(models.Tweet).where(models.Tweet.id == tweet.id))
+    released = release_media(db, list(media_ids))
     db.commit()
+    return released
+
+
+@router.delete("/tweets/{tweet_id}", response_model=TweetCreateResponse)
+async def delete_tweet(
+    tweet_id: int,
+    db: DBSession = Depends(get_db),
+    current_user: UserPrincipal = Depends(get_current_user_by_api_key),
+) -> Any:
+    """
+    حذف یک توییت توسط نویسنده آن.
+    """
+    released = await run_db(db, _delete_tweet, tweet_id, current_user)
+    feed_cache.tweet_changed(tweet_id)
+    # فایل‌ها فقط پس از commit حذف سطرهای media پاک می‌شوند
+    if released:
+        await run_in_threadpool(delete_media_files, released)
 
     return {"result": True, "tweet_id": tweet_id}
 
@@ -113,46 +268,98 @@ def delete_tweet(
 # --- توابع لایک ---
 
 # 4. روتر لایک کردن توییت (POST /api/tweets/<id>/likes)
+def _like_tweet(db: Session, tweet_id: int, current_user: UserPrincipal) -> bool:
+    """افزودن لایک؛ True اگر تغییری ایجاد شد"""
+    # یک INSERT ... ON CONFLICT DO NOTHING؛ لایک تکراری نادیده گرفته می‌شود
+    changed = likes.add_like(db, current_user.id, tweet_id)
+    if not changed:
+        # قبلاً لایک شده یا توییت وجود ندارد (404)
+        get_tweet_by_id(db, tweet_id)
+    db.commit()
+    return changed
+
+
 @router.post("/tweets/{tweet_id}/likes", response_model=StatusResponse)
-def like_tweet(
+async def like_tweet(
     tweet_id: int,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user_by_api_key),
+    db: DBSession = Depends(get_db),
+    current_user: UserPrincipal = Depends(get_current_user_by_api_key),
 ) -> Any:
     """
     لایک کردن یک توییت.
     """
-    tweet = get_tweet_by_id(db, tweet_id)
-    
-    # بررسی کنید که آیا قبلاً لایک شده است
-    if current_user in tweet.likes:
-        return {"result": True} # قبلاً لایک شده، نیازی به عملیات نیست
-        
-    # اضافه کردن لایک (اضافه کردن کاربر به لیست لایک‌های توییت)
-    tweet.likes.append(current_user)
-    db.commit()
+    if await run_db(db, _like_tweet, tweet_id, current_user):
+        feed_cache.tweet_changed(tweet_id)
 
     return {"result": True}
 
 
 # 5. روتر آن‌لایک کردن توییت (DELETE /api/tweets/<id>/likes)
+def _unlike_tweet(db: Session, tweet_id: int, current_user: UserPrincipal) -> bool:
+    """حذف لایک؛ True اگر تغییری ایجاد شد"""
+    # یک DELETE؛ اگر لایکی نبود، نیازی به عملیات نیست
+    changed = likes.remove_like(db, current_user.id, tweet_id)
+    if not changed:
+        # لایک نشده یا توییت وجود ندارد (404)
+        get_tweet_by_id(db, tweet_id)
+    db.commit()
+    return changed
+
+
 @router.delete("/tweets/{tweet_id}/likes", response_model=StatusResponse)
-def unlike_tweet(
+async def unlike_tweet(
     tweet_id: int,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user_by_api_key),
+    db: DBSession = Depends(get_db),
+    current_user: UserPrincipal = Depends(get_current_user_by_api_key),
 ) -> Any:
     """
     حذف لایک یک توییت.
     """
-    tweet = get_tweet_by_id(db, tweet_id)
+    if await run_db(db, _unlike_tweet, tweet_id, current_user):
+        feed_cache.tweet_changed(tweet_id)
     
-    # بررسی کنید که آیا قبلاً لایک شده است
-    if current_user not in tweet.likes:
-        return {"result": True} # لایک نشده، نیازی به عملیات نیست
+    return {"result": True}
+
 
-    # حذف لایک (حذف کاربر از لیست لایک‌های توییت)
-    tweet.likes.remove(current_user)
+# 6. روتر لایک/آن‌لایک دسته‌ای (POST /api/tweets/likes/batch)
+def _apply_like_actions(
+    db: Session, actions: List[LikeAction], current_user: UserPrincipal
+) -> Tuple[List[dict], Set[int]]:
+    """اجرای عملیات‌ها به ترتیب در یک تراکنش؛ خروجی: (نتیجه هر عملیات، IDهای توییت تغییر کرده)"""
+    # وجود همه توییت‌ها با یک کوئری بررسی می‌شود
+    requested = {action.tweet_id for action in actions}
+    existing = set(
+        db.execute(select(models.Tweet.id).where(models.Tweet.id.in_(requested))).scalars()
+    )
+
+    results, changed_ids = [], set()
+    for action in actions:
+        if action.tweet_id not in existing:
+            outcome = "not_found"
+        else:
+            apply = likes.add_like if action.action == "like" else likes.remove_like
+            if apply(db, current_user.id, action.tweet_id):
+                changed_ids.add(action.tweet_id)
+                outcome = "ok"
+            else:
+                outcome = "unchanged"
+        results.append({"id": action.tweet_id, "action": action.action, "status": outcome})
     db.commit()
-    
-    return {"result": True}
+    return results, changed_ids
+
+
+@router.post("/tweets/likes/batch", response_model=BatchResponse)
+async def like_tweets_batch(
+    batch: LikeBatchRequest,
+    db: DBSession = Depends(get_db),
+    current_user: UserPrincipal = Depends(get_current_user_by_api_key),
+) -> Any:
+    """
+    اجرای لیستی از لایک/آن‌لایک‌ها در یک تراکنش (مثلاً بازپخش عملیات آفلاین کلاینت).
+    هر عملیات نتیجه جداگانه دارد؛ توییت ناموجود کل دسته را رد نمی‌کند.
+    """
+    results, changed_ids = await run_db(db, _apply_like_actions, batch.actions, current_user)
+    for tweet_id in changed_ids:
+        feed_cache.tweet_changed(tweet_id)
+
+    return {"result": True, "results": results}
@@ -1,13 +1,20 @@
 # src/api/user_profile.py
 
-from typing import Any
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Any, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
 from sqlalchemy import select, delete
 
-from ..db import models
-from ..schemas.user import User, StatusResponse, UserMe
-from .deps import get_db, get_current_user_by_api_key
+from ..core.auth_cache import UserPrincipal
+from ..core.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from ..core.responses import json_response
+from ..db import follows, models, timeline
+from ..db.session import DBSession, run_db
+from ..schemas.user import (
+    BatchResponse, FollowAction, FollowBatchRequest, User, StatusResponse, UserBatchResponse,
+    UserListResponse, UserMe, UserProfile,
+)
+from .deps import batch_ids, get_db, get_current_user_by_api_key
 
 router = APIRouter(tags=["User Profile and Follow"])
 
@@ -25,82 +32,205 @@ def get_user_by_id(db: Session, user_id: int) -> models.User:
 
 
 # 1. روتر دریافت پروفایل کاربر (GET /api/users/me)
+def _serialize_me(db: Session, current_user: UserPrincipal) -> UserMe:
+    """ساخت پاسخ پروفایل کاربر جاری (شامل شمارنده‌های followers/following)"""
+    user = get_user_by_id(db, current_user.id)
+    return UserMe.model_validate({"result": True, "user": user})
+
+
 @router.get("/users/me", response_model=UserMe)
-def read_user_me(
-    current_user: models.User = Depends(get_current_user_by_api_key),
+async def read_user_me(
+    db: DBSession = Depends(get_db),
+    current_user: UserPrincipal = Depends(get_current_user_by_api_key),
 ) -> Any:
     """
     دریافت اطلاعات پروفایل کاربر احراز هویت شده.
     """
-    # مدل User در شمای ما شامل followers و following است که SQLAlchemy به صورت خودکار پر می‌کند
-    return {"result": True, "user": current_user}
+    # لیست‌ها از طریق /users/<id>/followers و /users/<id>/following صفحه‌بندی می‌شوند
+    return json_response(await run_db(db, _serialize_me, current_user))
+
+
+# روتر دریافت دسته‌ای کاربران (GET /api/users/batch?ids=1&ids=2)
+# (قبل از /users/{user_id} تعریف می‌شود تا "batch" به عنوان user_id تطبیق نخورد)
+def _get_users_by_ids(db: Session, user_ids: List[int]) -> List[dict]:
+    """کاربران با یک کوئری، به ترتیب ورودی (IDهای ناموجود حذف می‌شوند)"""
+    rows = db.execute(
+        select(
+            models.User.id, models.User.name,
+            models.User.followers_count, models.User.following_count,
+        ).where(models.User.id.in_(user_ids))
+    ).all()
+    by_id = {row.id: row._asdict() for row in rows}
+    return [by_id[user_id] for user_id in user_ids if user_id in by_id]
+
+
+@router.get("/users/batch", response_model=UserBatchResponse)
+async def read_users_batch(
+    ids: List[int] = Depends(batch_ids),
+    db: DBSession = Depends(get_db),
+    current_user: UserPrincipal = Depends(get_current_user_by_api_key),
+) -> Any:
+    """
+    دریافت پروفایل عمومی چند کاربر با یک درخواست و یک کوئری.
+    """
+    users = await run_db(db, _get_users_by_ids, list(dict.fromkeys(ids)))
+
+    return json_response({"result": True, "users": users})
 
 
 # 2. روتر دریافت پروفایل کاربر دیگر (GET /api/users/<id>)
-@router.get("/users/{user_id}", response_model=UserMe)
-def read_user_profile(
+def _read_user_profile(db: Session, user_id: int) -> UserProfile:
+    user = get_user_by_id(db, user_id)
+    return UserProfile.model_validate({"result": True, "user": user})
+
+
+@router.get("/users/{user_id}", response_model=UserProfile)
+async def read_user_profile(
     user_id: int,
-    db: Session = Depends(get_db),
+    db: DBSession = Depends(get_db),
     # نیاز به احراز هویت برای دیدن پروفایل عمومی
-    current_user: models.User = Depends(get_current_user_by_api_key), 
+    current_user: UserPrincipal = Depends(get_current_user_by_api_key), 
 ) -> Any:
     """
     دریافت اطلاعات پروفایل یک کاربر دیگر.
     """
-    user = get_user_by_id(db, user_id)
-    return {"result": True, "user": user}
+    return json_response(await run_db(db, _read_user_profile, user_id))
 
 
 # 3. روتر فالو کردن (POST /api/users/<id>/follow)
-@router.post("/users/{user_id}/follow", response_model=StatusResponse)
-def follow_user(
-    user_id: int,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user_by_api_key),
-) -> Any:
-    """
-    دنبال کردن یک کاربر.
-    """
-    user_to_follow = get_user_by_id(db, user_id)
-    
+def _follow_user(db: Session, user_id: int, current_user: UserPrincipal) -> None:
     # اطمینان از اینکه کاربر خودش را دنبال نکند
-    if current_user.id == user_to_follow.id:
+    if current_user.id == user_id:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Cannot follow yourself."
         )
-    
-    # بررسی کنید که آیا قبلاً دنبال شده است
-    if user_to_follow in current_user.following:
-        # اگر قبلاً دنبال شده، موفقیت را برمی‌گردانیم
-        return {"result": True} 
-
-    # اگر دنبال نشده، اضافه می‌کنیم
-    current_user.following.append(user_to_follow)
+
+    # یک INSERT ... ON CONFLICT DO NOTHING؛ اگر قبلاً دنبال شده، تغییری نمی‌کند
+    if follows.add_follow(db, current_user.id, user_id):
+        timeline.backfill_follow(db, current_user.id, user_id)
+    else:
+        # قبلاً دنبال شده یا کاربر وجود ندارد (404)
+        get_user_by_id(db, user_id)
     db.commit()
 
+
+@router.post("/users/{user_id}/follow", response_model=StatusResponse)
+async def follow_user(
+    user_id: int,
+    db: DBSession = Depends(get_db),
+    current_user: UserPrincipal = Depends(get_current_user_by_api_key),
+) -> Any:
+    """
+    دنبال کردن یک کاربر.
+    """
+    await run_db(db, _follow_user, user_id, current_user)
+
     return {"result": True}
 
 
 # 4. روتر آنفالو کردن (DELETE /api/users/<id>/follow)
+def _unfollow_user(db: Session, user_id: int, current_user: UserPrincipal) -> None:
+    # یک DELETE؛ اگر دنبال نمی‌کند، تغییری نمی‌کند
+    if follows.remove_follow(db, current_user.id, user_id):
+        timeline.drop_follow(db, current_user.id, user_id)
+    else:
+        # دنبال نمی‌کند یا کاربر وجود ندارد (404)
+        get_user_by_id(db, user_id)
+    db.commit()
+
+
 @router.delete("/users/{user_id}/follow", response_model=StatusResponse)
-def unfollow_user(
+async def unfollow_user(
     user_id: int,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user_by_api_key),
+    db: DBSession = Depends(get_db),
+    current_user: UserPrincipal = Depends(get_current_user_by_api_key),
 ) -> Any:
     """
     لغو دنبال کردن یک کاربر.
     """
-    user_to_unfollow = get_user_by_id(db, user_id)
-    
-    # بررسی کنید که آیا کاربر، کاربر مورد نظر را دنبال می‌کند
-    if user_to_unfollow not in current_user.following:
-        # اگر دنبال نمی‌کند، موفقیت را برمی‌گردانیم
-        return {"result": True} 
+    await run_db(db, _unfollow_user, user_id, current_user)
+
+    return {"result": True}
 
-    # اگر دنبال می‌کند، حذف می‌کنیم
-    current_user.following.remove(user_to_unfollow)
+
+# روتر فالو/آنفالو دسته‌ای (POST /api/users/follows/batch)
+def _apply_follow_actions(
+    db: Session, actions: List[FollowAction], current_user: UserPrincipal
+) -> List[dict]:
+    """اجرای عملیات‌ها به ترتیب در یک تراکنش؛ نتیجه هر عملیات"""
+    # وجود همه کاربران با یک کوئری بررسی می‌شود
+    requested = {action.user_id for action in actions}
+    existing = set(
+        db.execute(select(models.User.id).where(models.User.id.in_(requested))).scalars()
+    )
+
+    results = []
+    for action in actions:
+        if action.user_id == current_user.id:
+            outcome = "invalid"
+        elif action.user_id not in existing:
+            outcome = "not_found"
+        elif action.action == "follow":
+            changed = follows.add_follow(db, current_user.id, action.user_id)
+            if changed:
+                timeline.backfill_follow(db, current_user.id, action.user_id)
+            outcome = "ok" if changed else "unchanged"
+        else:
+            changed = follows.remove_follow(db, current_user.id, action.user_id)
+            if changed:
+                timeline.drop_follow(db, current_user.id, action.user_id)
+            outcome = "ok" if changed else "unchanged"
+        results.append({"id": action.user_id, "action": action.action, "status": outcome})
     db.commit()
+    return results
 
-    return {"result": True}
+
+@router.post("/users/follows/batch", response_model=BatchResponse)
+async def follow_users_batch(
+    batch: FollowBatchRequest,
+    db: DBSession = Depends(get_db),
+    current_user: UserPrincipal = Depends(get_current_user_by_api_key),
+) -> Any:
+    """
+    اجرای لیستی از فالو/آنفالوها در یک تراکنش (مثلاً بازپخش عملیات آفلاین کلاینت).
+    هر عملیات نتیجه جداگانه دارد؛ کاربر ناموجود کل دسته را رد نمی‌کند.
+    """
+    results = await run_db(db, _apply_follow_actions, batch.actions, current_user)
+
+    return {"result": True, "results": results}
+
+
+# 5. روترهای لیست دنبال‌کنندگان و دنبال‌شوندگان (GET /api/users/<id>/followers, /following)
+def _list_users(db: Session, list_fn, user_id: int, limit: int, cursor: Optional[str]) -> dict:
+    get_user_by_id(db, user_id)
+    users, next_cursor = list_fn(db, user_id, limit=limit, cursor=cursor)
+    return {"result": True, "users": users, "next_cursor": next_cursor}
+
+
+@router.get("/users/{user_id}/followers", response_model=UserListResponse)
+async def read_followers(
+    user_id: int,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None),
+    db: DBSession = Depends(get_db),
+    current_user: UserPrincipal = Depends(get_current_user_by_api_key),
+) -> Any:
+    """
+    لیست صفحه‌بندی شده دنبال‌کنندگان یک کاربر (جدیدترین اول).
+    """
+    return json_response(await run_db(db, _list_users, follows.list_followers, user_id, limit, cursor))
+
+
+@router.get("/users/{user_id}/following", response_model=UserListResponse)
+async def read_following(
+    user_id: int,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None),
+    db: DBSession = Depends(get_db),
+    current_user: UserPrincipal = Depends(get_current_user_by_api_key),
+) -> Any:
+    """
+    لیست صفحه‌بندی شده کاربرانی که یک کاربر دنبال می‌کند (جدیدترین اول).
+    """
+    return json_response(await run_db(db, _list_users, follows.list_following, user_id, limit, cursor))
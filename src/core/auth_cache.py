@@ -0,0 +1,123 @@
+# src/core/auth_cache.py
+# کش API Key -> کاربر احراز هویت شده (principal)
+#
+# get_current_user_by_api_key روی تمام مسیرهای نوشتن و پروفایل اجرا می‌شود؛
+# با این کش، در حالت معمول احراز هویت بدون هیچ کوئری دیتابیس انجام می‌شود.
+# تغییر یا حذف کاربر از طریق ORM (رویدادهای after_update/after_delete) کاربر را
+# روی session علامت می‌زند و کش پس از commit همان session باطل می‌شود؛ ابطال در
+# زمان flush به درخواست هم‌زمان اجازه می‌داد principal قدیمی را پیش از commit دوباره
+# کش کند. دستورات UPDATE گروهی از این رویدادها عبور نمی‌کنند و تا پایان
+# TTL (AUTH_CACHE_TTL_SECONDS) معتبر می‌مانند.
+#
+# امضای توکن‌های JWT بدون دیتابیس تأیید می‌شود؛ کاربر صاحب توکن از دیتابیس
+# خوانده و حداکثر AUTH_CACHE_TTL_SECONDS در user_principals نگهداری می‌شود.
+# غیرفعال شدن کاربر User.token_version را (پایدار، در دیتابیس) افزایش می‌دهد؛
+# پس workerهای دیگر و پردازه راه‌اندازی‌شده دوباره هم پس از پایان این TTL
+# توکن‌های قبلی را نمی‌پذیرند و تغییر is_superuser هم به همین ترتیب اعمال می‌شود.
+
+from dataclasses import dataclass
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from .cache import TTLCache
+from .config import PerSettings, settings
+from ..db import models
+
+
+@dataclass(frozen=True)
+class UserPrincipal:
+    """نمای تغییرناپذیر کاربر احراز هویت شده (بدون وابستگی به Session)"""
+    id: int
+    name: str
+    email: str
+    api_key: str | None
+    is_active: bool
+    is_superuser: bool
+    token_version: int = 0
+
+    @classmethod
+    def from_user(cls, user: models.User) -> "UserPrincipal":
+        return cls(
+            id=user.id,
+            name=user.name,
+            email=user.email,
+            api_key=user.api_key,
+            is_active=user.is_active,
+            is_superuser=user.is_superuser,
+            token_version=user.token_version or 0,
+        )
+
+
+api_key_cache = PerSettings(lambda: TTLCache(
+    max_entries=settings.AUTH_CACHE_MAX_ENTRIES,
+    ttl=settings.AUTH_CACHE_TTL_SECONDS,
+))
+
+# user_id -> principal برای احراز هویت با توکن Bearer (TTL کوتاه؛ منبع اصلی دیتابیس است)
+user_principals = PerSettings(lambda: TTLCache(
+    max_entries=settings.AUTH_CACHE_MAX_ENTRIES,
+    ttl=settings.AUTH_CACHE_TTL_SECONDS,
+))
+
+
+# کلید کاربران تغییر کرده در انتظار commit روی session.info: {user_id: {api_key, ...}}
+_SESSION_KEY = "invalidated_users"
+
+
+def invalidate_user(user: models.User) -> None:
+    """
+    ابطال کاربر در کش پس از commit تراکنش جاری (شامل API Key قبلی در صورت تغییر آن).
+    کاربری که به session متصل نیست بلافاصله باطل می‌شود.
+    """
+    api_keys = {user.api_key}
+    state = inspect(user)
+    api_keys.update(state.attrs.api_key.history.deleted or ())
+    api_keys.discard(None)
+    session = state.session
+    if session is None:
+        _invalidate(user.id, api_keys)
+        return
+    session.info.setdefault(_SESSION_KEY, {}).setdefault(user.id, set()).update(api_keys)
+
+
+def _invalidate(user_id: int, api_keys) -> None:
+    for api_key in api_keys:
+        api_key_cache.pop(api_key)
+    user_principals.pop(user_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_on_commit(session: Session) -> None:
+    for user_id, api_keys in session.info.pop(_SESSION_KEY, {}).items():
+        _invalidate(user_id, api_keys)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(session: Session) -> None:
+    # تغییرات commit نشده‌اند؛ کش همچنان با دیتابیس یکسان است
+    session.info.pop(_SESSION_KEY, None)
+
+
+_PRINCIPAL_FIELDS = ("name", "email", "api_key", "is_active", "is_superuser", "token_version")
+
+
+@event.listens_for(models.User, "before_update")
+def _user_deactivating(mapper, connection, target):
+    # توکن‌های صادرشده پیش از غیرفعال‌سازی، پس از فعال شدن دوباره هم پذیرفته نمی‌شوند
+    history = inspect(target).attrs.is_active.history
+    if history.has_changes() and not target.is_active:
+        target.token_version = (target.token_version or 0) + 1
+
+
+@event.listens_for(models.User, "after_update")
+def _user_updated(mapper, connection, target):
+    # تغییر روابط (مثل following) در principal نیست و کش را باطل نمی‌کند
+    state = inspect(target)
+    if any(state.attrs[field].history.has_changes() for field in _PRINCIPAL_FIELDS):
+        invalidate_user(target)
+
+
+@event.listens_for(models.User, "after_delete")
+def _user_deleted(mapper, connection, target):
+    invalidate_user(target)
@@ -0,0 +1,364 @@
+# src/core/cache.py
+# کش صفحات سریال‌شده فید با ابطال (invalidation) مبتنی بر نوشتن
+#
+# بک‌اند پیش‌فرض یک LRU درون‌پردازه‌ای با TTL است. برای اشتراک کش بین
+# چند worker می‌توان از RedisCacheBackend استفاده کرد که با هر کلاینت
+# سازگار با redis-py (یا یک سرور محلی جایگزین) کار می‌کند.
+#
+# هر صفحه کش شده با ID توییت‌هایش برچسب (tag) می‌خورد تا لایک/آن‌لایک/حذف
+# فقط صفحات حاوی آن توییت را باطل کند. صفحه اول فید (بدون cursor) نسخه‌دار
+# است و ایجاد توییت جدید فقط نسخه آن را افزایش می‌دهد؛ صفحات بعدی در
+# صفحه‌بندی keyset با درج توییت جدید تغییر نمی‌کنند.
+#
+# هر ابطال شماره نسل (generation) بک‌اند را جلو می‌برد و نسل آخرین ابطال هر
+# برچسب را نگه می‌دارد. خواندنی که پیش از ابطال شروع شده (since) صفحه کهنه
+# خود را پس از آن ذخیره نمی‌کند.
+#
+# TTLCache یک کش عمومی درون‌پردازه‌ای برای اشیای پایتونی است (مثلاً کاربر
+# احراز هویت شده بر اساس API Key).
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Optional, Set, Tuple
+
+from .config import PerSettings, settings
+from .lazy import LazyClient
+
+
+class CacheBackend:
+    """رابط بک‌اند کش (کلید/مقدار bytes با TTL و برچسب)"""
+
+    # مدت نگهداری نسل ابطال هر برچسب؛ باید از طولانی‌ترین خواندن بیشتر باشد
+    INVALIDATION_MARK_TTL = 60.0
+
+    def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def set(
+        self, key: str, value: bytes, ttl: float, tags: Iterable[str] = (), since: Optional[int] = None
+    ) -> None:
+        """ذخیره مقدار؛ با since اگر یکی از tags پس از نسل since باطل شده باشد ذخیره نمی‌شود"""
+        raise NotImplementedError
+
+    def generation(self) -> int:
+        """نسل فعلی ابطال‌ها (پیش از خواندن داده گرفته و به set داده می‌شود)"""
+        raise NotImplementedError
+
+    def invalidate_tags(self, tags: Iterable[str]) -> None:
+        raise NotImplementedError
+
+    def incr(self, key: str) -> int:
+        raise NotImplementedError
+
+    def counter(self, key: str) -> int:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+
+class LRUCacheBackend(CacheBackend):
+    """کش LRU درون‌پردازه‌ای با TTL (thread-safe)"""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._data: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._key_tags: Dict[str, Set[str]] = {}
+        self._tag_keys: Dict[str, Set[str]] = {}
+        self._counters: Dict[str, int] = {}
+        self._generation = 0
+        # برچسب -> (نسل آخرین ابطال، زمان انقضا)، به ترتیب ابطال
+        self._invalidated: "OrderedDict[str, Tuple[int, float]]" = OrderedDict()
+
+    def _drop(self, key: str) -> None:
+        self._data.pop(key, None)
+        for tag in self._key_tags.pop(key, ()):
+            keys = self._tag_keys.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tag_keys[tag]
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                self._drop(key)
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(
+        self, key: str, value: bytes, ttl: float, tags: Iterable[str] = (), since: Optional[int] = None
+    ) -> None:
+        tags = set(tags)
+        with self._lock:
+            if since is not None and any(
+                self._invalidated.get(tag, (since,))[0] > since for tag in tags
+            ):
+                return
+            self._drop(key)
+            self._data[key] = (time.monotonic() + ttl, value)
+            if tags:
+                self._key_tags[key] = tags
+                for tag in tags:
+                    self._tag_keys.setdefault(tag, set()).add(key)
+            while len(self._data) > self.max_entries:
+                oldest = next(iter(self._data))
+                self._drop(oldest)
+
+    def invalidate_tags(self, tags: Iterable[str]) -> None:
+        with self._lock:
+            self._generation += 1
+            now = time.monotonic()
+            for tag in tags:
+                self._invalidated.pop(tag, None)
+                self._invalidated[tag] = (self._generation, now + self.INVALIDATION_MARK_TTL)
+                for key in list(self._tag_keys.get(tag, ())):
+                    self._drop(key)
+            while self._invalidated and next(iter(self._invalidated.values()))[1] < now:
+                self._invalidated.popitem(last=False)
+
+    def generation(self) -> int:
+        with self._lock:
+            return self._generation
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def counter(self, key: str) -> int:
+        with self._lock:
+            return self._counters.get(key, 0)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._key_tags.clear()
+            self._tag_keys.clear()
+            self._counters.clear()
+            self._invalidated.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class RedisCacheBackend(CacheBackend):
+    """
+    بک‌اند مشترک روی هر کلاینت سازگار با redis-py
+    (متدهای get/set/delete/incr/sadd/smembers/expire).
+    """
+
+    def __init__(self, client, prefix: str = "cache:"):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(self.prefix + key)
+
+    def _invalidated_since(self, tags: list, since: int) -> bool:
+        if not tags:
+            return False
+        marks = self.client.mget([f"{self.prefix}tag-generation:{tag}" for tag in tags])
+        return any(mark is not None and int(mark) > since for mark in marks)
+
+    def set(
+        self, key: str, value: bytes, ttl: float, tags: Iterable[str] = (), since: Optional[int] = None
+    ) -> None:
+        tags = list(tags)
+        if since is not None and self._invalidated_since(tags, since):
+            return
+        ttl_seconds = max(1, int(ttl))
+        self.client.set(self.prefix + key, value, ex=ttl_seconds)
+        for tag in tags:
+            tag_key = f"{self.prefix}tag:{tag}"
+            self.client.sadd(tag_key, key)
+            self.client.expire(tag_key, ttl_seconds)
+        # ابطالی که بین بررسی بالا و sadd علامت خورده ولی کلید را ندیده است
+        if since is not None and self._invalidated_since(tags, since):
+            self.client.delete(self.prefix + key)
+
+    def generation(self) -> int:
+        return int(self.client.get(self.prefix + "generation") or 0)
+
+    def invalidate_tags(self, tags: Iterable[str]) -> None:
+        tags = list(tags)
+        generation = self.client.incr(self.prefix + "generation")
+        # علامت پیش از حذف کلیدها نوشته می‌شود تا set همزمان آن را ببیند
+        for tag in tags:
+            self.client.set(
+                f"{self.prefix}tag-generation:{tag}", generation, ex=int(self.INVALIDATION_MARK_TTL)
+            )
+        for tag in tags:
+            tag_key = f"{self.prefix}tag:{tag}"
+            keys = self.client.smembers(tag_key)
+            if keys:
+                self.client.delete(*[
+                    self.prefix + (k.decode() if isinstance(k, bytes) else k) for k in keys
+                ])
+            self.client.delete(tag_key)
+
+    def incr(self, key: str) -> int:
+        return int(self.client.incr(self.prefix + key))
+
+    def counter(self, key: str) -> int:
+        return int(self.client.get(self.prefix + key) or 0)
+
+    def clear(self) -> None:
+        # بک‌اند مشترک توسط این پردازه پاک نمی‌شود
+        pass
+
+
+class TTLCache:
+    """کش LRU عمومی با TTL برای اشیای پایتونی (thread-safe) همراه با شمارنده hit/miss"""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                del self._data[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def __contains__(self, key: Hashable) -> bool:
+        """بررسی وجود کلید معتبر (بدون تأثیر بر شمارنده‌ها و ترتیب LRU)"""
+        with self._lock:
+            entry = self._data.get(key)
+            return entry is not None and entry[0] >= time.monotonic()
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "entries": len(self._data),
+            }
+
+
+class FeedCache:
+    """کش صفحات فید عمومی همراه با شمارنده‌های hit/miss"""
+
+    HEAD_VERSION_KEY = "feed:head-version"
+
+    def __init__(self, backend: Optional[CacheBackend], ttl: float):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    def page_key(self, limit: int, cursor: Optional[str]) -> str:
+        """کلید کش یک صفحه؛ صفحه اول شامل نسخه فعلی head است"""
+        if cursor:
+            return f"feed:page:{limit}:{cursor}"
+        return f"feed:head:{self.backend.counter(self.HEAD_VERSION_KEY)}:{limit}"
+
+    def get_page(self, key: str) -> Optional[bytes]:
+        value = self.backend.get(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def generation(self) -> int:
+        """پیش از خواندن صفحه از پایگاه داده گرفته و به set_page داده می‌شود"""
+        return self.backend.generation() if self.enabled else 0
+
+    def set_page(
+        self, key: str, body: bytes, tweet_ids: Iterable[int], since: Optional[int] = None
+    ) -> None:
+        """ذخیره صفحه، مگر اینکه یکی از توییت‌هایش پس از since باطل شده باشد (صفحه کهنه)"""
+        self.backend.set(key, body, self.ttl, tags=[f"tweet:{i}" for i in tweet_ids], since=since)
+
+    def tweet_created(self) -> None:
+        """توییت جدید فقط صفحه اول فید را تغییر می‌دهد"""
+        if self.enabled:
+            self.backend.incr(self.HEAD_VERSION_KEY)
+
+    def tweet_changed(self, tweet_id: int) -> None:
+        """ابطال صفحاتی که توییت (حذف شده یا لایک/آن‌لایک شده) را دارند"""
+        if self.enabled:
+            self.backend.invalidate_tags([f"tweet:{tweet_id}"])
+
+    def clear(self) -> None:
+        if self.enabled:
+            self.backend.clear()
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__ if self.backend else None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "entries": len(self.backend) if isinstance(self.backend, LRUCacheBackend) else None,
+        }
+
+
+def _build_backend() -> Optional[CacheBackend]:
+    """ساخت بک‌اند کش بر اساس تنظیمات"""
+    backend = settings.FEED_CACHE_BACKEND
+    if backend == "memory":
+        return LRUCacheBackend(max_entries=settings.FEED_CACHE_MAX_ENTRIES)
+    if backend == "redis":
+        url = settings.FEED_CACHE_REDIS_URL
+
+        def client():
+            # وابستگی اختیاری: فقط در صورت انتخاب بک‌اند redis و در اولین استفاده import می‌شود
+            import redis
+
+            return redis.Redis.from_url(url)
+
+        return RedisCacheBackend(LazyClient(client))
+    return None
+
+
+feed_cache = PerSettings(lambda: FeedCache(_build_backend(), ttl=settings.FEED_CACHE_TTL_SECONDS))
@@ -1,7 +1,21 @@
 # src/core/config.py
+#
+# هر برنامه (create_app(settings)) نمونه Settings خودش را دارد. settings در ماژول‌ها
+# یک پراکسی است که به تنظیمات برنامه جاری (ContextVar که middleware و lifespan
+# برنامه تنظیم می‌کنند) و بیرون از برنامه (CLIها، تست‌ها) به تنظیمات محیطی اشاره می‌کند.
+# اشیای ساخته شده از تنظیمات (کش‌ها، storage، executorها، engineها) با PerSettings
+# برای هر نمونه Settings جداگانه و در اولین استفاده ساخته می‌شوند.
 
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Generic, Iterator, Optional, Tuple, TypeVar
+
+from pydantic import model_validator
 from pydantic_settings import BaseSettings
 
+T = TypeVar("T")
+
 
 class Settings(BaseSettings):
     # تنظیمات پایگاه داده
@@ -11,14 +25,107 @@ class Settings(BaseSettings):
     POSTGRES_PORT: str = "5432"
     POSTGRES_DB: str = "fastapi_db"
 
-    # رشته اتصال به دیتابیس
-    SQLALCHEMY_DATABASE_URL: str
+    # رشته اتصال به دیتابیس (خالی = ساخته شده از POSTGRES_*)
+    SQLALCHEMY_DATABASE_URL: str = ""
+
+    # تنظیمات connection pool
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0  # ثانیه انتظار برای اتصال آزاد قبل از QueuePool limit
+    DB_POOL_RECYCLE: int = 1800  # ثانیه؛ اتصال‌های قدیمی‌تر بازسازی می‌شوند
+    DB_POOL_PRE_PING: bool = True
+
+    # حالت ناهمگام (AsyncEngine/AsyncSession)؛ رشته اتصال باید درایور async داشته باشد
+    DB_ASYNC: bool = False
+    SQLALCHEMY_ASYNC_DATABASE_URL: str = ""
+
+    # replica فقط‌خواندنی (اختیاری): درخواست‌های GET از آن خوانده می‌شوند
+    DB_REPLICA_URL: str = ""
+    DB_REPLICA_ASYNC_URL: str = ""
+    DB_REPLICA_STICKY_SECONDS: float = 5.0  # read-your-writes: پس از نوشتن، خواندن‌ها از primary
+    DB_REPLICA_MAX_LAG_SECONDS: float = 2.0  # تأخیر بیشتر = بازگشت به primary
+    DB_REPLICA_CHECK_INTERVAL: float = 1.0  # فاصله اندازه‌گیری تأخیر replica
+    DB_REPLICA_RETRY_SECONDS: float = 10.0  # مدت استفاده از primary پس از خطا یا تأخیر زیاد
 
-    # تنظیمات JWT (رمز عبور و الگوریتم)
+    # تنظیمات JWT (رمز عبور و الگوریتم)؛ تنها منبع این مقادیر برای صدور و تأیید توکن
     SECRET_KEY: str = "YOUR_SUPER_SECRET_KEY"  # این را باید در محیط واقعی تغییر دهید
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 7  # 7 روز
 
+    # تایم‌لاین خانگی: کاربرانی با فالوور بیشتر از این مقدار به جای fan-out هنگام نوشتن،
+    # در زمان خواندن (fan-out-on-read) در تایم‌لاین دنبال‌کنندگان ادغام می‌شوند
+    TIMELINE_FANOUT_MAX_FOLLOWERS: int = 10_000
+    # تعداد توییت‌های اخیر که پس از فالو کردن به تایم‌لاین اضافه می‌شوند
+    TIMELINE_FOLLOW_BACKFILL: int = 50
+
+    # کش صفحات فید: "memory" (LRU درون‌پردازه‌ای)، "redis" (مشترک) یا "none"
+    FEED_CACHE_BACKEND: str = "memory"
+    FEED_CACHE_TTL_SECONDS: float = 30.0
+    FEED_CACHE_MAX_ENTRIES: int = 1024
+    FEED_CACHE_REDIS_URL: str = "redis://localhost:6379/0"
+
+    # کش API Key -> کاربر
+    AUTH_CACHE_TTL_SECONDS: float = 60.0
+    AUTH_CACHE_MAX_ENTRIES: int = 10_000
+    # کش payloadهای JWT تأیید شده (تا زمان exp هر توکن)
+    TOKEN_CACHE_MAX_ENTRIES: int = 10_000
+
+    # هش رمز عبور (bcrypt)؛ تغییر ROUNDS باعث rehash خودکار در ورود بعدی می‌شود
+    PASSWORD_BCRYPT_ROUNDS: int = 12
+    HASHING_EXECUTOR: str = "thread"  # "thread" یا "process"
+    HASHING_WORKERS: int = 4
+    HASHING_MAX_PENDING: int = 64  # بیشتر از این، پاسخ 503
+
+    # رسانه‌ها: فایل‌ها با هش SHA-256 محتوا ذخیره می‌شوند (آپلودهای تکراری یک فایل مشترک دارند)
+    # بک‌اند ذخیره‌سازی: "local" (زیر MEDIA_ROOT) یا "s3" (هر object store سازگار با S3)
+    MEDIA_STORAGE_BACKEND: str = "local"
+    MEDIA_ROOT: str = "media"
+    MEDIA_S3_BUCKET: str = "media"
+    MEDIA_S3_ENDPOINT_URL: str = ""
+    MEDIA_S3_PREFIX: str = ""
+    MEDIA_MAX_UPLOAD_BYTES: int = 10 * 1024 * 1024  # بیشتر از این، پاسخ 413
+    MEDIA_UPLOAD_CHUNK_BYTES: int = 64 * 1024
+    # نسخه‌های کوچک‌شده تصویر (بیشترین طول ضلع) که در پس‌زمینه ساخته می‌شوند؛
+    # FORMAT خالی یعنی همان فرمت اصلی، وگرنه re-encode (مثلاً "WEBP" یا "JPEG")
+    MEDIA_THUMBNAIL_SIZE: int = 160
+    MEDIA_MEDIUM_SIZE: int = 640
+    MEDIA_DERIVATIVE_FORMAT: str = ""
+    MEDIA_DERIVATIVE_EXECUTOR: str = "process"  # "process" یا "thread"
+    MEDIA_DERIVATIVE_WORKERS: int = 2
+    MEDIA_DERIVATIVE_MAX_PENDING: int = 32  # بیشتر از این، ساخت به درخواست بعدی موکول می‌شود
+    # کش media_id -> مسیر/نوع فایل برای GET /medias/{id}
+    MEDIA_CACHE_TTL_SECONDS: float = 3600.0
+    MEDIA_CACHE_MAX_ENTRIES: int = 10_000
+
+    # پنجره هشتگ‌های پرطرفدار (دقیقه؛ شمارش در سطل‌های یک دقیقه‌ای hashtag_bucket)
+    TRENDING_WINDOW_MINUTES: int = 60
+    # فاصله نوشتن سطل‌های درون حافظه در hashtag_bucket (ثانیه)
+    TRENDING_FLUSH_SECONDS: float = 5.0
+    # مدت نگهداری نتیجه trending در حافظه هر پردازه (0 = بدون کش)
+    TRENDING_CACHE_TTL_SECONDS: float = 30.0
+
+    # تعداد لایک‌کنندگان نمایش داده شده برای هر توییت در فیدها (تعداد کل از like_count)
+    FEED_LIKERS_PREVIEW: int = 5
+
+    # بیشترین تعداد عملیات/ID در endpointهای دسته‌ای
+    BATCH_MAX_ITEMS: int = 100
+
+    # سریال‌سازی مستقیم پاسخ‌های فید و پروفایل با orjson، بدون اعتبارسنجی دوباره response_model
+    FAST_JSON_RESPONSES: bool = False
+
+    # سنجه‌های درخواست/SQL و endpoint /metrics (قالب متنی Prometheus)
+    METRICS_ENABLED: bool = True
+    # مسیرهای /internal/* (آمار کش، pool، هش و صف تصاویر) بدون احراز هویت‌اند؛
+    # فقط روی شبکه داخلی/محیط توسعه روشن شوند
+    INTERNAL_ENDPOINTS_ENABLED: bool = False
+
+    # پروفایل SQL: لاگ کوئری‌های کندتر از این مقدار (0 = خاموش)
+    SQL_SLOW_QUERY_MS: float = 200.0
+    # تکرار یک شکل کوئری در یک درخواست به این تعداد = N+1 احتمالی (0 = خاموش)
+    SQL_REPEATED_STATEMENT_THRESHOLD: int = 10
+    # به جای لاگ هشدار، QueryBudgetExceeded (برای تست‌ها و محیط توسعه)
+    SQL_PROFILING_STRICT: bool = False
+
     # نام و آدرس پروژه
     PROJECT_NAME: str = "FastAPI Skillbox Project"
 
@@ -26,11 +133,113 @@ class Settings(BaseSettings):
     class Config:
         case_sensitive = True
 
+    @model_validator(mode="after")
+    def _database_urls(self) -> "Settings":
+        """محاسبه رشته‌های اتصال خالی از POSTGRES_* (مقدار صریح محیطی حفظ می‌شود)"""
+        server = f"{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}@{self.POSTGRES_SERVER}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
+        self.SQLALCHEMY_DATABASE_URL = self.SQLALCHEMY_DATABASE_URL or f"postgresql+psycopg2://{server}"
+        self.SQLALCHEMY_ASYNC_DATABASE_URL = self.SQLALCHEMY_ASYNC_DATABASE_URL or f"postgresql+asyncpg://{server}"
+        return self
+
+
+# تنظیمات برنامه‌ای که درخواست/startup جاری به آن تعلق دارد
+_current: ContextVar[Optional[Settings]] = ContextVar("settings", default=None)
+# تنظیمات محیطی پیش‌فرض؛ در اولین استفاده خوانده می‌شود، نه در زمان import
+_default: Optional[Settings] = None
+_default_lock = threading.Lock()
+
+
+def get_settings() -> Settings:
+    """تنظیمات برنامه جاری، یا بیرون از هر برنامه، تنظیمات محیطی پیش‌فرض"""
+    global _default
+    current = _current.get()
+    if current is not None:
+        return current
+    if _default is None:
+        with _default_lock:
+            if _default is None:
+                _default = Settings()
+    return _default
+
+
+@contextmanager
+def use_settings(app_settings: Settings) -> Iterator[Settings]:
+    """اجرای یک بلوک با تنظیمات یک برنامه (middleware و lifespan برنامه)"""
+    token = _current.set(app_settings)
+    try:
+        yield app_settings
+    finally:
+        _current.reset(token)
+
+
+class _Proxy:
+    """ارجاع دسترسی به attributeها، فراخوانی و عملگرهای دیکشنری به شیء resolve()"""
+
+    def resolve(self) -> Any:
+        raise NotImplementedError
+
+    def __getattr__(self, name: str) -> Any:
+        # فقط برای attributeهایی صدا زده می‌شود که روی خود پراکسی نیستند
+        return getattr(self.resolve(), name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        if name.startswith("_"):
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self.resolve(), name, value)
+
+    def __call__(self, *args, **kwargs) -> Any:
+        return self.resolve()(*args, **kwargs)
+
+    def __getitem__(self, key):
+        return self.resolve()[key]
+
+    def __setitem__(self, key, value) -> None:
+        self.resolve()[key] = value
+
+    def __contains__(self, key) -> bool:
+        return key in self.resolve()
+
+    def __iter__(self):
+        return iter(self.resolve())
+
+    def __len__(self) -> int:
+        return len(self.resolve())
+
+    def __repr__(self) -> str:
+        return repr(self.resolve())
+
+
+class _CurrentSettings(_Proxy):
+    def resolve(self) -> Settings:
+        return get_settings()
+
+
+class PerSettings(_Proxy, Generic[T]):
+    """
+    پراکسی یک شیء ساخته شده از تنظیمات: factory() برای هر نمونه Settings یک بار
+    (با همان تنظیمات به عنوان settings جاری) صدا زده می‌شود (thread-safe).
+    """
+
+    def __init__(self, factory: Callable[[], T]):
+        self._factory = factory
+        self._lock = threading.Lock()
+        # id(Settings) -> (Settings، شیء)؛ Settings نگه داشته می‌شود تا id آن دوباره استفاده نشود
+        self._instances: Dict[int, Tuple[Settings, T]] = {}
+
+    def resolve(self, app_settings: Optional[Settings] = None) -> T:
+        if app_settings is None:
+            app_settings = get_settings()
+        entry = self._instances.get(id(app_settings))
+        if entry is None:
+            with self._lock:
+                entry = self._instances.get(id(app_settings))
+                if entry is None:
+                    with use_settings(app_settings):
+                        entry = (app_settings, self._factory())
+                    self._instances[id(app_settings)] = entry
+        return entry[1]
 
-# ایجاد یک نمونه از کلاس Settings برای استفاده در سراسر برنامه
-settings = Settings()
 
-# محاسبه SQLALCHEMY_DATABASE_URL پس از بارگذاری تنظیمات
-settings.SQLALCHEMY_DATABASE_URL = (
-    f"postgresql://{settings.POSTGRES_USER}:{settings.POSTGRES_PASSWORD}@{settings.POSTGRES_SERVER}:{settings.POSTGRES_PORT}/{settings.POSTGRES_DB}"
-)
\ No newline at end of file
+# تنظیمات برنامه جاری برای استفاده در سراسر برنامه (import بدون خواندن متغیرهای محیطی)
+settings: Settings = _CurrentSettings()  # type: ignore[assignment]
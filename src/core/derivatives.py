@@ -0,0 +1,212 @@
+# src/core/derivatives.py
+# ساخت نسخه‌های کوچک‌شده تصویر (thumb/medium) روی یک process pool محدود
+#
+# پس از آپلود، ساخت نسخه‌ها در پس‌زمینه صف می‌شود. اگر نسخه‌ای هنوز ساخته نشده
+# باشد (صف پر بوده، یا رسانه قبل از این قابلیت آپلود شده)، GET /medias/{id}?variant=
+# فایل اصلی را برمی‌گرداند و ساخت را به صورت lazy صف می‌کند.
+#
+# کلید هر نسخه از کلید فایل اصلی، نام نسخه و فرمت خروجی ساخته می‌شود؛ تغییر
+# MEDIA_DERIVATIVE_FORMAT نسخه‌های جدید می‌سازد و نسخه‌های قدیمی را اشتباه سرو نمی‌کند.
+
+import contextvars
+import os
+import tempfile
+import threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from .cache import TTLCache
+from .config import PerSettings, settings
+from .storage import MediaStorage
+
+def variants() -> Dict[str, int]:
+    """نام نسخه -> بیشترین طول ضلع (پیکسل) از تنظیمات برنامه جاری"""
+    return {
+        "thumb": settings.MEDIA_THUMBNAIL_SIZE,
+        "medium": settings.MEDIA_MEDIUM_SIZE,
+    }
+
+
+def variant_key(source_key: str, variant: str) -> str:
+    """کلید ذخیره‌سازی یک نسخه"""
+    fmt = settings.MEDIA_DERIVATIVE_FORMAT.lower() or "orig"
+    return f"{source_key}.{variant}.{fmt}"
+
+
+def variant_media_type(file_type: Optional[str]) -> Optional[str]:
+    """نوع محتوای نسخه‌ها (در صورت re-encode، فرمت خروجی)"""
+    fmt = settings.MEDIA_DERIVATIVE_FORMAT.lower()
+    return f"image/{fmt}" if fmt else file_type
+
+
+def render_variants(source_path: str, targets: List[Tuple[str, int]], fmt: str) -> bool:
+    """
+    ساخت همه نسخه‌های یک تصویر (در پردازه worker اجرا می‌شود).
+    targets: [(target_path, max_size)] از بزرگ به کوچک؛ هر نسخه از نسخه قبلی
+    کوچک می‌شود تا تصویر اصلی فقط یک بار decode شود. برای فایل غیرتصویری یا تصویر
+    بیش از حد بزرگ False؛ خطاهای دیگر (مثلاً I/O) بالا می‌روند تا درخواست بعدی دوباره تلاش کند.
+    """
+    try:
+        from PIL import Image, ImageOps, UnidentifiedImageError
+    except ImportError:
+        return False
+
+    try:
+        with Image.open(source_path) as original:
+            save_format = fmt or original.format
+            image = ImageOps.exif_transpose(original)
+            for target_path, max_size in sorted(targets, key=lambda t: -t[1]):
+                image.thumbnail((max_size, max_size))
+                output = image
+                if save_format.upper() == "JPEG" and output.mode not in ("RGB", "L"):
+                    output = output.convert("RGB")
+                output.save(target_path, format=save_format, optimize=True)
+    except (UnidentifiedImageError, Image.DecompressionBombError):
+        return False
+    return True
+
+
+class DerivativePool:
+    """صف محدود ساخت نسخه‌ها؛ در صورت پر بودن صف، کار رد می‌شود (ساخت lazy بعداً جبران می‌کند)"""
+
+    def __init__(self, workers: int, max_pending: int, kind: str = "process"):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.kind = kind
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+        # کلید فایل اصلی -> Future کار در حال اجرا (جلوگیری از ساخت تکراری هم‌زمان)
+        self._inflight: Dict[str, Future] = {}
+        # فایل‌هایی که تصویر قابل decode نیستند دوباره صف نمی‌شوند (خطاهای گذرا کش نمی‌شوند)
+        self._unsupported = TTLCache(max_entries=10_000, ttl=3600)
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def _get_executor(self) -> Executor:
+        # executor در اولین استفاده ساخته می‌شود (بدون side effect در زمان import)
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    if self.kind == "process":
+                        self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                    else:
+                        self._executor = ThreadPoolExecutor(
+                            max_workers=self.workers, thread_name_prefix="derivatives"
+                        )
+        return self._executor
+
+    def schedule(
+        self, storage: MediaStorage, source_key: str, file_type: Optional[str]
+    ) -> Optional[Future]:
+        """
+        صف کردن ساخت نسخه‌های ناموجود یک رسانه (I/O همگام؛ در threadpool صدا زده می‌شود).
+        Future کار یا None (غیرتصویری، در حال اجرا، موجود یا صف پر).
+        """
+        if not (file_type or "").startswith("image/") or source_key in self._unsupported:
+            return None
+        missing = [
+            (variant_key(source_key, name), size)
+            for name, size in variants().items()
+            if not storage.exists(variant_key(source_key, name))
+        ]
+        if not missing:
+            return None
+        with self._lock:
+            if source_key in self._inflight:
+                return None
+            if len(self._inflight) >= self.max_pending:
+                self.rejected += 1
+                return None
+            # جای کار قبل از I/O رزرو می‌شود تا درخواست‌های هم‌زمان دوباره صف نکنند
+            self._inflight[source_key] = Future()
+
+        temp_files: List[str] = []
+        try:
+            source_path = storage.local_path(source_key)
+            if source_path is None:
+                # object store: worker فقط فایل محلی می‌خواند
+                source_path = self._temp_path(storage, temp_files)
+                with storage.open(source_key) as body, open(source_path, "wb") as target:
+                    while chunk := body.read(settings.MEDIA_UPLOAD_CHUNK_BYTES):
+                        target.write(chunk)
+            targets = [(self._temp_path(storage, temp_files), size) for _, size in missing]
+            future = self._get_executor().submit(
+                render_variants, source_path, targets, settings.MEDIA_DERIVATIVE_FORMAT
+            )
+        except BaseException:
+            self._cleanup(temp_files)
+            with self._lock:
+                self._inflight.pop(source_key, None)
+            raise
+
+        with self._lock:
+            self._inflight[source_key] = future
+            self.submitted += 1
+        # callback در نخ executor اجرا می‌شود؛ با تنظیمات برنامه‌ای که کار را صف کرده است
+        context = contextvars.copy_context()
+        future.add_done_callback(
+            lambda done: context.run(self._finish, done, storage, source_key, missing, targets, temp_files)
+        )
+        return future
+
+    @staticmethod
+    def _temp_path(storage: MediaStorage, temp_files: List[str]) -> str:
+        fd, path = tempfile.mkstemp(dir=storage.temp_dir, prefix=".variant-")
+        os.close(fd)
+        temp_files.append(path)
+        return path
+
+    @staticmethod
+    def _cleanup(temp_files: List[str]) -> None:
+        for path in temp_files:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _finish(self, future: Future, storage, source_key, missing, targets, temp_files) -> None:
+        """انتقال خروجی‌ها به storage (در نخ executor پس از پایان کار)"""
+        try:
+            ok = not future.cancelled() and future.exception() is None and future.result()
+            if ok:
+                for (key, _), (path, _) in zip(missing, targets):
+                    storage.put_file(key, path)
+            elif not future.cancelled() and future.exception() is None:
+                # فقط نتیجه قطعی render_variants (تصویر نیست/بمب decompression)
+                self._unsupported.set(source_key, True)
+        except Exception:
+            ok = False
+        finally:
+            self._cleanup(temp_files)
+            with self._lock:
+                self._inflight.pop(source_key, None)
+                if ok:
+                    self.completed += 1
+                else:
+                    self.failed += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "kind": self.kind,
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "pending": len(self._inflight),
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+            }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+
+derivative_pool = PerSettings(lambda: DerivativePool(
+    workers=settings.MEDIA_DERIVATIVE_WORKERS,
+    max_pending=settings.MEDIA_DERIVATIVE_MAX_PENDING,
+    kind=settings.MEDIA_DERIVATIVE_EXECUTOR,
+))
@@ -0,0 +1,108 @@
+# src/core/hashing.py
+# اجرای هش bcrypt روی یک executor اختصاصی با اندازه محدود
+#
+# هش/بررسی رمز عبور (حدود 250ms) روی threadpool مشترک Starlette اجرا نمی‌شود تا
+# هجوم ورود، درخواست‌های سبک (مثل GET /tweets) را پشت خود معطل نکند. اگر تعداد
+# عملیات در انتظار از HASHING_MAX_PENDING بیشتر شود، درخواست بلافاصله با 503 رد می‌شود.
+
+import asyncio
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import HTTPException, status
+
+from .config import PerSettings, settings
+
+
+class _OperationStats:
+    """آمار تأخیر یک نوع عملیات (hash یا verify)"""
+
+    def __init__(self):
+        self.count = 0
+        self.rejected = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "rejected": self.rejected,
+            "avg_ms": round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            "max_ms": round(self.max * 1000, 3),
+        }
+
+
+class HashingPool:
+    """executor محدود برای عملیات سنگین CPU همراه با کنترل پذیرش (admission control)"""
+
+    def __init__(self, workers: int, max_pending: int, kind: str = "thread"):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.kind = kind
+        self.pending = 0
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+        self._stats: Dict[str, _OperationStats] = {}
+
+    def _get_executor(self) -> Executor:
+        # executor در اولین استفاده ساخته می‌شود (بدون side effect در زمان import)
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    if self.kind == "process":
+                        self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                    else:
+                        self._executor = ThreadPoolExecutor(
+                            max_workers=self.workers, thread_name_prefix="hashing"
+                        )
+        return self._executor
+
+    async def run(self, operation: str, fn: Callable[..., Any], *args) -> Any:
+        """اجرای fn(*args) روی executor؛ در صورت اشباع، HTTP 503"""
+        with self._lock:
+            stats = self._stats.setdefault(operation, _OperationStats())
+            if self.pending >= self.max_pending:
+                stats.rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Authentication service is busy, please retry.",
+                    headers={"Retry-After": "1"},
+                )
+            self.pending += 1
+
+        start = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.pending -= 1
+                stats.count += 1
+                stats.total += elapsed
+                stats.max = max(stats.max, elapsed)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "kind": self.kind,
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "pending": self.pending,
+                "operations": {name: s.snapshot() for name, s in self._stats.items()},
+            }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+
+hashing_pool = PerSettings(lambda: HashingPool(
+    workers=settings.HASHING_WORKERS,
+    max_pending=settings.HASHING_MAX_PENDING,
+    kind=settings.HASHING_EXECUTOR,
+))
@@ -0,0 +1,25 @@
+# src/core/lazy.py
+# ساخت کلاینت‌های سنگین (boto3، redis) در اولین استفاده به جای زمان import/راه‌اندازی
+
+import threading
+from typing import Any, Callable
+
+
+class LazyClient:
+    """پراکسی که factory را در اولین دسترسی به یک attribute صدا می‌زند (thread-safe)"""
+
+    def __init__(self, factory: Callable[[], Any]):
+        self._factory = factory
+        self._client = None
+        self._lock = threading.Lock()
+
+    def resolve(self) -> Any:
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._factory()
+        return self._client
+
+    def __getattr__(self, name: str) -> Any:
+        # فقط برای attributeهایی صدا زده می‌شود که روی خود پراکسی نیستند
+        return getattr(self.resolve(), name)
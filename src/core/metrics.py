@@ -0,0 +1,231 @@
+# src/core/metrics.py
+# سنجه‌های درخواست‌ها و کوئری‌های SQL با خروجی متنی Prometheus
+#
+# MetricsMiddleware (یک middleware خام ASGI، بدون سربار BaseHTTPMiddleware) زمان
+# هر درخواست را بر اساس الگوی route (مثلاً /tweets/{tweet_id}) و کد وضعیت در
+# هیستوگرام ثبت می‌کند. رویدادهای before/after_cursor_execute روی همه Engineها
+# تعداد و زمان کوئری‌ها را در RequestStats درخواست جاری (contextvar) جمع می‌کنند؛
+# contextvar همراه درخواست به threadpool و run_sync (greenlet) منتقل می‌شود.
+
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# حد بالای سطل‌ها (ثانیه) برای زمان پاسخ
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# حد بالای سطل‌ها برای تعداد کوئری در هر درخواست
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class RequestStats:
+    """آمار SQL یک درخواست (در contextvar نگهداری می‌شود)"""
+
+    __slots__ = ("scope", "queries", "db_time", "budget", "shapes", "reported")
+
+    def __init__(self, scope=None):
+        self.scope = scope
+        self.queries = 0
+        self.db_time = 0.0
+        # سقف کوئری اعلام شده توسط route (profiling.QueryBudget)؛ None یعنی بدون سقف
+        self.budget: Optional[int] = None
+        # تعداد تکرار هر متن SQL در این درخواست (تشخیص N+1)
+        self.shapes: Dict[str, int] = {}
+        self.reported: set = set()
+
+    @property
+    def route(self) -> str:
+        return _route_template(self.scope) if self.scope is not None else "-"
+
+
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+
+class Histogram:
+    """هیستوگرام تجمعی با سطل‌های ثابت (مثل Prometheus)"""
+
+    __slots__ = ("bounds", "counts", "total", "count")
+
+    def __init__(self, bounds: Iterable[float]):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+def _format_labels(labels: Labels, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_bound(bound: float) -> str:
+    return str(int(bound)) if float(bound).is_integer() else repr(bound)
+
+
+class MetricsRegistry:
+    """شمارنده‌ها و هیستوگرام‌های برچسب‌دار (thread-safe)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # name -> (help, {labels: value}) و name -> (help, bounds, {labels: Histogram})
+        self._counters: Dict[str, Tuple[str, Dict[Labels, float]]] = {}
+        self._histograms: Dict[str, Tuple[str, Tuple[float, ...], Dict[Labels, Histogram]]] = {}
+
+    def counter(self, name: str, help_text: str) -> None:
+        self._counters.setdefault(name, (help_text, {}))
+
+    def histogram(self, name: str, help_text: str, bounds: Iterable[float]) -> None:
+        self._histograms.setdefault(name, (help_text, tuple(bounds), {}))
+
+    def inc(self, name: str, labels: Labels, amount: float = 1.0) -> None:
+        with self._lock:
+            values = self._counters[name][1]
+            values[labels] = values.get(labels, 0.0) + amount
+
+    def observe(self, name: str, labels: Labels, value: float) -> None:
+        with self._lock:
+            _, bounds, series = self._histograms[name]
+            histogram = series.get(labels)
+            if histogram is None:
+                histogram = series[labels] = Histogram(bounds)
+            histogram.observe(value)
+
+    def value(self, name: str, labels: Labels) -> float:
+        with self._lock:
+            if name in self._counters:
+                return self._counters[name][1].get(labels, 0.0)
+            histogram = self._histograms[name][2].get(labels)
+            return histogram.count if histogram else 0
+
+    def reset(self) -> None:
+        with self._lock:
+            for _, values in self._counters.values():
+                values.clear()
+            for _, _, series in self._histograms.values():
+                series.clear()
+
+    def render(self) -> str:
+        """خروجی text exposition format نسخه 0.0.4"""
+        lines: List[str] = []
+        with self._lock:
+            for name, (help_text, values) in self._counters.items():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} counter")
+                for labels, value in values.items():
+                    lines.append(f"{name}{_format_labels(labels)} {value!r}")
+            for name, (help_text, bounds, series) in self._histograms.items():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} histogram")
+                for labels, histogram in series.items():
+                    cumulative = 0
+                    for bound, count in zip(bounds, histogram.counts):
+                        cumulative += count
+                        le = f'le="{_format_bound(bound)}"'
+                        lines.append(f"{name}_bucket{_format_labels(labels, le)} {cumulative}")
+                    inf = _format_labels(labels, 'le="+Inf"')
+                    lines.append(f"{name}_bucket{inf} {histogram.count}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {histogram.total!r}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template and status.", LATENCY_BUCKETS
+)
+registry.counter("db_queries_total", "SQL statements executed, by route.")
+registry.counter("db_query_duration_seconds_total", "Time spent in SQL statements, by route.")
+registry.histogram(
+    "db_queries_per_request", "SQL statements executed per HTTP request, by route.", QUERY_COUNT_BUCKETS
+)
+registry.counter("db_queries_outside_request_total", "SQL statements executed outside an HTTP request.")
+
+
+# --- رویدادهای SQLAlchemy (همه Engineها، از جمله sync_engine موتورهای async) ---
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+# توابعی که پس از هر کوئری صدا زده می‌شوند: fn(stats, statement, parameters, elapsed)
+# (stats برای کوئری‌های خارج از درخواست None است؛ profiling.py از این نقطه استفاده می‌کند)
+query_observers: List[Callable[[Optional[RequestStats], str, Any, float], None]] = []
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    stats = current_request.get()
+    if stats is None:
+        registry.inc("db_queries_outside_request_total", ())
+    else:
+        stats.queries += 1
+        stats.db_time += elapsed
+    for observer in query_observers:
+        observer(stats, statement, parameters, elapsed)
+
+
+# --- middleware ---
+
+def _route_template(scope) -> str:
+    route = scope.get("route")
+    # مسیرهای بدون route (404) در یک برچسب جمع می‌شوند تا تعداد سری‌ها محدود بماند
+    return getattr(route, "path_format", None) or getattr(route, "path", None) or "unmatched"
+
+
+class MetricsMiddleware:
+    """ثبت زمان، کد وضعیت و آمار SQL هر درخواست HTTP"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(scope)
+        token = current_request.set(stats)
+        status_code = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            current_request.reset(token)
+            route = stats.route
+            registry.observe(
+                "http_request_duration_seconds",
+                (("method", scope["method"]), ("route", route), ("status", str(status_code))),
+                elapsed,
+            )
+            route_labels = (("route", route),)
+            registry.observe("db_queries_per_request", route_labels, stats.queries)
+            if stats.queries:
+                registry.inc("db_queries_total", route_labels, stats.queries)
+                registry.inc("db_query_duration_seconds_total", route_labels, stats.db_time)
@@ -0,0 +1,64 @@
+# src/core/pagination.py
+# ابزارهای صفحه‌بندی keyset (cursor-based)
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, Tuple
+
+from fastapi import HTTPException, status
+
+# محدوده مجاز برای اندازه صفحه
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(*values: Any) -> str:
+    """
+    ساخت یک cursor مبهم (opaque) از مقادیر کلید مرتب‌سازی آخرین سطر صفحه.
+    datetime ها به صورت ISO ذخیره می‌شوند.
+    """
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> list:
+    """دیکد کردن cursor؛ در صورت نامعتبر بودن، خطای 400 برمی‌گرداند."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list):
+            raise ValueError("cursor payload must be a list")
+        return values
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor."
+        )
+
+
+def decode_time_cursor(cursor: str) -> Tuple[datetime, int]:
+    """دیکد کردن cursor از نوع (created_at, id)"""
+    values = decode_cursor(cursor)
+    try:
+        created_at, row_id = values
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (TypeError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor."
+        )
+
+
+def decode_score_cursor(cursor: str) -> Tuple[float, int]:
+    """دیکد کردن cursor از نوع (score, id) برای نتایج رتبه‌بندی شده"""
+    values = decode_cursor(cursor)
+    try:
+        score, row_id = values
+        return float(score), int(row_id)
+    except (TypeError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor."
+        )
@@ -0,0 +1,162 @@
+# src/core/profiling.py
+# پروفایل کوئری‌های SQL: لاگ کوئری‌های کند، تشخیص N+1 و سقف تعداد کوئری
+#
+# روی همان رویداد after_cursor_execute که metrics.py ثبت می‌کند سوار می‌شود
+# (metrics.query_observers) و از RequestStats درخواست جاری استفاده می‌کند:
+# - کوئری‌های کندتر از SQL_SLOW_QUERY_MS با پارامترها و الگوی route لاگ می‌شوند.
+# - اگر یک متن SQL (با placeholderها، یعنی شکل کوئری) در یک درخواست
+#   SQL_REPEATED_STATEMENT_THRESHOLD بار تکرار شود، N+1 گزارش می‌شود.
+# - routeها با Depends(QueryBudget(n)) و تست‌ها با query_budget(n) سقف تعریف می‌کنند.
+# با SQL_PROFILING_STRICT (مثلاً در تست‌ها) به جای لاگ، QueryBudgetExceeded رخ می‌دهد.
+
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .config import settings
+from .metrics import RequestStats, current_request, query_observers, registry
+
+logger = logging.getLogger(__name__)
+
+MAX_LOGGED_PARAMETERS = 500
+
+registry.counter("db_slow_queries_total", "SQL statements slower than SQL_SLOW_QUERY_MS, by route.")
+registry.counter("db_repeated_statements_total", "Requests that repeated one SQL statement shape past the threshold, by route.")
+registry.counter("db_query_budget_exceeded_total", "Requests that exceeded their declared query budget, by route.")
+
+
+class QueryBudgetExceeded(RuntimeError):
+    """تعداد یا تکرار کوئری‌ها از سقف اعلام شده بیشتر شد"""
+
+
+def _format_parameters(parameters: Any) -> str:
+    text = repr(parameters)
+    if len(text) > MAX_LOGGED_PARAMETERS:
+        return text[:MAX_LOGGED_PARAMETERS] + "..."
+    return text
+
+
+def _shorten(statement: str) -> str:
+    return " ".join(statement.split())
+
+
+def _violation(stats: RequestStats, key: str, counter: str, message: str) -> None:
+    """هر نوع تخلف یک بار در هر درخواست گزارش می‌شود"""
+    if key in stats.reported:
+        return
+    stats.reported.add(key)
+    route = stats.route
+    registry.inc(counter, (("route", route),))
+    if settings.SQL_PROFILING_STRICT:
+        raise QueryBudgetExceeded(f"{route}: {message}")
+    logger.warning("%s: %s", route, message)
+
+
+def _observe(stats: Optional[RequestStats], statement: str, parameters: Any, elapsed: float) -> None:
+    route = stats.route if stats is not None else "-"
+
+    if settings.SQL_SLOW_QUERY_MS and elapsed * 1000 >= settings.SQL_SLOW_QUERY_MS:
+        registry.inc("db_slow_queries_total", (("route", route),))
+        logger.warning(
+            "slow query (%.1f ms) on %s: %s parameters=%s",
+            elapsed * 1000, route, _shorten(statement), _format_parameters(parameters),
+        )
+
+    if _active_profiles:
+        with _profiles_lock:
+            for profile in _active_profiles:
+                profile.statements.append(statement)
+
+    if stats is None:
+        return
+
+    threshold = settings.SQL_REPEATED_STATEMENT_THRESHOLD
+    if threshold:
+        count = stats.shapes[statement] = stats.shapes.get(statement, 0) + 1
+        if count >= threshold:
+            _violation(
+                stats, statement, "db_repeated_statements_total",
+                f"possible N+1, statement executed {count} times: {_shorten(statement)}",
+            )
+
+    if stats.budget is not None and stats.queries > stats.budget:
+        _violation(
+            stats, "budget", "db_query_budget_exceeded_total",
+            f"query budget of {stats.budget} exceeded",
+        )
+
+
+query_observers.append(_observe)
+
+
+class QueryBudget:
+    """
+    وابستگی FastAPI برای اعلام سقف کوئری یک route:
+    ``dependencies=[Depends(QueryBudget(5))]``
+    """
+
+    def __init__(self, max_queries: int):
+        self.max_queries = max_queries
+
+    async def __call__(self) -> None:
+        stats = current_request.get()
+        if stats is not None:
+            stats.budget = self.max_queries
+
+
+# --- سقف کوئری در تست‌ها ---
+
+class QueryProfile:
+    """کوئری‌های اجرا شده در بازه query_budget (همه threadها)"""
+
+    def __init__(self, max_queries: Optional[int], max_repeats: Optional[int]):
+        self.max_queries = max_queries
+        self.max_repeats = max_repeats
+        self.statements: List[str] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def repeated(self, min_count: int = 2) -> Dict[str, int]:
+        """شکل‌های کوئری که حداقل min_count بار اجرا شده‌اند"""
+        counts: Dict[str, int] = {}
+        for statement in self.statements:
+            counts[statement] = counts.get(statement, 0) + 1
+        return {s: c for s, c in counts.items() if c >= min_count}
+
+    def check(self) -> None:
+        problems: List[Tuple[str, str]] = []
+        if self.max_queries is not None and self.count > self.max_queries:
+            problems.append(("budget", f"{self.count} queries, budget is {self.max_queries}"))
+        if self.max_repeats is not None:
+            for statement, count in self.repeated(self.max_repeats + 1).items():
+                problems.append(("repeat", f"executed {count} times: {_shorten(statement)}"))
+        if problems:
+            details = "\n".join(f"  {message}" for _, message in problems)
+            raise QueryBudgetExceeded("query budget exceeded:\n" + details)
+
+
+_profiles_lock = threading.Lock()
+_active_profiles: List[QueryProfile] = []
+
+
+@contextmanager
+def query_budget(
+    max_queries: Optional[int] = None, max_repeats: Optional[int] = None
+) -> Iterator[QueryProfile]:
+    """
+    شمارش کوئری‌های داخل بلوک (در هر thread، از جمله درخواست‌های TestClient)
+    و خطای QueryBudgetExceeded در پایان، اگر بیش از max_queries کوئری یا
+    تکرار یک شکل کوئری بیش از max_repeats بار دیده شود.
+    """
+    profile = QueryProfile(max_queries, max_repeats)
+    with _profiles_lock:
+        _active_profiles.append(profile)
+    try:
+        yield profile
+    finally:
+        with _profiles_lock:
+            _active_profiles.remove(profile)
+    profile.check()
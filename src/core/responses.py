@@ -0,0 +1,56 @@
+# src/core/responses.py
+# مسیر سریع سریال‌سازی JSON
+#
+# در حالت عادی FastAPI خروجی هر route را دوباره با response_model اعتبارسنجی
+# و سپس سریال می‌کند. با FAST_JSON_RESPONSES، پاسخ‌هایی که از قبل به شکل
+# شمای خروجی ساخته شده‌اند (مدل Pydantic یا dict سبک ساخته شده از سطرها)
+# مستقیماً با orjson به bytes تبدیل می‌شوند و اعتبارسنجی دوم حذف می‌شود.
+
+import json
+from typing import Any
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+from .config import settings
+
+try:
+    # وابستگی اختیاری: بدون آن از json استاندارد استفاده می‌شود
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+def _default(obj: Any) -> Any:
+    """مدل‌های Pydantic داخل dictها"""
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    """سریال‌سازی dict/list/مدل Pydantic به JSON فشرده (UTF-8)"""
+    if isinstance(content, BaseModel):
+        return content.__pydantic_serializer__.to_json(content)
+    if orjson is not None:
+        return orjson.dumps(content, default=_default)
+    return json.dumps(
+        content, default=_default, ensure_ascii=False, separators=(",", ":")
+    ).encode()
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse با سریال‌ساز سریع (بدون اعتبارسنجی response_model)"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def json_response(content: Any) -> Any:
+    """
+    با FAST_JSON_RESPONSES پاسخ آماده (bytes) برمی‌گرداند؛ در غیر این صورت
+    content بدون تغییر به مسیر استاندارد FastAPI (اعتبارسنجی response_model) می‌رود.
+    """
+    if settings.FAST_JSON_RESPONSES:
+        return FastJSONResponse(content)
+    return content
@@ -0,0 +1,20 @@
+# src/core/security.py
+# توابع امنیتی مورد استفاده در روترهای احراز هویت
+
+import secrets
+
+from ..utils import get_password_hash, password_needs_rehash, verify_password
+from ..api.deps import create_access_token
+
+__all__ = [
+    "get_password_hash",
+    "verify_password",
+    "password_needs_rehash",
+    "create_access_token",
+    "create_api_key",
+]
+
+
+def create_api_key() -> str:
+    """ایجاد یک API Key تصادفی و منحصر به فرد"""
+    return secrets.token_urlsafe(32)
@@ -0,0 +1,142 @@
+# src/core/storage.py
+# ذخیره‌سازی فایل‌های رسانه پشت یک رابط مشترک
+#
+# کلید هر فایل از هش SHA-256 محتوا ساخته می‌شود و در زیرپوشه‌های دو سطحی
+# بر اساس پیشوند هش قرار می‌گیرد (ab/cd/abcd...)؛ به این ترتیب هیچ پوشه‌ای
+# بیش از چند هزار فایل ندارد.
+#
+# LocalStorage فایل‌ها را روی دیسک نگه می‌دارد. ObjectStoreStorage با هر
+# کلاینت سازگار با boto3 S3 کار می‌کند (متدهای put_object/get_object/
+# head_object/delete_object)؛ مثلاً MinIO یا یک جایگزین محلی در تست‌ها.
+
+import os
+from typing import BinaryIO, Optional
+
+from .config import PerSettings, settings
+from .lazy import LazyClient
+
+
+def shard_key(sha256: str) -> str:
+    """کلید ذخیره‌سازی sharded برای یک هش محتوا"""
+    return f"{sha256[:2]}/{sha256[2:4]}/{sha256}"
+
+
+class MediaStorage:
+    """رابط بک‌اند ذخیره‌سازی رسانه (کلید -> فایل تغییرناپذیر)"""
+
+    # پوشه فایل‌های موقت آپلود (None یعنی پوشه موقت سیستم)
+    temp_dir: Optional[str] = None
+
+    def exists(self, key: str) -> bool:
+        raise NotImplementedError
+
+    def put_file(self, key: str, path: str) -> None:
+        """انتقال فایل موقت path به key؛ اگر key وجود داشته باشد فایل موقت حذف می‌شود"""
+        raise NotImplementedError
+
+    def open(self, key: str) -> BinaryIO:
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def local_path(self, key: str) -> Optional[str]:
+        """مسیر فایل روی دیسک (برای FileResponse) یا None اگر فایل محلی نیست"""
+        return None
+
+    def prepare(self) -> None:
+        """آماده‌سازی در startup برنامه (نه در زمان import)"""
+
+
+class LocalStorage(MediaStorage):
+    """ذخیره‌سازی روی سیستم فایل محلی زیر root"""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    @property
+    def temp_dir(self) -> str:
+        # هم‌پوشه با فایل نهایی تا os.replace اتمی باشد
+        os.makedirs(self.root, exist_ok=True)
+        return self.root
+
+    def prepare(self) -> None:
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, *key.split("/"))
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    def put_file(self, key: str, path: str) -> None:
+        target = self._path(key)
+        if os.path.exists(target):
+            os.remove(path)
+            return
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(path, target)
+
+    def open(self, key: str) -> BinaryIO:
+        return open(self._path(key), "rb")
+
+    def delete(self, key: str) -> None:
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def local_path(self, key: str) -> Optional[str]:
+        return self._path(key)
+
+
+class ObjectStoreStorage(MediaStorage):
+    """ذخیره‌سازی روی object store با کلاینت سازگار با boto3 S3"""
+
+    def __init__(self, client, bucket: str, prefix: str = ""):
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self.prefix + key)
+        except Exception as exc:
+            # boto3 برای کلید ناموجود ClientError با کد 404 می‌دهد
+            code = getattr(exc, "response", {}).get("Error", {}).get("Code")
+            if code in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+        return True
+
+    def put_file(self, key: str, path: str) -> None:
+        try:
+            if not self.exists(key):
+                with open(path, "rb") as body:
+                    self.client.put_object(Bucket=self.bucket, Key=self.prefix + key, Body=body)
+        finally:
+            os.remove(path)
+
+    def open(self, key: str) -> BinaryIO:
+        return self.client.get_object(Bucket=self.bucket, Key=self.prefix + key)["Body"]
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=self.prefix + key)
+
+
+def _build_storage() -> MediaStorage:
+    """ساخت بک‌اند ذخیره‌سازی بر اساس تنظیمات"""
+    if settings.MEDIA_STORAGE_BACKEND == "s3":
+        endpoint_url = settings.MEDIA_S3_ENDPOINT_URL or None
+
+        def client():
+            # وابستگی اختیاری: فقط در صورت انتخاب بک‌اند s3 و در اولین درخواست import می‌شود
+            import boto3
+
+            return boto3.client("s3", endpoint_url=endpoint_url)
+
+        return ObjectStoreStorage(LazyClient(client), settings.MEDIA_S3_BUCKET, settings.MEDIA_S3_PREFIX)
+    return LocalStorage(settings.MEDIA_ROOT)
+
+
+media_storage = PerSettings(_build_storage)
@@ -0,0 +1,91 @@
+# src/core/trending.py
+# هشتگ‌های پرطرفدار با شمارنده‌های پنجره لغزان در سطل‌های یک دقیقه‌ای
+#
+# index_tweet/remove_tweet افزایش/کاهش هر (هشتگ، دقیقه) را روی session ثبت می‌کنند؛
+# پس از commit تراکنش، این مقادیر به سطل‌های درون حافظه همین برنامه اضافه می‌شوند
+# (تراکنش rollback شده چیزی نمی‌شمارد). flusher دوره‌ای (lifespan) سطل‌ها را به صورت
+# UPSERT در جدول hashtag_bucket جمع می‌کند، پس شمارش‌ها بین workerها مشترک و پس از
+# restart پایدارند. خواندن trending حداکثر TRENDING_WINDOW_MINUTES سطل برای هر هشتگ
+# جمع می‌زند و هرگز توییت‌ها یا tweet_hashtag را دوباره اسکن نمی‌کند؛ نتیجه برای
+# TRENDING_CACHE_TTL_SECONDS در حافظه نگهداری می‌شود.
+
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from .cache import TTLCache
+from .config import PerSettings, settings
+
+# کلید افزایش‌های ثبت نشده روی session.info
+_SESSION_KEY = "trending_deltas"
+
+
+def minute_of(at: Optional[datetime] = None) -> int:
+    """شماره دقیقه (از epoch) یک زمان UTC بدون tzinfo، یا زمان فعلی"""
+    if at is None:
+        return int(time.time() // 60)
+    if at.tzinfo is None:
+        # created_at توییت‌ها به وقت UTC و بدون tzinfo ذخیره می‌شود
+        at = at.replace(tzinfo=timezone.utc)
+    return int(at.timestamp() // 60)
+
+
+def oldest_minute(now: Optional[int] = None) -> int:
+    """قدیمی‌ترین دقیقه پنجره فعلی"""
+    return (minute_of() if now is None else now) - settings.TRENDING_WINDOW_MINUTES + 1
+
+
+class TrendingBuckets:
+    """افزایش‌های (tag, minute) که هنوز در hashtag_bucket نوشته نشده‌اند (thread-safe)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending: Counter = Counter()
+
+    def add(self, deltas: Dict[Tuple[str, int], int]) -> None:
+        with self._lock:
+            # update مقادیر منفی (حذف توییت) را هم جمع می‌زند
+            self._pending.update(deltas)
+
+    def drain(self) -> Dict[Tuple[str, int], int]:
+        """برداشتن همه افزایش‌های غیرصفر برای flush"""
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+        return {key: count for key, count in pending.items() if count}
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+
+def count_tags(db: Session, tags: Iterable[str], at: datetime, delta: int) -> None:
+    """ثبت +1/-1 برای هشتگ‌های یک توییت؛ پس از commit همین session شمرده می‌شود"""
+    minute = minute_of(at)
+    if minute < oldest_minute():
+        return  # سطل خارج از پنجره است و دیگر خوانده نمی‌شود
+    pending = db.info.setdefault(_SESSION_KEY, Counter())
+    for tag in tags:
+        pending[(tag, minute)] += delta
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_on_commit(session: Session) -> None:
+    deltas = session.info.pop(_SESSION_KEY, None)
+    if deltas:
+        trending_buckets.add(deltas)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(session: Session) -> None:
+    session.info.pop(_SESSION_KEY, None)
+
+
+# افزایش‌های flush نشده و نتیجه‌های کش شده، هر کدام برای هر برنامه
+trending_buckets = PerSettings(TrendingBuckets)
+# کلید: limit درخواست (حداکثر MAX_PAGE_SIZE مقدار متمایز)
+trending = PerSettings(lambda: TTLCache(max_entries=100, ttl=settings.TRENDING_CACHE_TTL_SECONDS))
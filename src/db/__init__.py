@@ -3,4 +3,4 @@
 # این import ها ضروری هستند تا مدل‌های ORM در Base ثبت شوند.
 from .base import Base
 from .models import User
-from .session import SessionLocal, engine
+from .session import SessionLocal, init_engines
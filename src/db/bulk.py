@@ -0,0 +1,409 @@
+# src/db/bulk.py
+# ورود و خروج انبوه داده (کاربران، رسانه، توییت‌ها، پیوست‌ها، لایک‌ها و فالوها)
+#
+# اجرا:
+#   python -m src.db.bulk import users users.ndjson
+#   python -m src.db.bulk import tweets tweets.csv --batch-size 20000
+#   python -m src.db.bulk export likes likes.csv
+#   python -m src.db.bulk rebuild-timeline
+#
+# قالب فایل از پسوند تعیین می‌شود (.csv یا .ndjson/.jsonl) یا با --format. فایل‌ها
+# سطر به سطر و در دسته‌های batch_size خوانده/نوشته می‌شوند، پس حافظه مستقل از
+# اندازه فایل است. PostgreSQL از COPY و SQLite از executemany (یک INSERT آماده برای
+# هر دسته) استفاده می‌کند؛ هر import یک تراکنش است.
+#
+# کاربران باید hashed_password (هش bcrypt آماده) داشته باشند؛ رمز عبور خام پذیرفته
+# نمی‌شود تا هیچ هشی در مسیر import محاسبه نشود. api_key در صورت نبود ساخته می‌شود.
+# داده‌های مشتق مانند مسیر عادی نوشتن نگهداری می‌شوند: شمارنده‌های followers_count،
+# following_count و like_count برای هر دسته افزایش می‌یابند، هشتگ‌ها/mentionها
+# و تایم‌لاین مادی‌شده برای توییت‌های وارد شده درج می‌شوند و ایندکس متنی (FTS5/tsvector)
+# توسط خود پایگاه داده به‌روز می‌شود. ترتیب پیشنهادی: users، media، follows، tweets،
+# tweet_media، likes (تایم‌لاین توییت‌ها بر اساس فالوهای موجود در زمان import ساخته می‌شود؛
+# پس از import فالوهای جدید روی توییت‌های قدیمی، rebuild-timeline را اجرا کنید).
+
+import argparse
+import csv
+import io
+import json
+import os
+import secrets
+from collections import Counter
+from datetime import datetime
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from sqlalchemy import (
+    Boolean, DateTime, Integer, Table, bindparam, create_engine, delete, func, insert, literal, select, update,
+)
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+from ..core.config import settings
+from ..core.trending import minute_of, oldest_minute
+from . import models
+from .hashtags import extract_hashtags, extract_mentions
+from .statements import insert_ignore, upsert_increment
+
+DEFAULT_BATCH_SIZE = 5000
+# نمایش NULL در CSV ارسالی به COPY (رشته خالی یعنی رشته خالی، نه NULL)
+COPY_NULL = "\\N"
+
+TABLES: Dict[str, Table] = {
+    "users": models.User.__table__,
+    "media": models.Media.__table__,
+    "follows": models.follows_table,
+    "tweets": models.Tweet.__table__,
+    "tweet_media": models.tweet_media_table,
+    "likes": models.likes_table,
+}
+
+# ستون‌هایی که از داده‌های دیگر محاسبه می‌شوند و از فایل خوانده نمی‌شوند
+_DERIVED_COLUMNS = {
+    "users": {"followers_count", "following_count"},
+    "tweets": {"like_count"},
+}
+
+
+# --- قالب فایل‌ها ---
+
+def detect_format(path: str, fmt: Optional[str] = None) -> str:
+    if fmt:
+        return fmt
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".csv":
+        return "csv"
+    if ext in (".ndjson", ".jsonl", ".json"):
+        return "ndjson"
+    raise ValueError(f"cannot infer format of {path!r}; pass --format csv|ndjson")
+
+
+def _parse_bool(value) -> bool:
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ("1", "true", "t", "yes")
+
+
+def _parse_datetime(value) -> datetime:
+    if isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(value)
+
+
+def _converters(table: Table) -> Dict[str, Callable]:
+    """تبدیل مقدار خوانده شده از CSV/JSON به نوع ستون"""
+    converters = {}
+    for column in table.columns:
+        if isinstance(column.type, Boolean):
+            converters[column.name] = _parse_bool
+        elif isinstance(column.type, DateTime):
+            converters[column.name] = _parse_datetime
+        elif isinstance(column.type, Integer):
+            converters[column.name] = int
+        else:
+            converters[column.name] = str
+    return converters
+
+
+def read_rows(source: Iterable[str], fmt: str, table: Table) -> Iterator[dict]:
+    """سطرهای فایل (خط به خط) با مقادیر تبدیل شده؛ ستون‌های ناشناخته نادیده گرفته می‌شوند"""
+    converters = _converters(table)
+    records = csv.DictReader(source) if fmt == "csv" else (json.loads(line) for line in source if line.strip())
+    for record in records:
+        row = {}
+        for name, value in record.items():
+            convert = converters.get(name)
+            if convert is None:
+                continue
+            # در CSV رشته خالی یعنی NULL/پیش‌فرض، جز برای ستون‌های متنی اجباری
+            if value is None or (value == "" and fmt == "csv" and (
+                convert is not str or table.c[name].nullable
+            )):
+                row[name] = None
+            else:
+                row[name] = convert(value)
+        yield row
+
+
+def _to_json(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def write_rows(target, fmt: str, columns: List[str], rows: Iterable[tuple]) -> int:
+    count = 0
+    if fmt == "csv":
+        writer = csv.writer(target)
+        writer.writerow(columns)
+        for row in rows:
+            writer.writerow(["" if value is None else value for value in row])
+            count += 1
+    else:
+        for row in rows:
+            target.write(json.dumps(dict(zip(columns, row)), default=_to_json, ensure_ascii=False))
+            target.write("\n")
+            count += 1
+    return count
+
+
+def _batches(rows: Iterable[dict], size: int) -> Iterator[List[dict]]:
+    iterator = iter(rows)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+# --- import ---
+
+def _defaults(name: str) -> Callable[[dict], dict]:
+    """مقادیر پیش‌فرض هر جدول (همان مقادیر مسیر عادی ایجاد)"""
+    now = datetime.utcnow()
+
+    def users(row: dict) -> dict:
+        if not row.get("hashed_password"):
+            raise ValueError(f"user {row.get('email')!r} has no hashed_password")
+        if row.get("api_key") is None:
+            row["api_key"] = secrets.token_urlsafe(32)
+        row.update(followers_count=0, following_count=0)
+        return row
+
+    def tweets(row: dict) -> dict:
+        if row.get("created_at") is None:
+            row["created_at"] = now
+        row["like_count"] = 0
+        return row
+
+    def follows(row: dict) -> dict:
+        if row.get("created_at") is None:
+            row["created_at"] = now
+        return row
+
+    return {"users": users, "tweets": tweets, "follows": follows}.get(name, lambda row: row)
+
+
+def _complete(table: Table, row: dict) -> dict:
+    """
+    همه ستون‌های جدول برای هر سطر: کلیدهای غایب یا NULL مقدار پیش‌فرض ثابت مدل را
+    می‌گیرند (مثلاً is_active، token_version، ref_count) و بقیه NULL می‌شوند.
+    """
+    for column in table.columns:
+        if row.get(column.name) is None:
+            default = column.default
+            row[column.name] = default.arg if default is not None and default.is_scalar else None
+    return row
+
+
+def _assign_ids(db: Session, table: Table, batch: List[dict]) -> None:
+    """PostgreSQL: id سطرهای بدون id از sequence جدول (COPY مقدار پیش‌فرض ستون را برای NULL اعمال نمی‌کند)"""
+    missing = [row for row in batch if row.get("id") is None]
+    if not missing or "id" not in table.c:
+        return
+    sequence = func.pg_get_serial_sequence(f'"{table.name}"', "id")
+    ids = db.execute(
+        select(func.nextval(sequence)).select_from(func.generate_series(1, len(missing)))
+    ).scalars().all()
+    for row, value in zip(missing, ids):
+        row["id"] = value
+
+
+def _copy(conn: Connection, table: Table, columns: List[str], batch: List[dict]) -> None:
+    """COPY ... FROM STDIN (psycopg2) برای یک دسته"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in batch:
+        writer.writerow([COPY_NULL if row[c] is None else row[c] for c in columns])
+    buffer.seek(0)
+    quoted = ", ".join(f'"{c}"' for c in columns)
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY \"{table.name}\" ({quoted}) FROM STDIN WITH (FORMAT csv, NULL '{COPY_NULL}')", buffer
+        )
+    finally:
+        cursor.close()
+
+
+def _index_tweets(db: Session, batch: List[dict]) -> None:
+    """هشتگ‌ها، mentionها و تایم‌لاین توییت‌های یک دسته (مانند hashtags.index_tweet و timeline.fan_out_tweet)"""
+    hashtag_rows = [
+        {"tweet_id": row["id"], "tag": tag, "created_at": row["created_at"]}
+        for row in batch for tag in extract_hashtags(row["content"])
+    ]
+    mention_rows = [
+        {"tweet_id": row["id"], "name": name}
+        for row in batch for name in extract_mentions(row["content"])
+    ]
+    if hashtag_rows:
+        db.execute(insert(models.TweetHashtag), hashtag_rows)
+        # توییت‌های وارد شده در پنجره trending مستقیماً در همین تراکنش شمرده می‌شوند
+        oldest = oldest_minute()
+        buckets = Counter(
+            (row["tag"], minute) for row in hashtag_rows
+            if (minute := minute_of(row["created_at"])) >= oldest
+        )
+        if buckets:
+            db.execute(
+                upsert_increment(db, models.HashtagBucket.__table__, ("minute", "tag"), "count"),
+                [{"tag": tag, "minute": minute, "count": count} for (tag, minute), count in buckets.items()],
+            )
+    if mention_rows:
+        db.execute(insert(models.TweetMention), mention_rows)
+    _fan_out(db, [row["id"] for row in batch])
+
+
+def _fan_out(db: Session, tweet_ids: Optional[List[int]] = None) -> None:
+    """درج توییت‌ها در تایم‌لاین نویسنده و دنبال‌کنندگان (جز حساب‌های fanout_on_read)"""
+    tweet, user, follows = models.Tweet, models.User, models.follows_table
+    columns = ["user_id", "tweet_id", "author_id", "created_at"]
+    own = select(tweet.author_id, tweet.id, tweet.author_id, tweet.created_at)
+    followers = (
+        select(follows.c.follower_id, tweet.id, tweet.author_id, tweet.created_at)
+        .join(follows, follows.c.followed_id == tweet.author_id)
+        .join(user, user.id == tweet.author_id)
+        .where(user.fanout_on_read.is_(False))
+    )
+    if tweet_ids is None:
+        # SQLite برای INSERT ... SELECT ... ON CONFLICT به یک WHERE نیاز دارد
+        own = own.where(literal(True))
+    else:
+        own = own.where(tweet.id.in_(tweet_ids))
+        followers = followers.where(tweet.id.in_(tweet_ids))
+    for query in (own, followers):
+        db.execute(insert_ignore(db, models.TimelineEntry.__table__).from_select(columns, query))
+
+
+def _increment(db: Session, column, key_column, amounts: Counter) -> None:
+    """column += amount برای هر کلید (یک UPDATE آماده با executemany)"""
+    if amounts:
+        db.execute(
+            update(column.table).where(key_column == bindparam("key")).values({column: column + bindparam("amount")}),
+            [{"key": key, "amount": amount} for key, amount in amounts.items()],
+        )
+
+
+def _bump_counters(db: Session, name: str, batch: List[dict]) -> None:
+    """افزایش شمارنده‌های وابسته به سطرهای یک دسته (مانند مسیر عادی لایک/فالو)"""
+    if name == "likes":
+        tweet = models.Tweet.__table__
+        _increment(db, tweet.c.like_count, tweet.c.id, Counter(row["tweet_id"] for row in batch))
+    elif name == "follows":
+        user = models.User.__table__
+        followed = Counter(row["followed_id"] for row in batch)
+        _increment(db, user.c.followers_count, user.c.id, followed)
+        _increment(db, user.c.following_count, user.c.id, Counter(row["follower_id"] for row in batch))
+        # مانند fan_out_tweet: حساب‌های پرفالوور به fan-out هنگام خواندن منتقل می‌شوند
+        db.execute(
+            update(user)
+            .where(user.c.id.in_(list(followed)), user.c.followers_count > settings.TIMELINE_FANOUT_MAX_FOLLOWERS)
+            .values(fanout_on_read=True)
+        )
+
+
+def reset_sequences(db: Session) -> None:
+    """PostgreSQL: ادامه sequenceها از بیشترین id پس از درج idهای صریح"""
+    if db.get_bind().dialect.name != "postgresql":
+        return
+    for column in (models.User.id, models.Tweet.id, models.Media.id):
+        db.execute(select(func.setval(
+            func.pg_get_serial_sequence(f'"{column.table.name}"', column.name),
+            select(func.coalesce(func.max(column), 0) + 1).scalar_subquery(),
+            False,
+        )))
+
+
+def import_rows(
+    db: Session, name: str, rows: Iterable[dict], batch_size: int = DEFAULT_BATCH_SIZE
+) -> int:
+    """درج انبوه rows در جدول name و به‌روزرسانی داده‌های مشتق؛ commit با فراخواننده است"""
+    table = TABLES[name]
+    # فهرست ستون‌ها ثابت است (نه کلیدهای اولین سطر) تا سطرهای ناهمگن همه ستون‌هایشان را بنویسند
+    columns = [c.name for c in table.columns]
+    ignored = _DERIVED_COLUMNS.get(name, set())
+    prepare = _defaults(name)
+    postgres = db.get_bind().dialect.name == "postgresql"
+    count = 0
+    for batch in _batches(rows, batch_size):
+        batch = [_complete(table, prepare({k: v for k, v in row.items() if k not in ignored})) for row in batch]
+        if name == "tweets" and any(row["id"] is None for row in batch):
+            raise ValueError("tweets must have explicit ids")
+        if postgres:
+            _assign_ids(db, table, batch)
+            _copy(db.connection(), table, columns, batch)
+        else:
+            db.execute(insert(table), batch)
+        if name == "tweets":
+            _index_tweets(db, batch)
+        _bump_counters(db, name, batch)
+        count += len(batch)
+    reset_sequences(db)
+    return count
+
+
+def import_file(engine: Engine, name: str, path: str, fmt: Optional[str] = None,
+                batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    fmt = detect_format(path, fmt)
+    with open(path, newline="", encoding="utf-8") as source, Session(engine) as db:
+        count = import_rows(db, name, read_rows(source, fmt, TABLES[name]), batch_size)
+        db.commit()
+    return count
+
+
+def rebuild_timeline(engine: Engine) -> None:
+    """ساخت دوباره کل تایم‌لاین مادی‌شده از توییت‌ها و فالوها"""
+    with Session(engine) as db:
+        db.execute(delete(models.TimelineEntry))
+        _fan_out(db)
+        db.commit()
+
+
+# --- export ---
+
+def export_file(engine: Engine, name: str, path: str, fmt: Optional[str] = None,
+                batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """خروجی جدول name به ترتیب کلید اصلی، با cursor سمت سرور (حافظه ثابت)"""
+    table = TABLES[name]
+    fmt = detect_format(path, fmt)
+    columns = [c.name for c in table.columns]
+    query = select(*table.columns).order_by(*table.primary_key.columns)
+    with engine.connect() as conn, open(path, "w", newline="", encoding="utf-8") as target:
+        if fmt == "csv" and conn.dialect.name == "postgresql":
+            sql = str(query.compile(conn, compile_kwargs={"literal_binds": True}))
+            cursor = conn.connection.dbapi_connection.cursor()
+            try:
+                cursor.copy_expert(f"COPY ({sql}) TO STDOUT WITH (FORMAT csv, HEADER)", target)
+                return cursor.rowcount
+            finally:
+                cursor.close()
+        result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(query)
+        return write_rows(target, fmt, columns, (tuple(row) for row in result))
+
+
+def main(argv: Optional[list] = None) -> None:
+    parser = argparse.ArgumentParser(description="Bulk import/export of users, media, follows, tweets and likes")
+    parser.add_argument("--database-url", default=settings.SQLALCHEMY_DATABASE_URL)
+    commands = parser.add_subparsers(dest="command", required=True)
+    for command in ("import", "export"):
+        sub = commands.add_parser(command)
+        sub.add_argument("table", choices=list(TABLES))
+        sub.add_argument("path")
+        sub.add_argument("--format", choices=["csv", "ndjson"])
+        sub.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    commands.add_parser("rebuild-timeline")
+    args = parser.parse_args(argv)
+
+    engine = create_engine(args.database_url)
+    if args.command == "import":
+        count = import_file(engine, args.table, args.path, args.format, args.batch_size)
+        print(f"imported={count}")
+    elif args.command == "export":
+        count = export_file(engine, args.table, args.path, args.format, args.batch_size)
+        print(f"exported={count}")
+    else:
+        rebuild_timeline(engine)
+        print("timeline rebuilt")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+# src/db/feed.py
+# لایه کوئری فید: ساخت پاسخ یک صفحه کامل از توییت‌ها با تعداد ثابتی کوئری
+#
+# به جای model_validate روی هر توییت (که روابط lazy را یکی‌یکی بارگذاری می‌کند
+# و 1 + 3N کوئری می‌سازد)، برای هر صفحه دقیقاً سه کوئری اجرا می‌شود:
+#   1. توییت‌ها به همراه نام نویسنده (JOIN)
+#   2. پیوست‌های همه توییت‌های صفحه (IN)
+#   3. حداکثر FEED_LIKERS_PREVIEW لایک‌کننده برای هر توییت صفحه به همراه نام (UNION ALL + JOIN)
+#
+# تعداد لایک‌ها از ستون نگهداری‌شده like_count خوانده می‌شود؛ لیست کامل لایک‌کنندگان
+# یک توییت پرطرفدار هرگز در فید بارگذاری نمی‌شود.
+
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import desc, select, tuple_, union_all
+from sqlalchemy.orm import Session
+
+from . import models
+from ..core.config import settings
+from ..core.pagination import decode_time_cursor, encode_cursor
+from ..schemas.user import media_url, media_variant_urls
+
+# یک توییت به شکل شمای TweetResponseBase، به صورت dict سبک (بدون ساخت مدل Pydantic)؛
+# مسیر استاندارد آن را با response_model اعتبارسنجی می‌کند و مسیر سریع مستقیماً سریال می‌کند
+TweetDTO = Dict[str, Any]
+
+
+def tweet_rows_query():
+    """کوئری پایه توییت‌ها همراه با اطلاعات نویسنده (بدون بارگذاری روابط ORM)"""
+    return (
+        select(
+            models.Tweet.id,
+            models.Tweet.content,
+            models.Tweet.created_at,
+            models.Tweet.like_count,
+            models.User.id.label("author_id"),
+            models.User.name.label("author_name"),
+        )
+        .join(models.User, models.User.id == models.Tweet.author_id)
+    )
+
+
+def _attachments_by_tweet(db: Session, tweet_ids: Sequence[int]) -> Dict[int, List[dict]]:
+    """بارگذاری دسته‌ای پیوست‌های چند توییت با یک کوئری"""
+    rows = db.execute(
+        select(models.tweet_media_table.c.tweet_id, models.tweet_media_table.c.media_id)
+        .where(models.tweet_media_table.c.tweet_id.in_(tweet_ids))
+        .order_by(models.tweet_media_table.c.media_id)
+    ).all()
+    result: Dict[int, List[dict]] = defaultdict(list)
+    for tweet_id, media_id in rows:
+        result[tweet_id].append(
+            {"id": media_id, "url": media_url(media_id), "variants": media_variant_urls(media_id)}
+        )
+    return result
+
+
+def _likes_by_tweet(db: Session, tweet_ids: Sequence[int]) -> Dict[int, List[dict]]:
+    """
+    حداکثر FEED_LIKERS_PREVIEW لایک‌کننده اول (کمترین ID) هر توییت همراه نام کاربر، با یک کوئری.
+    هر توییت یک زیرکوئری LIMIT روی ix_likes_tweet_user است؛ هزینه مستقل از تعداد کل لایک‌ها.
+    """
+    preview = settings.FEED_LIKERS_PREVIEW
+    if preview <= 0 or not tweet_ids:
+        return {}
+    likes = models.likes_table
+    per_tweet = [
+        select(likes.c.tweet_id, likes.c.user_id)
+        .where(likes.c.tweet_id == tweet_id)
+        .order_by(likes.c.user_id)
+        .limit(preview)
+        .subquery()
+        .select()
+        for tweet_id in tweet_ids
+    ]
+    likers = (union_all(*per_tweet) if len(per_tweet) > 1 else per_tweet[0]).subquery()
+    rows = db.execute(
+        select(likers.c.tweet_id, models.User.id, models.User.name)
+        .join(models.User, models.User.id == likers.c.user_id)
+        .order_by(models.User.id)
+    ).all()
+    result: Dict[int, List[dict]] = defaultdict(list)
+    for tweet_id, user_id, name in rows:
+        result[tweet_id].append({"user_id": user_id, "name": name})
+    return result
+
+
+def assemble_tweets(db: Session, rows: Sequence) -> List[TweetDTO]:
+    """
+    تبدیل سطرهای tweet_rows_query به DTOهای شمای پاسخ، با حفظ ترتیب ورودی.
+    پیوست‌ها و نمونه لایک‌کنندگان برای کل صفحه با دو کوئری ثابت بارگذاری می‌شوند.
+    """
+    if not rows:
+        return []
+
+    tweet_ids = [row.id for row in rows]
+    attachments = _attachments_by_tweet(db, tweet_ids)
+    likes = _likes_by_tweet(db, [row.id for row in rows if row.like_count])
+
+    return [
+        {
+            "id": row.id,
+            "content": row.content,
+            "attachments": attachments.get(row.id, []),
+            "author": {"id": row.author_id, "name": row.author_name},
+            "likes": likes.get(row.id, []),
+            "like_count": row.like_count,
+        }
+        for row in rows
+    ]
+
+
+def get_feed_page(
+    db: Session, limit: int, cursor: Optional[str] = None
+) -> Tuple[List[TweetDTO], Optional[str]]:
+    """
+    یک صفحه از فید عمومی با صفحه‌بندی keyset روی (created_at, id).
+    خروجی: (توییت‌های صفحه، cursor صفحه بعد یا None)
+    """
+    query = tweet_rows_query().order_by(
+        desc(models.Tweet.created_at), desc(models.Tweet.id)
+    )
+    if cursor:
+        created_at, tweet_id = decode_time_cursor(cursor)
+        query = query.where(
+            tuple_(models.Tweet.created_at, models.Tweet.id) < tuple_(created_at, tweet_id)
+        )
+
+    # یک سطر اضافه برای تشخیص وجود صفحه بعد
+    rows = db.execute(query.limit(limit + 1)).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    next_cursor = None
+    if has_more:
+        last = rows[-1]
+        next_cursor = encode_cursor(last.created_at, last.id)
+
+    return assemble_tweets(db, rows), next_cursor
+
+
+def get_tweets_by_ids(db: Session, tweet_ids: Sequence[int]) -> List[TweetDTO]:
+    """دریافت چند توییت بر اساس ID با حفظ ترتیب ورودی (IDهای ناموجود حذف می‌شوند)"""
+    if not tweet_ids:
+        return []
+    rows = db.execute(
+        tweet_rows_query().where(models.Tweet.id.in_(tweet_ids))
+    ).all()
+    by_id = {row.id: row for row in rows}
+    ordered = [by_id[tweet_id] for tweet_id in tweet_ids if tweet_id in by_id]
+    return assemble_tweets(db, ordered)
@@ -0,0 +1,105 @@
+# src/db/follows.py
+# follow/unfollow با دستورات مجموعه‌ای و لیست صفحه‌بندی شده دنبال‌کنندگان
+#
+# هر عملیات یک INSERT ... ON CONFLICT DO NOTHING یا DELETE روی follows_table
+# است (بدون بارگذاری لیست following) و شمارنده‌های followers_count و
+# following_count فقط در صورت تغییر واقعی به صورت اتمی به‌روزرسانی می‌شوند.
+
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from sqlalchemy import delete, desc, literal, select, tuple_, update
+from sqlalchemy.orm import Session
+
+from . import models
+from .statements import insert_ignore
+from ..core.pagination import decode_time_cursor, encode_cursor
+from ..schemas.user import UserBase
+
+follows = models.follows_table
+
+
+def _update_counts(db: Session, follower_id: int, followed_id: int, delta: int) -> None:
+    """
+    به‌روزرسانی شمارنده‌های دو طرف، به ترتیب صعودی ID؛ A→B و B→A همزمان قفل سطرها را
+    با یک ترتیب می‌گیرند و در PostgreSQL به deadlock نمی‌رسند.
+    """
+    user = models.User
+    for user_id in sorted({follower_id, followed_id}):
+        values = {}
+        if user_id == follower_id:
+            values["following_count"] = user.following_count + delta
+        if user_id == followed_id:
+            values["followers_count"] = user.followers_count + delta
+        db.execute(update(user).where(user.id == user_id).values(**values))
+
+
+def add_follow(db: Session, follower_id: int, followed_id: int) -> bool:
+    """
+    ثبت دنبال کردن (idempotent). True اگر رابطه جدید ایجاد شد؛
+    False اگر از قبل وجود داشت یا کاربر مقصد وجود ندارد.
+    """
+    # INSERT ... SELECT از user تا رابطه با کاربر ناموجود درج نشود
+    result = db.execute(
+        insert_ignore(db, follows).from_select(
+            ["follower_id", "followed_id", "created_at"],
+            select(literal(follower_id), models.User.id, literal(datetime.utcnow()))
+            .where(models.User.id == followed_id),
+        )
+    )
+    if result.rowcount != 1:
+        return False
+    _update_counts(db, follower_id, followed_id, 1)
+    return True
+
+
+def remove_follow(db: Session, follower_id: int, followed_id: int) -> bool:
+    """لغو دنبال کردن (idempotent). True اگر رابطه‌ای حذف شد."""
+    result = db.execute(
+        delete(follows).where(
+            follows.c.follower_id == follower_id,
+            follows.c.followed_id == followed_id,
+        )
+    )
+    if result.rowcount != 1:
+        return False
+    _update_counts(db, follower_id, followed_id, -1)
+    return True
+
+
+def _list_page(
+    db: Session, user_col, other_col, user_id: int, limit: int, cursor: Optional[str]
+) -> Tuple[List[UserBase], Optional[str]]:
+    """صفحه keyset روی (created_at, other_id) برای یک طرف رابطه follows"""
+    query = (
+        select(follows.c.created_at, models.User.id, models.User.name)
+        .join(models.User, models.User.id == other_col)
+        .where(user_col == user_id)
+        .order_by(desc(follows.c.created_at), desc(other_col))
+    )
+    if cursor:
+        created_at, other_id = decode_time_cursor(cursor)
+        query = query.where(tuple_(follows.c.created_at, other_col) < tuple_(created_at, other_id))
+
+    rows = db.execute(query.limit(limit + 1)).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    next_cursor = None
+    if has_more:
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+    return [UserBase(id=row.id, name=row.name) for row in rows], next_cursor
+
+
+def list_followers(
+    db: Session, user_id: int, limit: int, cursor: Optional[str] = None
+) -> Tuple[List[UserBase], Optional[str]]:
+    """دنبال‌کنندگان کاربر (جدیدترین اول)"""
+    return _list_page(db, follows.c.followed_id, follows.c.follower_id, user_id, limit, cursor)
+
+
+def list_following(
+    db: Session, user_id: int, limit: int, cursor: Optional[str] = None
+) -> Tuple[List[UserBase], Optional[str]]:
+    """کاربرانی که کاربر دنبال می‌کند (جدیدترین اول)"""
+    return _list_page(db, follows.c.follower_id, follows.c.followed_id, user_id, limit, cursor)
@@ -0,0 +1,179 @@
+# src/db/hashtags.py
+# استخراج هشتگ‌ها و @mentionها هنگام نوشتن توییت و فیلتر فید بر اساس هشتگ
+#
+# متن توییت فقط یک بار (هنگام ایجاد) تجزیه می‌شود و نتیجه در جداول
+# tweet_hashtag و tweet_mention ذخیره می‌شود؛ خواندن‌ها هرگز محتوای توییت‌ها
+# را اسکن نمی‌کنند. شمارش trending در سطل‌های یک دقیقه‌ای hashtag_bucket انجام می‌شود
+# (core/trending.py).
+
+import asyncio
+import logging
+import re
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, desc, func, insert, select, tuple_
+from sqlalchemy.orm import Session
+
+from . import models
+from .feed import TweetDTO, get_tweets_by_ids
+from .statements import upsert_increment
+from ..core.pagination import decode_time_cursor, encode_cursor
+from ..core.trending import count_tags, oldest_minute, trending, trending_buckets
+
+logger = logging.getLogger(__name__)
+
+MAX_TAG_LENGTH = 64
+
+# # یا @ در ابتدای متن یا بعد از کاراکتری که جزء کلمه نیست (مثلاً ایمیل‌ها mention نیستند)
+_HASHTAG = re.compile(r"(?<!\w)#(\w+)", re.UNICODE)
+_MENTION = re.compile(r"(?<![\w@])@(\w+)", re.UNICODE)
+
+
+def _unique(matches: List[str]) -> List[str]:
+    # حروف کوچک، بدون تکرار، با حفظ ترتیب ظاهر شدن
+    return list(dict.fromkeys(m.lower()[:MAX_TAG_LENGTH] for m in matches))
+
+
+def extract_hashtags(content: str) -> List[str]:
+    return _unique(_HASHTAG.findall(content))
+
+
+def extract_mentions(content: str) -> List[str]:
+    return _unique(_MENTION.findall(content))
+
+
+def normalize_tag(tag: str) -> str:
+    """هشتگ ورودی کاربر (با یا بدون #) به شکل ذخیره شده"""
+    return tag.lstrip("#").lower()[:MAX_TAG_LENGTH]
+
+
+def index_tweet(db: Session, tweet_id: int, content: str, created_at: datetime) -> List[str]:
+    """ثبت هشتگ‌ها و mentionهای یک توییت جدید؛ هشتگ‌ها را برمی‌گرداند"""
+    tags = extract_hashtags(content)
+    mentions = extract_mentions(content)
+    if tags:
+        db.execute(
+            insert(models.TweetHashtag),
+            [{"tweet_id": tweet_id, "tag": tag, "created_at": created_at} for tag in tags],
+        )
+        count_tags(db, tags, created_at, 1)
+    if mentions:
+        db.execute(
+            insert(models.TweetMention),
+            [{"tweet_id": tweet_id, "name": name} for name in mentions],
+        )
+    return tags
+
+
+def remove_tweet(db: Session, tweet_id: int) -> List[str]:
+    """حذف ردیف‌های هشتگ/mention یک توییت؛ هشتگ‌های حذف شده را برمی‌گرداند"""
+    rows = db.execute(
+        delete(models.TweetHashtag)
+        .where(models.TweetHashtag.tweet_id == tweet_id)
+        .returning(models.TweetHashtag.tag, models.TweetHashtag.created_at)
+    ).all()
+    db.execute(delete(models.TweetMention).where(models.TweetMention.tweet_id == tweet_id))
+    tags = [row.tag for row in rows]
+    if rows:
+        count_tags(db, tags, rows[0].created_at, -1)
+    return tags
+
+
+def flush_trending(db: Session, deltas: Dict[Tuple[str, int], int]) -> None:
+    """
+    اضافه کردن افزایش‌های (tag, minute) به hashtag_bucket با UPSERT و حذف سطل‌های
+    خارج از پنجره؛ commit با فراخواننده است.
+    """
+    if deltas:
+        db.execute(
+            upsert_increment(db, models.HashtagBucket.__table__, ("minute", "tag"), "count"),
+            [{"tag": tag, "minute": minute, "count": count} for (tag, minute), count in deltas.items()],
+        )
+    db.execute(delete(models.HashtagBucket).where(models.HashtagBucket.minute < oldest_minute()))
+
+
+def flush_pending_trending() -> int:
+    """
+    نوشتن سطل‌های درون حافظه این برنامه در پایگاه داده؛ تعداد کلیدهای نوشته شده را
+    برمی‌گرداند. در صورت خطا افزایش‌ها برای flush بعدی به سطل‌ها برگردانده می‌شوند.
+    """
+    from .session import SessionLocal
+
+    deltas = trending_buckets.drain()
+    if not deltas:
+        return 0
+    db = SessionLocal()
+    try:
+        flush_trending(db, deltas)
+        db.commit()
+    except Exception:
+        db.rollback()
+        trending_buckets.add(deltas)
+        raise
+    finally:
+        db.close()
+    # شمارش‌های جدید در نتیجه بعدی دیده شوند
+    trending.clear()
+    return len(deltas)
+
+
+async def flush_trending_periodically(interval: float) -> None:
+    """flusher پس‌زمینه (lifespan): هر interval ثانیه یک flush در threadpool"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            # to_thread تنظیمات جاری (contextvar) را به thread منتقل می‌کند
+            await asyncio.to_thread(flush_pending_trending)
+        except Exception:
+            logger.exception("flushing trending buckets failed")
+
+
+def top_hashtags(db: Session, limit: int, now: Optional[int] = None) -> List[dict]:
+    """
+    پرتکرارترین هشتگ‌های پنجره فعلی (تساوی بر اساس نام هشتگ)؛ برای هر هشتگ حداکثر
+    TRENDING_WINDOW_MINUTES سطل از hashtag_bucket جمع زده می‌شود.
+    """
+    buckets = models.HashtagBucket
+    count = func.sum(buckets.count).label("count")
+    rows = db.execute(
+        select(buckets.tag, count)
+        .where(buckets.minute >= oldest_minute(now))
+        .group_by(buckets.tag)
+        .having(count > 0)
+        .order_by(desc(count), buckets.tag)
+        .limit(limit)
+    ).all()
+    return [{"tag": row.tag, "count": row.count} for row in rows]
+
+
+def get_tag_page(
+    db: Session, tag: str, limit: int, cursor: Optional[str] = None
+) -> Tuple[List[TweetDTO], Optional[str]]:
+    """
+    یک صفحه از توییت‌های دارای هشتگ tag (جدیدترین اول) با keyset روی
+    (created_at, tweet_id) در ایندکس ix_tweet_hashtag_tag_created_at.
+    """
+    hashtags = models.TweetHashtag
+    query = (
+        select(hashtags.created_at, hashtags.tweet_id)
+        .where(hashtags.tag == normalize_tag(tag))
+        .order_by(desc(hashtags.created_at), desc(hashtags.tweet_id))
+    )
+    if cursor:
+        created_at, tweet_id = decode_time_cursor(cursor)
+        query = query.where(
+            tuple_(hashtags.created_at, hashtags.tweet_id) < tuple_(created_at, tweet_id)
+        )
+
+    # یک سطر اضافه برای تشخیص وجود صفحه بعد
+    rows = db.execute(query.limit(limit + 1)).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    next_cursor = None
+    if has_more:
+        last = rows[-1]
+        next_cursor = encode_cursor(last.created_at, last.tweet_id)
+
+    return get_tweets_by_ids(db, [row.tweet_id for row in rows]), next_cursor
@@ -0,0 +1,51 @@
+# src/db/likes.py
+# لایک/آن‌لایک با دستورات مجموعه‌ای (set-based) روی likes_table
+#
+# به جای بارگذاری تمام لایک‌کنندگان یک توییت برای بررسی عضویت، هر عملیات
+# یک INSERT ... ON CONFLICT DO NOTHING یا DELETE است و شمارنده like_count
+# فقط در صورت تغییر واقعی، به صورت اتمی به‌روزرسانی می‌شود.
+
+from sqlalchemy import delete, literal, select, update
+from sqlalchemy.orm import Session
+
+from . import models
+from .statements import insert_ignore
+
+likes = models.likes_table
+
+
+def add_like(db: Session, user_id: int, tweet_id: int) -> bool:
+    """
+    ثبت لایک (idempotent). True اگر لایک جدید ثبت شد؛
+    False اگر قبلاً لایک شده بود یا توییت وجود ندارد.
+    """
+    # INSERT ... SELECT از tweet تا لایک برای توییت ناموجود درج نشود
+    result = db.execute(
+        insert_ignore(db, likes).from_select(
+            ["user_id", "tweet_id"],
+            select(literal(user_id), models.Tweet.id).where(models.Tweet.id == tweet_id),
+        )
+    )
+    if result.rowcount != 1:
+        return False
+    db.execute(
+        update(models.Tweet)
+        .where(models.Tweet.id == tweet_id)
+        .values(like_count=models.Tweet.like_count + 1)
+    )
+    return True
+
+
+def remove_like(db: Session, user_id: int, tweet_id: int) -> bool:
+    """حذف لایک (idempotent). True اگر لایکی حذف شد."""
+    result = db.execute(
+        delete(likes).where(likes.c.user_id == user_id, likes.c.tweet_id == tweet_id)
+    )
+    if result.rowcount != 1:
+        return False
+    db.execute(
+        update(models.Tweet)
+        .where(models.Tweet.id == tweet_id)
+        .values(like_count=models.Tweet.like_count - 1)
+    )
+    return True
@@ -1,10 +1,49 @@
 # src/db/models.py
 # تعریف مدل‌های ORM
 
-from sqlalchemy import Boolean, Column, Integer, String
+from datetime import datetime
+
+from sqlalchemy import (
+    DDL, Boolean, Column, DateTime, ForeignKey, Index, Integer, String, Table, Text, event,
+)
+from sqlalchemy.orm import relationship
+
 from .base import Base
 
 
+# --- جداول واسط (Association Tables) ---
+
+# لایک‌ها: کدام کاربر کدام توییت را لایک کرده است
+likes_table = Table(
+    "likes",
+    Base.metadata,
+    Column("user_id", Integer, ForeignKey("user.id", ondelete="CASCADE"), primary_key=True),
+    Column("tweet_id", Integer, ForeignKey("tweet.id", ondelete="CASCADE"), primary_key=True),
+    # چند لایک‌کننده اول هر توییت در فید (LIMIT روی ایندکس، بدون خواندن همه لایک‌ها)
+    Index("ix_likes_tweet_user", "tweet_id", "user_id"),
+)
+
+# دنبال‌کردن: follower_id کاربر followed_id را دنبال می‌کند
+follows_table = Table(
+    "follows",
+    Base.metadata,
+    Column("follower_id", Integer, ForeignKey("user.id", ondelete="CASCADE"), primary_key=True),
+    Column("followed_id", Integer, ForeignKey("user.id", ondelete="CASCADE"), primary_key=True),
+    Column("created_at", DateTime, default=datetime.utcnow, nullable=False),
+    # صفحه‌بندی keyset لیست دنبال‌کنندگان/دنبال‌شوندگان (جدیدترین اول) و fan-out
+    Index("ix_follows_followed_created_at", "followed_id", "created_at", "follower_id"),
+    Index("ix_follows_follower_created_at", "follower_id", "created_at", "followed_id"),
+)
+
+# پیوست‌های توییت
+tweet_media_table = Table(
+    "tweet_media",
+    Base.metadata,
+    Column("tweet_id", Integer, ForeignKey("tweet.id", ondelete="CASCADE"), primary_key=True),
+    Column("media_id", Integer, ForeignKey("media.id", ondelete="CASCADE"), primary_key=True),
+)
+
+
 class User(Base):
     """
     مدل SQLAlchemy برای جدول 'user'
@@ -12,7 +51,163 @@ class User(Base):
     __tablename__ = "user"
 
     id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, nullable=False)
     email = Column(String, unique=True, index=True, nullable=False)
     hashed_password = Column(String, nullable=False)
+    api_key = Column(String, unique=True, index=True, nullable=False)
     is_active = Column(Boolean, default=True, nullable=False)
     is_superuser = Column(Boolean, default=False, nullable=False)
+    # نسخه توکن‌های JWT کاربر (claim "ver")؛ با غیرفعال شدن افزایش می‌یابد و توکن‌های قبلی باطل می‌شوند
+    token_version = Column(Integer, default=0, server_default="0", nullable=False)
+    # True وقتی تعداد فالوورها از TIMELINE_FANOUT_MAX_FOLLOWERS بیشتر شود؛
+    # توییت‌های این کاربر در زمان خواندن تایم‌لاین ادغام می‌شوند
+    fanout_on_read = Column(Boolean, default=False, nullable=False)
+    # شمارنده‌های نگهداری شده (همراه با follows در follow/unfollow به‌روزرسانی می‌شوند)
+    followers_count = Column(Integer, default=0, server_default="0", nullable=False)
+    following_count = Column(Integer, default=0, server_default="0", nullable=False)
+
+    tweets = relationship("Tweet", back_populates="author", cascade="all, delete-orphan")
+    # فقط خواندنی: نوشتن از طریق src/db/follows.py انجام می‌شود تا شمارنده‌ها هماهنگ بمانند
+    following = relationship(
+        "User",
+        secondary=follows_table,
+        primaryjoin=lambda: User.id == follows_table.c.follower_id,
+        secondaryjoin=lambda: User.id == follows_table.c.followed_id,
+        viewonly=True,
+    )
+    followers = relationship(
+        "User",
+        secondary=follows_table,
+        primaryjoin=lambda: User.id == follows_table.c.followed_id,
+        secondaryjoin=lambda: User.id == follows_table.c.follower_id,
+        viewonly=True,
+    )
+
+
+class Tweet(Base):
+    """
+    مدل SQLAlchemy برای جدول 'tweet'
+    """
+    __tablename__ = "tweet"
+    __table_args__ = (
+        # ایندکس ترکیبی برای صفحه‌بندی keyset روی (created_at, id)
+        Index("ix_tweet_created_at_id", "created_at", "id"),
+        # برای fan-out-on-read: آخرین توییت‌های یک نویسنده
+        Index("ix_tweet_author_created_at_id", "author_id", "created_at", "id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    content = Column(Text, nullable=False)
+    author_id = Column(Integer, ForeignKey("user.id", ondelete="CASCADE"), nullable=False, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    # شمارنده لایک‌ها (همراه با likes در like/unlike به‌روزرسانی می‌شود)
+    like_count = Column(Integer, default=0, server_default="0", nullable=False)
+
+    author = relationship("User", back_populates="tweets")
+    attachments = relationship("Media", secondary=tweet_media_table)
+    likes = relationship("User", secondary=likes_table)
+
+
+class TweetHashtag(Base):
+    """
+    هشتگ‌های یک توییت (استخراج شده هنگام نوشتن). created_at از توییت کپی می‌شود تا
+    فیلتر فید بر اساس هشتگ فقط یک range scan روی (tag, created_at, tweet_id) باشد.
+    """
+    __tablename__ = "tweet_hashtag"
+    __table_args__ = (
+        Index("ix_tweet_hashtag_tag_created_at", "tag", "created_at", "tweet_id"),
+    )
+
+    tweet_id = Column(Integer, ForeignKey("tweet.id", ondelete="CASCADE"), primary_key=True)
+    tag = Column(String(64), primary_key=True)
+    created_at = Column(DateTime, nullable=False)
+
+
+class HashtagBucket(Base):
+    """
+    شمارنده هشتگ‌ها در سطل‌های یک دقیقه‌ای برای trending (minute: دقیقه از epoch به وقت UTC).
+    هر پردازه افزایش/کاهش‌ها را در حافظه جمع می‌کند و به صورت دوره‌ای با UPSERT به
+    count اضافه می‌کند؛ سطل‌های خارج از پنجره در همان flush حذف می‌شوند.
+    """
+    __tablename__ = "hashtag_bucket"
+
+    minute = Column(Integer, primary_key=True)
+    tag = Column(String(64), primary_key=True)
+    count = Column(Integer, default=0, nullable=False)
+
+
+class TweetMention(Base):
+    """
+    نام‌هایی که در یک توییت با @ ذکر شده‌اند (استخراج شده هنگام نوشتن)
+    """
+    __tablename__ = "tweet_mention"
+    __table_args__ = (
+        Index("ix_tweet_mention_name_tweet", "name", "tweet_id"),
+    )
+
+    tweet_id = Column(Integer, ForeignKey("tweet.id", ondelete="CASCADE"), primary_key=True)
+    name = Column(String(64), primary_key=True)
+
+
+# --- جستجوی متن کامل روی Tweet.content (src/db/search.py) ---
+# PostgreSQL: ستون tsvector تولیدشده (generated) با ایندکس GIN.
+# SQLite: جدول مجازی FTS5 با محتوای خارجی (external content) که با trigger
+# هنگام درج/حذف/ویرایش توییت هماهنگ می‌ماند.
+# ستون/جدول در مدل ORM تعریف نمی‌شوند تا روی dialect دیگر ساخته نشوند.
+for _statement in (
+    "ALTER TABLE tweet ADD COLUMN search_vector tsvector "
+    "GENERATED ALWAYS AS (to_tsvector('simple', content)) STORED",
+    "CREATE INDEX ix_tweet_search_vector ON tweet USING GIN (search_vector)",
+):
+    event.listen(Tweet.__table__, "after_create", DDL(_statement).execute_if(dialect="postgresql"))
+
+for _statement in (
+    "CREATE VIRTUAL TABLE tweet_fts USING fts5(content, content='tweet', content_rowid='id')",
+    "CREATE TRIGGER tweet_fts_insert AFTER INSERT ON tweet BEGIN "
+    "INSERT INTO tweet_fts(rowid, content) VALUES (new.id, new.content); END",
+    "CREATE TRIGGER tweet_fts_delete AFTER DELETE ON tweet BEGIN "
+    "INSERT INTO tweet_fts(tweet_fts, rowid, content) VALUES ('delete', old.id, old.content); END",
+    "CREATE TRIGGER tweet_fts_update AFTER UPDATE OF content ON tweet BEGIN "
+    "INSERT INTO tweet_fts(tweet_fts, rowid, content) VALUES ('delete', old.id, old.content); "
+    "INSERT INTO tweet_fts(rowid, content) VALUES (new.id, new.content); END",
+):
+    event.listen(Tweet.__table__, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+event.listen(
+    Tweet.__table__, "before_drop", DDL("DROP TABLE IF EXISTS tweet_fts").execute_if(dialect="sqlite")
+)
+
+
+class Media(Base):
+    """
+    مدل SQLAlchemy برای جدول 'media'
+    """
+    __tablename__ = "media"
+
+    id = Column(Integer, primary_key=True, index=True)
+    # کلید بک‌اند ذخیره‌سازی (shard_key(sha256))؛ برای رسانه‌های قدیمی مسیر روی دیسک
+    file_path = Column(String, nullable=False)
+    file_type = Column(String, nullable=True)
+    # هش محتوا؛ آپلودهای یکسان به یک سطر و یک فایل اشاره می‌کنند
+    sha256 = Column(String(64), unique=True, index=True, nullable=True)
+    size = Column(Integer, nullable=True)
+    # تعداد آپلودهایی که این فایل را ارجاع می‌دهند؛ حذف توییت پیوست آن را کم می‌کند و در صفر
+    # (اگر به توییت دیگری پیوست نباشد) سطر و فایل حذف می‌شوند
+    ref_count = Column(Integer, default=1, server_default="1", nullable=False)
+
+
+class TimelineEntry(Base):
+    """
+    تایم‌لاین خانگی مادی‌شده (materialized): هر سطر یعنی توییت tweet_id
+    در تایم‌لاین کاربر user_id قرار دارد. created_at از توییت کپی می‌شود تا
+    خواندن یک صفحه فقط یک range scan روی ایندکس (user_id, created_at, tweet_id) باشد.
+    """
+    __tablename__ = "timeline"
+    __table_args__ = (
+        Index("ix_timeline_user_created_at_tweet", "user_id", "created_at", "tweet_id"),
+        Index("ix_timeline_tweet_id", "tweet_id"),
+    )
+
+    user_id = Column(Integer, ForeignKey("user.id", ondelete="CASCADE"), primary_key=True)
+    tweet_id = Column(Integer, ForeignKey("tweet.id", ondelete="CASCADE"), primary_key=True)
+    author_id = Column(Integer, ForeignKey("user.id", ondelete="CASCADE"), nullable=False)
+    created_at = Column(DateTime, nullable=False)
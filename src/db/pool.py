@@ -0,0 +1,129 @@
+# src/db/pool.py
+# Connection pool instrumentation: checkout wait time, occupancy and overflow usage
+
+import threading
+import time
+from typing import Dict
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from ..core.config import PerSettings
+
+
+class PoolStats:
+    """Live counters for one engine's pool (thread-safe)"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.pool = None
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.checked_out = 0
+        self.peak_checked_out = 0
+        self.overflow_checkouts = 0
+        self.peak_overflow = 0
+
+    def record_wait(self, seconds: float, timed_out: bool = False) -> None:
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+                return
+            self.checkouts += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+
+    def on_checkout(self) -> None:
+        with self._lock:
+            self.checked_out += 1
+            self.peak_checked_out = max(self.peak_checked_out, self.checked_out)
+            overflow = self.pool.overflow() if self.pool is not None else 0
+            if overflow > 0:
+                self.overflow_checkouts += 1
+                self.peak_overflow = max(self.peak_overflow, overflow)
+
+    def on_checkin(self) -> None:
+        with self._lock:
+            self.checked_out = max(0, self.checked_out - 1)
+
+    def snapshot(self) -> dict:
+        pool = self.pool
+        with self._lock:
+            return {
+                "pool_size": pool.size() if pool is not None else None,
+                "checked_out": self.checked_out,
+                "checked_in": pool.checkedin() if pool is not None else None,
+                "overflow": pool.overflow() if pool is not None else None,
+                "peak_checked_out": self.peak_checked_out,
+                "peak_overflow": self.peak_overflow,
+                "overflow_checkouts": self.overflow_checkouts,
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_avg_ms": round(self.wait_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                "wait_max_ms": round(self.wait_max * 1000, 3),
+            }
+
+
+# engine name -> stats of the current app's engines, reported by GET /internal/pool
+pool_stats: Dict[str, PoolStats] = PerSettings(dict)
+
+
+class _TimedGetMixin:
+    """Times how long each checkout waits for a free connection"""
+
+    stats: PoolStats = None
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            if self.stats is not None:
+                self.stats.record_wait(time.perf_counter() - start, timed_out=True)
+            raise
+        if self.stats is not None:
+            self.stats.record_wait(time.perf_counter() - start)
+        return connection
+
+    def recreate(self):
+        # keep instrumentation when the pool is recreated (e.g. after dispose)
+        new_pool = super().recreate()
+        new_pool.stats = self.stats
+        if self.stats is not None:
+            self.stats.pool = new_pool
+        return new_pool
+
+
+class InstrumentedQueuePool(_TimedGetMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_TimedGetMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def instrument_engine(engine, name: str) -> PoolStats:
+    """
+    Attach checkout/checkin listeners to ``engine`` (sync Engine or
+    AsyncEngine.sync_engine) and register its stats under ``name``.
+    """
+    stats = PoolStats(name)
+    pool = engine.pool
+    stats.pool = pool
+    if isinstance(pool, _TimedGetMixin):
+        pool.stats = stats
+
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        stats.on_checkout()
+
+    @event.listens_for(engine, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        stats.on_checkin()
+
+    pool_stats[name] = stats
+    return stats
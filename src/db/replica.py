@@ -0,0 +1,150 @@
+# src/db/replica.py
+# Read-replica routing: which requests may read from the replica
+
+import hashlib
+import threading
+import time
+from typing import Callable, Hashable, Iterable, Optional, Tuple
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+
+from ..core.cache import TTLCache
+
+# Methods that never write; everything else is routed to the primary
+READ_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+# Seconds the replica is behind the primary (0 when the server is not a standby)
+POSTGRES_LAG_QUERY = text(
+    "SELECT CASE WHEN pg_is_in_recovery() "
+    "THEN COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) ELSE 0 END"
+)
+
+
+def measure_lag(db: Session) -> float:
+    """Replication lag of the database behind ``db``; dialects without a standby report 0"""
+    if db.get_bind().dialect.name == "postgresql":
+        return float(db.execute(POSTGRES_LAG_QUERY).scalar() or 0.0)
+    db.execute(text("SELECT 1"))
+    return 0.0
+
+
+class ReplicaRouter:
+    """
+    Routing state shared by all requests of one process:
+
+    - read-your-writes: a client that sent a write is pinned to the primary
+      for ``sticky_seconds`` (keyed by credential hashes, see ``client_keys``)
+    - health: the replica's lag is probed at most every ``check_interval``
+      seconds; when it lags more than ``max_lag_seconds`` or the probe/any
+      query fails with a connection error, reads fall back to the primary
+      for ``retry_seconds``
+    """
+
+    def __init__(
+        self,
+        sticky_seconds: float,
+        max_lag_seconds: float,
+        check_interval: float,
+        retry_seconds: float,
+        max_clients: int = 100_000,
+        lag_probe: Callable[[Session], float] = measure_lag,
+    ):
+        self.max_lag_seconds = max_lag_seconds
+        self.check_interval = check_interval
+        self.retry_seconds = retry_seconds
+        self.lag_probe = lag_probe
+        self._writers = TTLCache(max_entries=max_clients, ttl=sticky_seconds)
+        self._lock = threading.Lock()
+        self._checked_at = float("-inf")
+        self._down_until = float("-inf")
+        self.lag: Optional[float] = None
+        self.replica_reads = 0
+        self.primary_reads = 0
+        self.fallbacks = 0
+
+    # --- read-your-writes ---
+
+    def mark_write(self, clients: Iterable[Hashable]) -> None:
+        for client in clients:
+            self._writers.set(client, True)
+
+    def is_sticky(self, clients: Iterable[Hashable]) -> bool:
+        return any(client in self._writers for client in clients)
+
+    # --- health ---
+
+    def mark_down(self) -> None:
+        with self._lock:
+            self._down_until = time.monotonic() + self.retry_seconds
+            self._checked_at = float("-inf")
+
+    def needs_probe(self) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            return now >= self._down_until and now - self._checked_at >= self.check_interval
+
+    def probe(self, db: Session) -> bool:
+        """Measure lag on a replica session; marks the replica down on failure or excess lag"""
+        try:
+            lag = self.lag_probe(db)
+        except DBAPIError:
+            db.rollback()
+            self.mark_down()
+            return False
+        db.rollback()
+        with self._lock:
+            self.lag = lag
+            self._checked_at = time.monotonic()
+            if lag > self.max_lag_seconds:
+                self._down_until = self._checked_at + self.retry_seconds
+        return lag <= self.max_lag_seconds
+
+    def replica_available(self) -> bool:
+        with self._lock:
+            return time.monotonic() >= self._down_until
+
+    def record(self, on_replica: bool, fallback: bool = False) -> None:
+        with self._lock:
+            if on_replica:
+                self.replica_reads += 1
+            else:
+                self.primary_reads += 1
+            if fallback:
+                self.fallbacks += 1
+
+    def watch(self, engine: Engine) -> None:
+        """Mark the replica down as soon as one of its connections is lost"""
+
+        @event.listens_for(engine, "handle_error")
+        def _on_error(context):
+            if context.is_disconnect:
+                self.mark_down()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "available": time.monotonic() >= self._down_until,
+                "lag_seconds": self.lag,
+                "replica_reads": self.replica_reads,
+                "primary_reads": self.primary_reads,
+                "fallbacks": self.fallbacks,
+                "sticky_clients": self._writers.stats()["entries"],
+            }
+
+
+def client_keys(headers, issued: Iterable[str] = ()) -> Tuple[Hashable, ...]:
+    """
+    Identities used for stickiness: SHA-256 digests of the caller's API key or
+    bearer token and of any credential the request issued (login),
+    so a client reads its own writes with the credentials it just received.
+    Addresses are not used: clients behind one NAT or proxy share an address.
+    Digests keep raw credentials out of the routing state.
+    """
+    authorization = headers.get("authorization") or ""
+    scheme, _, token = authorization.partition(" ")
+    bearer = token.strip() if scheme.lower() == "bearer" else None
+    credentials = (headers.get("api-key"), bearer, *issued)
+    return tuple(hashlib.sha256(c.encode()).hexdigest() for c in credentials if c)
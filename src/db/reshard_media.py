@@ -0,0 +1,130 @@
+# src/db/reshard_media.py
+# انتقال فایل‌های رسانه قدیمی (پوشه تخت MEDIA_ROOT) به چیدمان sharded بک‌اند ذخیره‌سازی
+#
+# اجرا:  python -m src.db.reshard_media [--batch-size 500] [--dry-run]
+#
+# برای هر سطر Media که file_path آن هنوز کلید shard_key(sha256) نیست، هش محتوا
+# محاسبه (در صورت نبود)، فایل به media_storage منتقل و سطر به‌روزرسانی می‌شود.
+# اگر همان محتوا قبلاً سطر دیگری داشته باشد، پیوست‌های توییت به آن سطر منتقل،
+# ref_count جمع و سطر تکراری حذف می‌شود. اجرای دوباره بی‌خطر است.
+# media_cache پردازه‌های در حال اجرا مسیرهای قدیمی را تا MEDIA_CACHE_TTL_SECONDS نگه
+# می‌دارد؛ پس از مهاجرت سرویس را restart کنید.
+
+import argparse
+import hashlib
+import os
+from typing import Optional
+
+from sqlalchemy import delete, literal, select, update
+from sqlalchemy.orm import Session
+
+from ..core.storage import MediaStorage, shard_key
+from . import models
+from .statements import insert_ignore
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def _file_sha256(path: str) -> tuple[str, int]:
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as source:
+        while chunk := source.read(CHUNK_SIZE):
+            size += len(chunk)
+            digest.update(chunk)
+    return digest.hexdigest(), size
+
+
+def _merge_into(db: Session, duplicate: models.Media, survivor_id: int) -> None:
+    """انتقال پیوست‌ها و ref_count سطر تکراری به survivor و حذف آن"""
+    links = select(models.tweet_media_table.c.tweet_id, literal(survivor_id)).where(
+        models.tweet_media_table.c.media_id == duplicate.id
+    )
+    db.execute(
+        insert_ignore(db, models.tweet_media_table).from_select(["tweet_id", "media_id"], links)
+    )
+    db.execute(
+        delete(models.tweet_media_table).where(models.tweet_media_table.c.media_id == duplicate.id)
+    )
+    db.execute(
+        update(models.Media)
+        .where(models.Media.id == survivor_id)
+        .values(ref_count=models.Media.ref_count + duplicate.ref_count)
+    )
+    db.delete(duplicate)
+
+
+def reshard_media(
+    db: Session, storage: MediaStorage, batch_size: int = 500, dry_run: bool = False
+) -> dict:
+    """
+    انتقال همه رسانه‌های قدیمی به storage. خروجی: شمارنده‌های moved/merged/missing
+    """
+    stats = {"moved": 0, "merged": 0, "missing": 0}
+    # sha256 -> id سطرهای پردازش شده در این اجرا (تا dry_run هم تکراری‌ها را تشخیص دهد)
+    seen: dict = {}
+    last_id = 0
+    while True:
+        batch = db.execute(
+            select(models.Media)
+            .where(models.Media.id > last_id)
+            .order_by(models.Media.id)
+            .limit(batch_size)
+        ).scalars().all()
+        if not batch:
+            break
+        last_id = batch[-1].id
+
+        for media in batch:
+            if media.sha256 and media.file_path == shard_key(media.sha256):
+                continue
+            if not os.path.exists(media.file_path):
+                stats["missing"] += 1
+                continue
+            sha256, size = media.sha256, media.size
+            if not sha256 or size is None:
+                sha256, size = _file_sha256(media.file_path)
+
+            survivor_id: Optional[int] = seen.get(sha256) or db.execute(
+                select(models.Media.id).where(
+                    models.Media.sha256 == sha256, models.Media.id != media.id
+                )
+            ).scalar()
+            seen.setdefault(sha256, survivor_id or media.id)
+            stats["merged" if survivor_id else "moved"] += 1
+            if dry_run:
+                continue
+
+            # put_file فایل مبدأ را منتقل (یا در صورت وجود کلید، حذف) می‌کند
+            storage.put_file(shard_key(sha256), media.file_path)
+            if survivor_id:
+                _merge_into(db, media, survivor_id)
+            else:
+                media.sha256 = sha256
+                media.size = size
+                media.file_path = shard_key(sha256)
+            # هر سطر جداگانه commit می‌شود تا فایل منتقل شده و سطر هماهنگ بمانند
+            db.commit()
+    return stats
+
+
+def main(argv: Optional[list] = None) -> None:
+    parser = argparse.ArgumentParser(description="Re-shard media files into the storage backend layout")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args(argv)
+
+    from ..core.storage import media_storage
+    from .session import SessionLocal, init_engines
+
+    init_engines()
+    db = SessionLocal()
+    try:
+        stats = reshard_media(db, media_storage, batch_size=args.batch_size, dry_run=args.dry_run)
+    finally:
+        db.close()
+    print(" ".join(f"{name}={count}" for name, count in stats.items()))
+
+
+if __name__ == "__main__":
+    main()
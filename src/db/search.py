@@ -0,0 +1,92 @@
+# src/db/search.py
+# جستجوی متن کامل توییت‌ها روی ایندکس متنی پایگاه داده
+#
+# PostgreSQL: tweet.search_vector (tsvector تولیدشده) با ایندکس GIN و رتبه ts_rank_cd.
+# SQLite: جدول FTS5 به نام tweet_fts و رتبه bm25 (جدول و triggerها در models.py).
+# در هر دو حالت، کلمات پرس‌وجو با AND ترکیب می‌شوند و ورودی کاربر هرگز به
+# عنوان نحو پرس‌وجوی متنی تفسیر نمی‌شود. نتایج با keyset روی (score, id) صفحه‌بندی می‌شوند.
+
+import re
+from typing import List, Optional, Tuple
+
+from sqlalchemy import Float, and_, cast, desc, func, literal, literal_column, or_, select, text
+from sqlalchemy.orm import Session
+
+from . import models
+from .feed import TweetDTO, get_tweets_by_ids
+from ..core.pagination import decode_score_cursor, encode_cursor
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def _tokens(q: str) -> List[str]:
+    return _WORD.findall(q.lower())
+
+
+def _ranked_matches(db: Session, tokens: List[str]):
+    """زیرکوئری (id, score) توییت‌های منطبق؛ score بزرگ‌تر یعنی مرتبط‌تر"""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        vector = literal_column("tweet.search_vector")
+        tsquery = func.plainto_tsquery("simple", " ".join(tokens))
+        # ts_rank_cd از نوع real (float4) است؛ مقایسه آن با cursor (float8) برای رتبه‌های برابر
+        # نه "<" است نه "="، پس رتبه به float8 تبدیل می‌شود تا مقدار cursor دقیقاً برگردد
+        rank = cast(func.ts_rank_cd(vector, tsquery), Float)
+        query = (
+            select(models.Tweet.id.label("id"), rank.label("score"))
+            .where(vector.op("@@")(tsquery))
+        )
+    elif dialect == "sqlite":
+        # هر کلمه به صورت رشته نقل‌قول‌شده FTS5 (بدون عملگر)؛ bm25 کوچک‌تر یعنی مرتبط‌تر
+        match = " ".join('"{}"'.format(token.replace('"', '""')) for token in tokens)
+        query = (
+            select(
+                literal_column("tweet_fts.rowid").label("id"),
+                (-func.bm25(literal_column("tweet_fts"))).label("score"),
+            )
+            .select_from(text("tweet_fts"))
+            .where(text("tweet_fts MATCH :match").bindparams(match=match))
+        )
+    else:
+        # dialect بدون ایندکس متنی: اسکن LIKE (فقط برای توسعه)
+        query = select(models.Tweet.id.label("id"), literal(0.0).label("score")).where(
+            and_(*(models.Tweet.content.ilike(f"%{token}%") for token in tokens))
+        )
+    return query.subquery("matches")
+
+
+def search_tweets(
+    db: Session, q: str, limit: int, cursor: Optional[str] = None
+) -> Tuple[List[TweetDTO], Optional[str]]:
+    """
+    یک صفحه از نتایج جستجو به ترتیب رتبه (و سپس جدیدترین).
+    خروجی: (توییت‌های صفحه، cursor صفحه بعد یا None)
+    """
+    tokens = _tokens(q)
+    if not tokens:
+        return [], None
+
+    matches = _ranked_matches(db, tokens)
+    query = select(matches.c.id, matches.c.score).order_by(
+        desc(matches.c.score), desc(matches.c.id)
+    )
+    if cursor:
+        score, tweet_id = decode_score_cursor(cursor)
+        query = query.where(
+            or_(
+                matches.c.score < score,
+                and_(matches.c.score == score, matches.c.id < tweet_id),
+            )
+        )
+
+    # یک سطر اضافه برای تشخیص وجود صفحه بعد
+    rows = db.execute(query.limit(limit + 1)).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    next_cursor = None
+    if has_more:
+        last = rows[-1]
+        next_cursor = encode_cursor(last.score, last.id)
+
+    return get_tweets_by_ids(db, [row.id for row in rows]), next_cursor
@@ -1,21 +1,245 @@
 # src/db/session.py
 
-from typing import Generator
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncGenerator, Callable, Generator, Optional, TypeVar, Union
+
+from fastapi import Request
+from fastapi.concurrency import contextmanager_in_threadpool, run_in_threadpool
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from ..core.config import PerSettings, settings
+from .pool import InstrumentedAsyncQueuePool, InstrumentedQueuePool, instrument_engine
+from .replica import READ_METHODS, ReplicaRouter, client_keys
+
+T = TypeVar("T")
+
+# Session همگام یا ناهمگام، بسته به تنظیم DB_ASYNC
+DBSession = Union[Session, AsyncSession]
+
+
+def pool_options() -> dict:
+    """Pool parameters from Settings, shared by the sync and async engines"""
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+
+class Engines:
+    """Engines of one Settings object; ``None`` until ``init_engines()``"""
+
+    def __init__(self):
+        self.primary = None
+        self.primary_async = None
+        self.replica = None
+        self.replica_async = None
+
+
+# Engines are created by init_engines() (app startup, or the first session a
+# dependency opens), never at import time: importing the app stays cheap.
+# Engines, session factories and the replica router exist once per Settings
+# object (see PerSettings), so two apps built with different Settings use
+# different databases. Until init_engines() the session factories are unbound.
+engines = PerSettings(Engines)
+_engines_lock = threading.Lock()
+
+SessionLocal = PerSettings(lambda: sessionmaker(autocommit=False, autoflush=False))
+# expire_on_commit=False: attributes stay readable after commit without a lazy refresh
+AsyncSessionLocal = PerSettings(lambda: async_sessionmaker(autoflush=False, expire_on_commit=False))
+
+# Optional read replica (DB_REPLICA_URL / DB_REPLICA_ASYNC_URL); reads fall back to the primary
+ReplicaSessionLocal = PerSettings(lambda: sessionmaker(autocommit=False, autoflush=False))
+AsyncReplicaSessionLocal = PerSettings(lambda: async_sessionmaker(autoflush=False, expire_on_commit=False))
+replica_router = PerSettings(lambda: ReplicaRouter(
+    sticky_seconds=settings.DB_REPLICA_STICKY_SECONDS,
+    max_lag_seconds=settings.DB_REPLICA_MAX_LAG_SECONDS,
+    check_interval=settings.DB_REPLICA_CHECK_INTERVAL,
+    retry_seconds=settings.DB_REPLICA_RETRY_SECONDS,
+))
+
+
+def _bound(factory: Optional[Union[sessionmaker, async_sessionmaker]]) -> bool:
+    return factory is not None and factory.kw.get("bind") is not None
+
+
+def init_engines() -> None:
+    """Create the engines described by the current Settings and bind the session factories (idempotent)"""
+    current = engines.resolve()
+    with _engines_lock:
+        if current.primary is not None:
+            return
+        if settings.DB_ASYNC:
+            # Async engine (e.g. postgresql+asyncpg or sqlite+aiosqlite)
+            current.primary_async = create_async_engine(
+                settings.SQLALCHEMY_ASYNC_DATABASE_URL,
+                poolclass=InstrumentedAsyncQueuePool,
+                **pool_options(),
+            )
+            instrument_engine(current.primary_async.sync_engine, "primary_async")
+            AsyncSessionLocal.configure(bind=current.primary_async)
+            if settings.DB_REPLICA_ASYNC_URL:
+                current.replica_async = create_async_engine(
+                    settings.DB_REPLICA_ASYNC_URL, poolclass=InstrumentedAsyncQueuePool, **pool_options()
+                )
+                instrument_engine(current.replica_async.sync_engine, "replica_async")
+                replica_router.watch(current.replica_async.sync_engine)
+                AsyncReplicaSessionLocal.configure(bind=current.replica_async)
+        elif settings.DB_REPLICA_URL:
+            current.replica = create_engine(
+                settings.DB_REPLICA_URL, poolclass=InstrumentedQueuePool, **pool_options()
+            )
+            instrument_engine(current.replica, "replica")
+            replica_router.watch(current.replica)
+            ReplicaSessionLocal.configure(bind=current.replica)
+        # The sync engine always exists: CLI tools and sync code paths use it
+        primary = create_engine(
+            settings.SQLALCHEMY_DATABASE_URL,
+            poolclass=InstrumentedQueuePool,
+            **pool_options(),
+        )
+        instrument_engine(primary, "primary")
+        SessionLocal.configure(bind=primary)
+        current.primary = primary
+
+
+async def dispose_engines() -> None:
+    """Close all pooled connections and unbind the session factories (app shutdown)"""
+    current = engines.resolve()
+    with _engines_lock:
+        sync_engines = (current.primary, current.replica)
+        async_engines = (current.primary_async, current.replica_async)
+        current.primary = current.primary_async = current.replica = current.replica_async = None
+        for factory in (SessionLocal, AsyncSessionLocal, ReplicaSessionLocal, AsyncReplicaSessionLocal):
+            factory.configure(bind=None)
+    for sync in sync_engines:
+        if sync is not None:
+            sync.dispose()
+    for async_ in async_engines:
+        if async_ is not None:
+            await async_.dispose()
+
+
+def _route(request: Request, router: ReplicaRouter) -> Optional[bool]:
+    """
+    True: read from the replica (after a health probe if one is due);
+    False: primary (fallback); None: primary because the request writes
+    or the client is inside its read-your-writes window.
+    """
+    if request.method not in READ_METHODS:
+        router.mark_write(_clients(request))
+        return None
+    if router.is_sticky(_clients(request)):
+        router.record(on_replica=False)
+        return None
+    return router.replica_available()
+
+
+def _clients(request: Request):
+    return client_keys(request.headers, getattr(request.state, "issued_credentials", ()))
+
+
+def mark_credential_issued(request: Request, credential: str) -> None:
+    """Pin a credential returned by this write request to the primary, like the caller's own"""
+    request.state.issued_credentials = getattr(request.state, "issued_credentials", ()) + (credential,)
+
+
+def routed_sync_db(
+    primary: sessionmaker, replica: Optional[sessionmaker] = None, router: ReplicaRouter = replica_router
+) -> Callable[..., Generator[Session, None, None]]:
+    """Build a ``get_db`` dependency that sends read-only requests to ``replica``"""
+
+    def get_sync_db(request: Request) -> Generator[Session, None, None]:
+        if not _bound(primary):
+            init_engines()
+        db = None
+        routed = _bound(replica)
+        if routed:
+            use_replica = _route(request, router)
+            if use_replica:
+                db = replica()
+                if router.needs_probe() and not router.probe(db):
+                    db.close()
+                    db = None
+            if use_replica is not None:
+                router.record(on_replica=db is not None, fallback=db is None)
+        if db is None:
+            db = primary()
+        try:
+            yield db
+        finally:
+            db.close()
+            if routed and request.method not in READ_METHODS:
+                # the window starts again once the write is done
+                router.mark_write(_clients(request))
+
+    return get_sync_db
+
+
+def routed_async_db(
+    primary: async_sessionmaker, replica: Optional[async_sessionmaker] = None,
+    router: ReplicaRouter = replica_router,
+) -> Callable[..., AsyncGenerator[AsyncSession, None]]:
+    """Async counterpart of ``routed_sync_db``; the health probe runs through ``run_sync``"""
+
+    async def get_async_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
+        if not _bound(primary):
+            init_engines()
+        db = None
+        routed = _bound(replica)
+        if routed:
+            use_replica = _route(request, router)
+            if use_replica:
+                db = replica()
+                if router.needs_probe() and not await db.run_sync(router.probe):
+                    await db.close()
+                    db = None
+            if use_replica is not None:
+                router.record(on_replica=db is not None, fallback=db is None)
+        if db is None:
+            db = primary()
+        try:
+            async with db:
+                yield db
+        finally:
+            if routed and request.method not in READ_METHODS:
+                # the window starts again once the write is done
+                router.mark_write(_clients(request))
+
+    return get_async_db
+
+
+get_sync_db = routed_sync_db(SessionLocal, ReplicaSessionLocal)
+get_async_db = routed_async_db(AsyncSessionLocal, AsyncReplicaSessionLocal)
+
 
-from ..core.config import settings
+async def get_db(request: Request) -> AsyncGenerator[DBSession, None]:
+    """
+    Dependency to get the database session: an AsyncSession or a Session
+    depending on the current app's DB_ASYNC (the sync one is opened and closed
+    in the threadpool, as FastAPI does for sync generator dependencies).
+    """
+    if settings.DB_ASYNC:
+        async with asynccontextmanager(get_async_db)(request) as db:
+            yield db
+    else:
+        async with contextmanager_in_threadpool(contextmanager(get_sync_db)(request)) as db:
+            yield db
 
-# Create engine for connecting to the PostgreSQL database
-engine = create_engine(settings.SQLALCHEMY_DATABASE_URL)
 
-# Configure session maker
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+async def run_db(db: DBSession, fn: Callable[..., T], *args, **kwargs) -> T:
+    """
+    Run a synchronous unit of work ``fn(session, *args, **kwargs)``.
 
-# Dependency to get the database session
-def get_db() -> Generator:
-    try:
-        db = SessionLocal()
-        yield db
-    finally:
-        db.close()
\ No newline at end of file
+    With an AsyncSession the function runs through ``run_sync`` on the event
+    loop (I/O is awaited, no thread is held, lazy loads keep working).
+    With a plain Session it runs in Starlette's threadpool as before.
+    """
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(fn, *args, **kwargs)
+    return await run_in_threadpool(fn, db, *args, **kwargs)
@@ -0,0 +1,38 @@
+# src/db/statements.py
+# Dialect-aware statement helpers
+
+from typing import Sequence
+
+from sqlalchemy import Table, insert
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.orm import Session
+
+
+def insert_ignore(db: Session, table: Table):
+    """
+    INSERT that silently skips rows violating a unique/primary key
+    (ON CONFLICT DO NOTHING on PostgreSQL and SQLite).
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert(table).on_conflict_do_nothing()
+    if dialect == "sqlite":
+        return sqlite.insert(table).on_conflict_do_nothing()
+    return insert(table).prefix_with("IGNORE")
+
+
+def upsert_increment(db: Session, table: Table, keys: Sequence[str], column: str):
+    """
+    INSERT that adds the inserted value of `column` to the existing row when
+    the primary key `keys` already exists (ON CONFLICT DO UPDATE on PostgreSQL
+    and SQLite, ON DUPLICATE KEY UPDATE elsewhere).
+    """
+    dialect = db.get_bind().dialect.name
+    target = table.c[column]
+    if dialect in ("postgresql", "sqlite"):
+        stmt = (postgresql if dialect == "postgresql" else sqlite).insert(table)
+        return stmt.on_conflict_do_update(
+            index_elements=list(keys), set_={column: target + stmt.excluded[column]}
+        )
+    stmt = mysql.insert(table)
+    return stmt.on_duplicate_key_update({column: target + stmt.inserted[column]})
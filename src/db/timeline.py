@@ -0,0 +1,163 @@
+# src/db/timeline.py
+# تایم‌لاین خانگی با fan-out هنگام نوشتن (fan-out-on-write)
+#
+# هنگام ایجاد توییت، یک سطر برای هر دنبال‌کننده (و خود نویسنده) در جدول
+# timeline درج می‌شود؛ خواندن یک صفحه تایم‌لاین یک range scan روی ایندکس
+# (user_id, created_at, tweet_id) است. برای حساب‌های پرفالوور (fanout_on_read)
+# fan-out انجام نمی‌شود و توییت‌هایشان در زمان خواندن ادغام می‌شوند.
+
+from typing import List, Optional, Tuple
+
+from sqlalchemy import delete, desc, insert, literal, select, tuple_, update
+from sqlalchemy.orm import Session
+
+from . import models
+from .feed import TweetDTO, get_tweets_by_ids
+from ..core.config import settings
+from ..core.pagination import decode_time_cursor, encode_cursor
+
+timeline = models.TimelineEntry.__table__
+follows = models.follows_table
+
+
+def fan_out_tweet(db: Session, tweet: models.Tweet) -> None:
+    """
+    درج توییت در تایم‌لاین نویسنده و (در صورت مجاز بودن) تمام دنبال‌کنندگان.
+    باید پس از flush توییت (وجود id) و قبل از commit فراخوانی شود.
+    """
+    author_id = tweet.author_id
+
+    # نویسنده همیشه توییت خودش را در تایم‌لاین می‌بیند
+    db.execute(
+        insert(timeline).values(
+            user_id=author_id,
+            tweet_id=tweet.id,
+            author_id=author_id,
+            created_at=tweet.created_at,
+        )
+    )
+
+    fanout_on_read, followers_count = db.execute(
+        select(models.User.fanout_on_read, models.User.followers_count)
+        .where(models.User.id == author_id)
+    ).one()
+    if not fanout_on_read and followers_count > settings.TIMELINE_FANOUT_MAX_FOLLOWERS:
+        db.execute(
+            update(models.User).where(models.User.id == author_id).values(fanout_on_read=True)
+        )
+        fanout_on_read = True
+    if fanout_on_read:
+        return
+
+    # یک دستور INSERT ... SELECT برای تمام دنبال‌کنندگان
+    db.execute(
+        insert(timeline).from_select(
+            ["user_id", "tweet_id", "author_id", "created_at"],
+            select(
+                follows.c.follower_id,
+                literal(tweet.id),
+                literal(author_id),
+                literal(tweet.created_at),
+            ).where(follows.c.followed_id == author_id),
+        )
+    )
+
+
+def remove_tweet(db: Session, tweet_id: int) -> None:
+    """حذف توییت از تمام تایم‌لاین‌ها"""
+    db.execute(delete(timeline).where(timeline.c.tweet_id == tweet_id))
+
+
+def backfill_follow(db: Session, follower_id: int, followed_id: int) -> None:
+    """اضافه کردن آخرین توییت‌های کاربر دنبال‌شده به تایم‌لاین دنبال‌کننده"""
+    fanout_on_read = db.execute(
+        select(models.User.fanout_on_read).where(models.User.id == followed_id)
+    ).scalar_one()
+    if fanout_on_read:
+        return
+    recent = (
+        select(
+            literal(follower_id),
+            models.Tweet.id,
+            models.Tweet.author_id,
+            models.Tweet.created_at,
+        )
+        .where(models.Tweet.author_id == followed_id)
+        .order_by(desc(models.Tweet.created_at), desc(models.Tweet.id))
+        .limit(settings.TIMELINE_FOLLOW_BACKFILL)
+    )
+    # توییت‌هایی که از قبل در تایم‌لاین هستند نادیده گرفته می‌شوند
+    existing = select(timeline.c.tweet_id).where(timeline.c.user_id == follower_id)
+    db.execute(
+        insert(timeline).from_select(
+            ["user_id", "tweet_id", "author_id", "created_at"],
+            recent.where(models.Tweet.id.not_in(existing)),
+        )
+    )
+
+
+def drop_follow(db: Session, follower_id: int, followed_id: int) -> None:
+    """حذف توییت‌های کاربر آنفالو شده از تایم‌لاین دنبال‌کننده"""
+    db.execute(
+        delete(timeline).where(
+            timeline.c.user_id == follower_id,
+            timeline.c.author_id == followed_id,
+        )
+    )
+
+
+def _keyset(query, created_at_col, id_col, cursor: Optional[str], limit: int):
+    """اعمال مرتب‌سازی و شرط keyset روی (created_at, id)"""
+    query = query.order_by(desc(created_at_col), desc(id_col))
+    if cursor:
+        created_at, row_id = decode_time_cursor(cursor)
+        query = query.where(tuple_(created_at_col, id_col) < tuple_(created_at, row_id))
+    return query.limit(limit + 1)
+
+
+def get_home_page(
+    db: Session, user_id: int, limit: int, cursor: Optional[str] = None
+) -> Tuple[List[TweetDTO], Optional[str]]:
+    """
+    یک صفحه از تایم‌لاین خانگی کاربر.
+    سطرهای مادی‌شده با یک range scan خوانده می‌شوند و توییت‌های حساب‌های
+    پرفالووری که کاربر دنبال می‌کند (fan-out-on-read) با آن‌ها ادغام می‌شوند.
+    """
+    entries = db.execute(
+        _keyset(
+            select(timeline.c.created_at, timeline.c.tweet_id)
+            .where(timeline.c.user_id == user_id),
+            timeline.c.created_at, timeline.c.tweet_id, cursor, limit,
+        )
+    ).all()
+
+    # حساب‌های پرفالوور دنبال‌شده
+    pulled_authors = select(follows.c.followed_id).join(
+        models.User, models.User.id == follows.c.followed_id
+    ).where(
+        follows.c.follower_id == user_id,
+        models.User.fanout_on_read.is_(True),
+    )
+    pulled = db.execute(
+        _keyset(
+            select(models.Tweet.created_at, models.Tweet.id)
+            .where(models.Tweet.author_id.in_(pulled_authors)),
+            models.Tweet.created_at, models.Tweet.id, cursor, limit,
+        )
+    ).all()
+
+    # ادغام دو منبع (بدون تکرار) و برش صفحه
+    merged = {tweet_id: created_at for created_at, tweet_id in entries}
+    for created_at, tweet_id in pulled:
+        merged.setdefault(tweet_id, created_at)
+    ordered = sorted(merged.items(), key=lambda item: (item[1], item[0]), reverse=True)
+
+    has_more = len(ordered) > limit
+    page = ordered[:limit]
+
+    next_cursor = None
+    if has_more:
+        last_id, last_created_at = page[-1]
+        next_cursor = encode_cursor(last_created_at, last_id)
+
+    return get_tweets_by_ids(db, [tweet_id for tweet_id, _ in page]), next_cursor
@@ -1,20 +1,129 @@
 # src/main.py
+#
+# ساخت برنامه با create_app(settings)؛ import این ماژول فقط FastAPI و تنظیمات را بارگذاری می‌کند.
+# روترها هنگام ساخت برنامه import می‌شوند و engineها، پوشه رسانه و executorها در lifespan:
+#   uvicorn src.main:app                       (نمونه پیش‌فرض، در اولین دسترسی ساخته می‌شود)
+#   uvicorn --factory src.main:create_app
+#
+# تنظیمات هر برنامه روی app.state.settings نگه داشته و در هر درخواست و در lifespan به عنوان
+# تنظیمات جاری فعال می‌شود؛ کش‌ها، storage، executorها و engineهای آن جدا از برنامه‌های دیگرند.
+
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Optional
 
 from fastapi import FastAPI
-from .api import router as api_router
+from fastapi.responses import PlainTextResponse
+
+from .core.config import Settings, get_settings, settings, use_settings
+
+
+class SettingsMiddleware:
+    """middleware خام ASGI: فعال کردن تنظیمات برنامه برای هر درخواست"""
+
+    def __init__(self, app, app_settings: Settings):
+        self.app = app
+        self.app_settings = app_settings
+
+    async def __call__(self, scope, receive, send):
+        with use_settings(self.app_settings):
+            await self.app(scope, receive, send)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """راه‌اندازی منابع برنامه در startup و آزادسازی آن‌ها در shutdown"""
+    from .core.derivatives import derivative_pool
+    from .core.hashing import hashing_pool
+    from .core.storage import media_storage
+    from .db.hashtags import flush_pending_trending, flush_trending_periodically
+    from .db.session import dispose_engines, init_engines
+
+    with use_settings(app.state.settings):
+        # ساخت engine اتصالی باز نمی‌کند؛ اولین اتصال با اولین درخواست ساخته می‌شود
+        init_engines()
+        media_storage.prepare()
+        flusher = asyncio.create_task(flush_trending_periodically(settings.TRENDING_FLUSH_SECONDS))
+        try:
+            yield
+        finally:
+            flusher.cancel()
+            try:
+                await flusher
+            except asyncio.CancelledError:
+                pass
+            hashing_pool.shutdown()
+            derivative_pool.shutdown()
+            # آخرین سطل‌های trending پیش از بستن engineها نوشته می‌شوند
+            try:
+                await asyncio.to_thread(flush_pending_trending)
+            except Exception:
+                logging.getLogger(__name__).exception("final trending flush failed")
+            await dispose_engines()
+
+
+def create_app(app_settings: Optional[Settings] = None) -> FastAPI:
+    """
+    ساخت نمونه FastAPI.
+    app_settings (پیش‌فرض: تنظیمات محیطی) فقط برای همین برنامه اعمال می‌شود و settings
+    مشترک را تغییر نمی‌دهد.
+    """
+    if app_settings is None:
+        app_settings = get_settings()
+
+    # import روترها (و مدل‌ها، schemaها، jose/passlib) تا ساخت برنامه به تعویق می‌افتد
+    from .api import router as api_router
+    from .core import profiling  # noqa: F401  ثبت لاگ کوئری کند، تشخیص N+1 و QueryBudget
+    from .core.metrics import MetricsMiddleware, registry
+
+    # ایجاد نمونه FastAPI
+    app = FastAPI(
+        title="FastAPI Skillbox Project",
+        description="Backend service for user authentication and management.",
+        version="1.0.0",
+        lifespan=lifespan,
+    )
+    app.state.settings = app_settings
+
+    # اضافه کردن روتر اصلی
+    # روترها تمام مسیرهای API ما را شامل می‌شوند.
+    app.include_router(api_router.router)
+
+    with use_settings(app_settings):
+        internal_enabled = settings.INTERNAL_ENDPOINTS_ENABLED
+        metrics_enabled = settings.METRICS_ENABLED
+
+    if internal_enabled:
+        # آمار داخلی (کلیدها و نرخ hit کش، وضعیت pool و executorها)؛ پیش‌فرض خاموش
+        from .api import internal
+
+        app.include_router(internal.router)
+
+    if metrics_enabled:
+        # middleware خام ASGI: زمان پاسخ بر اساس الگوی route و تعداد/زمان کوئری‌های SQL
+        app.add_middleware(MetricsMiddleware)
+
+        @app.get("/metrics", include_in_schema=False)
+        def read_metrics():
+            return PlainTextResponse(
+                registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+            )
+
+    @app.get("/")
+    def read_root():
+        return {"message": "Welcome to the FastAPI Backend (Skillbox)"}
 
-# ایجاد نمونه FastAPI
-app = FastAPI(
-    title="FastAPI Skillbox Project",
-    description="Backend service for user authentication and management.",
-    version="1.0.0",
-)
+    # بیرونی‌ترین middleware (آخرین اضافه شده)، تا بقیه middlewareها هم تنظیمات برنامه را ببینند
+    app.add_middleware(SettingsMiddleware, app_settings=app_settings)
 
-# اضافه کردن روتر اصلی
-# روترها تمام مسیرهای API ما را شامل می‌شوند.
-app.include_router(api_router.router)
+    return app
 
 
-@app.get("/")
-def read_root():
-    return {"message": "Welcome to the FastAPI Backend (Skillbox)"}
+def __getattr__(name: str):
+    # نمونه پیش‌فرض برای "src.main:app" و "from src.main import app"، فقط یک بار ساخته می‌شود
+    if name == "app":
+        global app
+        app = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -10,3 +10,5 @@ class Token(BaseModel):
 
 class TokenPayload(BaseModel):
     user_id: int | None = None
+    # نسخه توکن‌های کاربر در زمان صدور (claim "ver")؛ باید با User.token_version برابر باشد
+    token_version: int = 0
@@ -1,7 +1,10 @@
 # src/schemas/user.py
 
-from typing import List, Optional, Any
-from pydantic import BaseModel, Field
+from typing import Dict, List, Literal, Optional, Any
+from pydantic import AliasChoices, BaseModel, Field, field_validator, model_validator
+
+from ..core.config import settings
+from ..core.derivatives import variants
 
 
 # --- Schemas for User (Auth and Profile) ---
@@ -24,15 +27,28 @@ class UserBase(BaseModel):
 
 
 # شمای کامل کاربر که در پاسخ ثبت نام و GET /api/users/<id> استفاده می‌شود.
+# لیست‌های followers/following از طریق مسیرهای صفحه‌بندی شده جداگانه دریافت می‌شوند.
 class User(UserBase):
-    # لیست کاربران فالور (بر اساس شمای پایه)
-    followers: List[UserBase] = Field(default_factory=list)  # اصلاح شده
-    # لیست کاربرانی که فالو کرده است (بر اساس شمای پایه)
-    following: List[UserBase] = Field(default_factory=list)  # اصلاح شده
+    followers_count: int = Field(0, example=10)
+    following_count: int = Field(0, example=5)
+
+
+# شمای کاربر جاری (شامل API Key؛ فقط برای خود کاربر نمایش داده می‌شود)
+class UserPrivate(User):
+    api_key: str = Field(..., example="k3y...")
 
 
 # شمای GET /api/users/me (تنها برای API Key)
 class UserMe(BaseModel):
+    result: bool = Field(..., example=True)
+    user: UserPrivate
+
+    class Config:
+        from_attributes = True
+
+
+# شمای GET /api/users/<id> (پروفایل عمومی، بدون API Key)
+class UserProfile(BaseModel):
     result: bool = Field(..., example=True)
     user: User
 
@@ -40,6 +56,21 @@ class UserMe(BaseModel):
         from_attributes = True
 
 
+# شمای پاسخ لیست صفحه‌بندی شده کاربران (GET /api/users/<id>/followers و /following)
+class UserListResponse(BaseModel):
+    result: bool = Field(..., example=True)
+    users: List[UserBase] = Field(default_factory=list)
+    # cursor مبهم برای دریافت صفحه بعد (None یعنی صفحه آخر)
+    next_cursor: Optional[str] = Field(None, example="WyIyMDI0LTAxLTAxVDAwOjAwOjAwIiwgNDJd")
+
+
+# شمای پاسخ دریافت دسته‌ای کاربران (GET /api/users/batch)
+class UserBatchResponse(BaseModel):
+    result: bool = Field(..., example=True)
+    # به ترتیب IDهای درخواست؛ IDهای ناموجود حذف می‌شوند
+    users: List[User] = Field(default_factory=list)
+
+
 # --- Schemas for Media ---
 
 # شمای پاسخ برای آپلود مدیا (POST /api/medias)
@@ -48,14 +79,39 @@ class MediaResponse(BaseModel):
     media_id: int = Field(..., example=1)
 
 
+def media_url(media_id: int) -> str:
+    """آدرس عمومی یک فایل رسانه‌ای"""
+    return f"/api/medias/{media_id}"
+
+
+def media_variant_urls(media_id: int) -> Dict[str, str]:
+    """آدرس نسخه‌های کوچک‌شده یک فایل رسانه‌ای"""
+    return {name: f"{media_url(media_id)}?variant={name}" for name in variants()}
+
+
 # شمای پایه برای نمایش مدیا در خروجی توییت
 class MediaBase(BaseModel):
     id: int = Field(..., example=1)
     url: str = Field(..., example="/api/medias/1")  # آدرس URL محلی فایل
+    # نام نسخه -> آدرس نسخه کوچک‌شده (اگر هنوز ساخته نشده باشد، فایل اصلی سرو می‌شود)
+    variants: Dict[str, str] = Field(
+        default_factory=dict,
+        example={"thumb": "/api/medias/1?variant=thumb", "medium": "/api/medias/1?variant=medium"},
+    )
 
     class Config:
         from_attributes = True
 
+    @model_validator(mode="before")
+    @classmethod
+    def _urls_from_id(cls, data: Any) -> Any:
+        # مدل ORM (Media) ستون url/variants ندارد؛ از ID ساخته می‌شوند
+        if not isinstance(data, dict):
+            data = {"id": data.id}
+        if "id" in data:
+            data = {"url": media_url(data["id"]), "variants": media_variant_urls(data["id"]), **data}
+        return data
+
 
 # --- Schemas for Tweets ---
 
@@ -68,7 +124,8 @@ class TweetCreate(BaseModel):
 
 # شمای لایک (برای نمایش در لیست لایک‌های توییت)
 class LikeBase(BaseModel):
-    user_id: int = Field(..., example=1)
+    # از مدل ORM کاربر (User.id) هم قابل ساخت است
+    user_id: int = Field(..., example=1, validation_alias=AliasChoices("user_id", "id"))
     name: str = Field(..., example="Cool Dev")
 
     class Config:
@@ -82,7 +139,9 @@ class TweetResponseBase(BaseModel):
     # Attachments اکنون به جای لیست لینک‌ها، لیست شمای مدیا است
     attachments: List[MediaBase] = Field(default_factory=list)  # اصلاح شده
     author: UserBase
+    # در فیدها فقط حداکثر FEED_LIKERS_PREVIEW لایک‌کننده؛ تعداد کل در like_count
     likes: List[LikeBase] = Field(default_factory=list)  # اصلاح شده
+    like_count: int = Field(0, example=3)
 
     class Config:
         from_attributes = True
@@ -98,6 +157,71 @@ class TweetCreateResponse(BaseModel):
 class TweetListResponse(BaseModel):
     result: bool = Field(..., example=True)
     tweets: List[TweetResponseBase] = Field(default_factory=list)  # اصلاح شده
+    # cursor مبهم برای دریافت صفحه بعد (None یعنی صفحه آخر)
+    next_cursor: Optional[str] = Field(None, example="WyIyMDI0LTAxLTAxVDAwOjAwOjAwIiwgNDJd")
+
+
+# شمای هشتگ‌های پرطرفدار (GET /api/tweets/trending)
+class TrendingHashtag(BaseModel):
+    tag: str = Field(..., example="fastapi")
+    count: int = Field(..., example=42)
+
+
+class TrendingResponse(BaseModel):
+    result: bool = Field(..., example=True)
+    hashtags: List[TrendingHashtag] = Field(default_factory=list)
+
+
+# --- Schemas for batch actions (POST /api/tweets/likes/batch, /api/users/follows/batch) ---
+
+class LikeAction(BaseModel):
+    tweet_id: int = Field(..., example=1)
+    action: Literal["like", "unlike"] = Field(..., example="like")
+
+
+def _check_batch_size(items: list) -> list:
+    # سقف از تنظیمات برنامه جاری در زمان اعتبارسنجی خوانده می‌شود، نه هنگام تعریف شما
+    if len(items) > settings.BATCH_MAX_ITEMS:
+        raise ValueError(f"at most {settings.BATCH_MAX_ITEMS} items are allowed")
+    return items
+
+
+class LikeBatchRequest(BaseModel):
+    # به ترتیب اجرا می‌شوند (like و سپس unlike یک توییت یعنی در نهایت بدون لایک)
+    actions: List[LikeAction] = Field(..., min_length=1)
+
+    @field_validator("actions")
+    @classmethod
+    def _max_actions(cls, actions: list) -> list:
+        return _check_batch_size(actions)
+
+
+class FollowAction(BaseModel):
+    user_id: int = Field(..., example=2)
+    action: Literal["follow", "unfollow"] = Field(..., example="follow")
+
+
+class FollowBatchRequest(BaseModel):
+    actions: List[FollowAction] = Field(..., min_length=1)
+
+    @field_validator("actions")
+    @classmethod
+    def _max_actions(cls, actions: list) -> list:
+        return _check_batch_size(actions)
+
+
+# نتیجه یک عملیات: ok (اعمال شد)، unchanged (از قبل در همین وضعیت بود)،
+# not_found (توییت/کاربر وجود ندارد) یا invalid (مثلاً فالو کردن خود)
+class BatchItemResult(BaseModel):
+    id: int = Field(..., example=1)
+    action: str = Field(..., example="like")
+    status: Literal["ok", "unchanged", "not_found", "invalid"] = Field(..., example="ok")
+
+
+class BatchResponse(BaseModel):
+    result: bool = Field(..., example=True)
+    # به ترتیب عملیات‌های درخواست
+    results: List[BatchItemResult] = Field(default_factory=list)
 
 
 # --- شمای پایه برای پاسخ‌های وضعیت (Status Responses) ---
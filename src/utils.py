@@ -1,18 +1,38 @@
 # src/utils.py
 # توابع مورد نیاز برای هش کردن رمز عبور و کار با زمان (Skillbox)
 
+from functools import lru_cache
+from typing import Optional
+
 from passlib.context import CryptContext
 from datetime import datetime, timedelta
 
-# تنظیمات هش کردن رمز عبور
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from .core.config import settings
+
+
+@lru_cache(maxsize=None)
+def password_context(rounds: int) -> CryptContext:
+    """تنظیمات هش کردن رمز عبور (یک CryptContext برای هر تعداد rounds)"""
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__rounds=rounds,
+    )
 
 
-def get_password_hash(password: str) -> str:
-    """هش کردن رمز عبور"""
-    return pwd_context.hash(password)
+def get_password_hash(password: str, rounds: Optional[int] = None) -> str:
+    """
+    هش کردن رمز عبور.
+    rounds صریح برای اجرا در executor (پردازه worker تنظیمات برنامه را ندارد)؛ پیش‌فرض از تنظیمات.
+    """
+    return password_context(rounds or settings.PASSWORD_BCRYPT_ROUNDS).hash(password)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """بررسی صحت رمز عبور"""
-    return pwd_context.verify(plain_password, hashed_password)
+    """بررسی صحت رمز عبور (rounds از خود هش خوانده می‌شود)"""
+    return password_context(settings.PASSWORD_BCRYPT_ROUNDS).verify(plain_password, hashed_password)
+
+
+def password_needs_rehash(hashed_password: str) -> bool:
+    """آیا هش با تنظیمات فعلی (مثلاً تعداد rounds) ساخته نشده است؟"""
+    return password_context(settings.PASSWORD_BCRYPT_ROUNDS).needs_update(hashed_password)
@@ -0,0 +1,6 @@
+# tests/conftest.py
+# مسیرهای /internal/* در تست‌ها برای بررسی شمارنده‌ها روشن‌اند (پیش‌فرض برنامه: خاموش)
+
+import os
+
+os.environ.setdefault("INTERNAL_ENDPOINTS_ENABLED", "true")
@@ -1,14 +1,31 @@
 # tests/test_api.py
 
+import hashlib
+import io
+import time
+from datetime import datetime
+
 import pytest
 import requests
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, insert, select, update
 from sqlalchemy.orm import sessionmaker
 from src.db.base import Base
 from src.main import app
 from src.db.session import get_db
-from src.db import models
+from src.db import hashtags, models
+from src.core.config import settings
+from src.core.auth_cache import api_key_cache, user_principals
+from src.api.deps import token_cache
+from src.core.hashing import hashing_pool
+from src.core.cache import feed_cache
+from src.core.trending import minute_of, trending, trending_buckets
+from src.api.media import media_cache, variant_cache
+from src.core.storage import LocalStorage, shard_key
+from src.core.derivatives import DerivativePool, variant_key
+from src.core.metrics import registry
+from src.core.profiling import QueryBudgetExceeded, query_budget
+from src.schemas.user import LikeBase, MediaBase
 
 
 # --- تنظیمات دیتابیس تستی ---
@@ -20,7 +37,8 @@ engine = create_engine(
 )
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-# ایجاد تمام جداول در دیتابیس تستی
+# ایجاد تمام جداول در دیتابیس تستی (از نو، تا تغییرات شما اعمال شوند)
+Base.metadata.drop_all(bind=engine)
 Base.metadata.create_all(bind=engine)
 
 
@@ -51,15 +69,29 @@ def clean_db():
     db = TestingSessionLocal()
     
     # پاک کردن داده‌ها با رعایت ترتیب وابستگی
+    db.execute(models.TimelineEntry.__table__.delete())
     db.execute(models.likes_table.delete())
     db.execute(models.follows_table.delete())
     db.execute(models.tweet_media_table.delete())
-    db.execute(models.Tweet.delete())
-    db.execute(models.Media.delete())
-    db.execute(models.User.delete())
+    db.execute(models.TweetHashtag.__table__.delete())
+    db.execute(models.HashtagBucket.__table__.delete())
+    db.execute(models.TweetMention.__table__.delete())
+    db.execute(models.Tweet.__table__.delete())
+    db.execute(models.Media.__table__.delete())
+    db.execute(models.User.__table__.delete())
     db.commit()
     db.close()
 
+    # کش‌ها بین تست‌ها مشترک هستند
+    feed_cache.clear()
+    api_key_cache.clear()
+    token_cache.clear()
+    user_principals.clear()
+    media_cache.clear()
+    variant_cache.clear()
+    trending.clear()
+    trending_buckets.drain()
+
 
 # --- متغیرهای تستی ---
 TEST_USER = {
@@ -79,6 +111,15 @@ TEST_USER_2 = {
 
 # --- توابع کمکی ---
 
+def flush_trending():
+    """مانند flusher دوره‌ای lifespan: نوشتن سطل‌های trending در پایگاه داده تست"""
+    db = TestingSessionLocal()
+    hashtags.flush_trending(db, trending_buckets.drain())
+    db.commit()
+    db.close()
+    trending.clear()
+
+
 def register_user_and_get_api_key(user_data: dict) -> str:
     """ثبت نام کاربر و بازگرداندن API Key."""
     # 1. ثبت نام
@@ -181,6 +222,7 @@ def test_like_tweet():
     # چک کردن فید برای لایک
     feed_response = client.get("/tweets")
     assert len(feed_response.json()["tweets"][0]["likes"]) == 1
+    assert feed_response.json()["tweets"][0]["like_count"] == 1
     assert feed_response.json()["tweets"][0]["likes"][0]["name"] == TEST_USER_2["name"]
     
     # کاربر 2 آن‌لایک می‌کند
@@ -194,6 +236,7 @@ def test_like_tweet():
     # چک کردن فید بعد از آن‌لایک
     feed_response_after = client.get("/tweets")
     assert len(feed_response_after.json()["tweets"][0]["likes"]) == 0
+    assert feed_response_after.json()["tweets"][0]["like_count"] == 0
 
 
 # T5: تست فالو کردن کاربر
@@ -217,13 +260,18 @@ def test_follow_user():
     
     # چک کردن پروفایل کاربر 1 (باید user2 در following باشد)
     user1_profile = client.get("/users/me", headers={"Api-Key": user1_key})
-    assert len(user1_profile.json()["user"]["following"]) == 1
-    assert user1_profile.json()["user"]["following"][0]["name"] == TEST_USER_2["name"]
+    user1_id = user1_profile.json()["user"]["id"]
+    assert user1_profile.json()["user"]["following_count"] == 1
+    following = client.get(f"/users/{user1_id}/following", headers={"Api-Key": user1_key}).json()
+    assert len(following["users"]) == 1
+    assert following["users"][0]["name"] == TEST_USER_2["name"]
     
     # چک کردن پروفایل کاربر 2 (باید user1 در followers باشد)
     user2_profile = client.get(f"/users/{user2_id}", headers={"Api-Key": user1_key})
-    assert len(user2_profile.json()["user"]["followers"]) == 1
-    assert user2_profile.json()["user"]["followers"][0]["name"] == TEST_USER["name"]
+    assert user2_profile.json()["user"]["followers_count"] == 1
+    followers = client.get(f"/users/{user2_id}/followers", headers={"Api-Key": user1_key}).json()
+    assert len(followers["users"]) == 1
+    assert followers["users"][0]["name"] == TEST_USER["name"]
     
     # کاربر 1، کاربر 2 را آنفالو می‌کند
     unfollow_response = client.delete(
@@ -235,4 +283,954 @@ def test_follow_user():
     
     # چک کردن پروفایل کاربر 1 بعد از آنفالو
     user1_profile_after = client.get("/users/me", headers={"Api-Key": user1_key})
-    assert len(user1_profile_after.json()["user"]["following"]) == 0
+    assert user1_profile_after.json()["user"]["following_count"] == 0
+    assert client.get(f"/users/{user1_id}/following", headers={"Api-Key": user1_key}).json()["users"] == []
+
+
+# T6: تست صفحه‌بندی keyset فید
+def test_feed_cursor_pagination():
+    """تست پیمایش فید با limit و cursor بدون تکرار یا جا افتادن توییت‌ها."""
+    api_key = register_user_and_get_api_key(TEST_USER)
+    created_ids = []
+    for i in range(5):
+        response = client.post(
+            "/tweets",
+            json={"tweet_data": f"tweet {i}", "tweet_media_ids": []},
+            headers={"Api-Key": api_key}
+        )
+        created_ids.append(response.json()["tweet_id"])
+
+    seen_ids = []
+    cursor = None
+    while True:
+        params = {"limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        page = client.get("/tweets", params=params).json()
+        assert len(page["tweets"]) <= 2
+        seen_ids.extend(t["id"] for t in page["tweets"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    # جدیدترین اول، بدون تکرار
+    assert seen_ids == list(reversed(created_ids))
+
+    # cursor نامعتبر
+    bad_response = client.get("/tweets", params={"cursor": "not-a-cursor"})
+    assert bad_response.status_code == 400
+
+
+# T7: تست ثابت بودن تعداد کوئری‌های فید (عدم وجود N+1)
+def _count_feed_queries(limit: int) -> int:
+    """تعداد کوئری‌های SQL اجرا شده برای یک درخواست فید"""
+    statements = []
+
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    feed_cache.clear()
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    try:
+        response = client.get("/tweets", params={"limit": limit})
+    finally:
+        event.remove(engine, "before_cursor_execute", _before_cursor_execute)
+    assert response.status_code == 200
+    assert len(response.json()["tweets"]) == limit
+    return len(statements)
+
+
+def test_feed_query_count_is_constant():
+    """تعداد کوئری‌های یک صفحه فید نباید با تعداد توییت‌ها رشد کند."""
+    user1_key = register_user_and_get_api_key(TEST_USER)
+    user2_key = register_user_and_get_api_key(TEST_USER_2)
+
+    db = TestingSessionLocal()
+    media = [models.Media(file_path=f"media/{i}.png", file_type="image/png") for i in range(6)]
+    db.add_all(media)
+    db.commit()
+    media_ids = [m.id for m in media]
+    db.close()
+
+    for i in range(6):
+        tweet_id = client.post(
+            "/tweets",
+            json={"tweet_data": f"tweet {i}", "tweet_media_ids": [media_ids[i]]},
+            headers={"Api-Key": user1_key}
+        ).json()["tweet_id"]
+        client.post(f"/tweets/{tweet_id}/likes", headers={"Api-Key": user2_key})
+
+    feed = client.get("/tweets", params={"limit": 6}).json()["tweets"]
+    assert all(len(t["attachments"]) == 1 and len(t["likes"]) == 1 for t in feed)
+    assert feed[0]["attachments"][0]["url"] == f"/api/medias/{media_ids[5]}"
+    assert feed[0]["attachments"][0]["variants"]["thumb"] == f"/api/medias/{media_ids[5]}?variant=thumb"
+
+    assert _count_feed_queries(2) == _count_feed_queries(6)
+
+
+# T8: تست تایم‌لاین خانگی (fan-out-on-write و fan-out-on-read)
+def _get_user_id(email: str) -> int:
+    db = TestingSessionLocal()
+    user_id = db.execute(select(models.User.id).filter(models.User.email == email)).scalar_one()
+    db.close()
+    return user_id
+
+
+def _home_contents(api_key: str) -> list:
+    response = client.get("/tweets/home", headers={"Api-Key": api_key})
+    assert response.status_code == 200
+    return [t["content"] for t in response.json()["tweets"]]
+
+
+def test_home_timeline_fan_out():
+    """توییت‌های کاربر دنبال‌شده در تایم‌لاین ظاهر و پس از حذف/آنفالو ناپدید می‌شوند."""
+    user1_key = register_user_and_get_api_key(TEST_USER)
+    user2_key = register_user_and_get_api_key(TEST_USER_2)
+    user2_id = _get_user_id(TEST_USER_2["email"])
+
+    client.post("/tweets", json={"tweet_data": "before follow"}, headers={"Api-Key": user2_key})
+    client.post(f"/users/{user2_id}/follow", headers={"Api-Key": user1_key})
+    new_id = client.post("/tweets", json={"tweet_data": "after follow"}, headers={"Api-Key": user2_key}).json()["tweet_id"]
+    client.post("/tweets", json={"tweet_data": "mine"}, headers={"Api-Key": user1_key})
+
+    assert _home_contents(user1_key) == ["mine", "after follow", "before follow"]
+    assert _home_contents(user2_key) == ["after follow", "before follow"]
+
+    client.delete(f"/tweets/{new_id}", headers={"Api-Key": user2_key})
+    assert _home_contents(user1_key) == ["mine", "before follow"]
+
+    client.delete(f"/users/{user2_id}/follow", headers={"Api-Key": user1_key})
+    assert _home_contents(user1_key) == ["mine"]
+
+
+def test_home_timeline_fan_out_on_read(monkeypatch):
+    """برای حساب‌های پرفالوور، توییت‌ها در زمان خواندن ادغام می‌شوند."""
+    monkeypatch.setattr(settings, "TIMELINE_FANOUT_MAX_FOLLOWERS", 0)
+    user1_key = register_user_and_get_api_key(TEST_USER)
+    user2_key = register_user_and_get_api_key(TEST_USER_2)
+    user2_id = _get_user_id(TEST_USER_2["email"])
+
+    client.post(f"/users/{user2_id}/follow", headers={"Api-Key": user1_key})
+    client.post("/tweets", json={"tweet_data": "celebrity tweet"}, headers={"Api-Key": user2_key})
+
+    db = TestingSessionLocal()
+    assert db.get(models.User, user2_id).fanout_on_read is True
+    fanned_out = db.execute(
+        select(models.TimelineEntry).filter(models.TimelineEntry.author_id == user2_id)
+    ).scalars().all()
+    db.close()
+    # فقط سطر تایم‌لاین خود نویسنده
+    assert [entry.user_id for entry in fanned_out] == [user2_id]
+
+    assert _home_contents(user1_key) == ["celebrity tweet"]
+
+
+# T9: تست کش فید و ابطال آن با نوشتن‌ها
+def test_feed_cache_invalidation():
+    """درخواست تکراری از کش پاسخ داده می‌شود و نوشتن‌ها صفحات مربوطه را باطل می‌کنند."""
+    user1_key = register_user_and_get_api_key(TEST_USER)
+    user2_key = register_user_and_get_api_key(TEST_USER_2)
+    tweet_id = client.post("/tweets", json={"tweet_data": "cached"}, headers={"Api-Key": user1_key}).json()["tweet_id"]
+
+    first = client.get("/tweets").json()
+    second = client.get("/tweets").json()
+    assert first == second
+    stats = client.get("/internal/cache").json()["feed"]
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+
+    # لایک صفحه حاوی توییت را باطل می‌کند
+    client.post(f"/tweets/{tweet_id}/likes", headers={"Api-Key": user2_key})
+    assert len(client.get("/tweets").json()["tweets"][0]["likes"]) == 1
+
+    # توییت جدید صفحه اول را باطل می‌کند
+    client.post("/tweets", json={"tweet_data": "newer"}, headers={"Api-Key": user2_key})
+    assert [t["content"] for t in client.get("/tweets").json()["tweets"]] == ["newer", "cached"]
+
+    # حذف توییت
+    client.delete(f"/tweets/{tweet_id}", headers={"Api-Key": user1_key})
+    assert [t["content"] for t in client.get("/tweets").json()["tweets"]] == ["newer"]
+
+
+# T10: تست کش احراز هویت API Key
+def test_api_key_auth_is_cached_and_invalidated():
+    """درخواست‌های تکراری بدون کوئری احراز می‌شوند و غیرفعال کردن کاربر کش را باطل می‌کند."""
+    api_key = register_user_and_get_api_key(TEST_USER)
+    api_key_cache.clear()
+
+    statements = []
+
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    # اولین درخواست: miss و کوئری کاربر
+    client.post("/tweets", json={"tweet_data": "first"}, headers={"Api-Key": api_key})
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    try:
+        client.get("/tweets/home", headers={"Api-Key": api_key})
+    finally:
+        event.remove(engine, "before_cursor_execute", _before_cursor_execute)
+    assert not any("user.api_key" in s for s in statements)
+    stats = client.get("/internal/cache").json()["api_key"]
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+
+    # تغییری که rollback شود کش را باطل نمی‌کند
+    db = TestingSessionLocal()
+    user = db.execute(select(models.User).filter(models.User.api_key == api_key)).scalar_one()
+    user.name = "Renamed"
+    db.flush()
+    db.rollback()
+    assert api_key in api_key_cache
+
+    # غیرفعال کردن کاربر از طریق ORM: ابطال پس از commit، نه در flush (درخواست هم‌زمان پیش
+    # از commit هنوز کاربر فعال را می‌خواند و می‌تواند آن را دوباره کش کند)
+    user = db.execute(select(models.User).filter(models.User.api_key == api_key)).scalar_one()
+    user.is_active = False
+    db.flush()
+    assert api_key in api_key_cache
+    db.commit()
+    assert api_key not in api_key_cache
+    db.close()
+
+    response = client.get("/tweets/home", headers={"Api-Key": api_key})
+    assert response.status_code == 401
+
+
+# T11: تست احراز هویت JWT با کش کاربر
+def test_bearer_token_auth_without_db():
+    """پس از اولین درخواست، درخواست‌های Bearer (تا پایان TTL کش کاربر) هیچ کوئری کاربری اجرا نمی‌کنند."""
+    register_user_and_get_api_key(TEST_USER)
+    token = client.post(
+        "/auth/access-token",
+        data={"username": TEST_USER["email"], "password": TEST_USER["password"]},
+    ).json()["access_token"]
+    user_id = _get_user_id(TEST_USER["email"])
+    headers = {"Authorization": f"Bearer {token}"}
+    assert client.get("/tweets/home", headers=headers).status_code == 200
+
+    statements = []
+
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    try:
+        for _ in range(3):
+            assert client.get("/tweets/home", headers=headers).status_code == 200
+    finally:
+        event.remove(engine, "before_cursor_execute", _before_cursor_execute)
+    assert not any('FROM "user"' in s or "FROM user" in s for s in statements)
+    stats = client.get("/internal/cache").json()["token"]
+    assert stats["hits"] >= 2
+
+    me = client.get("/users/me", headers=headers).json()["user"]
+    assert me["id"] == user_id
+
+    # کاربر غیرفعال شده دیگر با توکن قبلی پذیرفته نمی‌شود
+    db = TestingSessionLocal()
+    db.get(models.User, user_id).is_active = False
+    db.commit()
+    db.close()
+    assert client.get("/tweets/home", headers=headers).status_code == 401
+
+    # فعال شدن دوباره توکن قبلی را زنده نمی‌کند، حتی در پردازه‌ای با کش خالی
+    db = TestingSessionLocal()
+    db.get(models.User, user_id).is_active = True
+    db.commit()
+    db.close()
+    user_principals.clear()
+    assert client.get("/tweets/home", headers=headers).status_code == 401
+
+
+def test_email_subject_tokens_are_rejected():
+    """توکن‌های قدیمی با subject ایمیل (بدون ver) پذیرفته نمی‌شوند و کاربر باید دوباره وارد شود."""
+    from src.api.deps import create_access_token
+
+    register_user_and_get_api_key(TEST_USER)
+    legacy = create_access_token(subject=TEST_USER["email"])
+    assert client.get("/tweets/home", headers={"Authorization": f"Bearer {legacy}"}).status_code == 401
+
+
+def test_bearer_principal_is_refreshed_from_db():
+    """claimهای توکن مورد اعتماد نیستند: تغییر is_superuser در دیتابیس پس از TTL کش دیده می‌شود."""
+    register_user_and_get_api_key(TEST_USER)
+    token = client.post(
+        "/auth/access-token",
+        data={"username": TEST_USER["email"], "password": TEST_USER["password"]},
+    ).json()["access_token"]
+    user_id = _get_user_id(TEST_USER["email"])
+    assert client.get("/users/me", headers={"Authorization": f"Bearer {token}"}).status_code == 200
+    assert user_principals.get(user_id).is_superuser is False
+
+    # تغییر با UPDATE مستقیم (مثلاً از worker دیگر) از رویدادهای ORM عبور نمی‌کند
+    db = TestingSessionLocal()
+    db.execute(update(models.User).where(models.User.id == user_id).values(is_superuser=True))
+    db.commit()
+    db.close()
+    user_principals.clear()  # پایان TTL
+    assert client.get("/users/me", headers={"Authorization": f"Bearer {token}"}).status_code == 200
+    assert user_principals.get(user_id).is_superuser is True
+
+
+# T12: تست executor هش رمز عبور
+def test_hashing_pool_rejects_when_saturated(monkeypatch):
+    """با پر بودن صف هش، ثبت نام سریعاً با 503 رد می‌شود."""
+    monkeypatch.setattr(hashing_pool, "max_pending", 0)
+    response = client.post("/auth/register", json=TEST_USER)
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    assert client.get("/internal/hashing").json()["hashing"]["operations"]["hash"]["rejected"] == 1
+
+
+def test_login_rehashes_outdated_password_hash():
+    """هش ساخته شده با هزینه قدیمی در اولین ورود موفق بازسازی می‌شود."""
+    from passlib.context import CryptContext
+
+    old_hash = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4).hash(TEST_USER["password"])
+    db = TestingSessionLocal()
+    db.add(models.User(name="Old", email=TEST_USER["email"], hashed_password=old_hash, api_key="old-key"))
+    db.commit()
+    db.close()
+
+    response = client.post(
+        "/auth/access-token",
+        data={"username": TEST_USER["email"], "password": TEST_USER["password"]},
+    )
+    assert response.status_code == 200
+
+    db = TestingSessionLocal()
+    new_hash = db.execute(
+        select(models.User.hashed_password).filter(models.User.email == TEST_USER["email"])
+    ).scalar_one()
+    db.close()
+    assert new_hash != old_hash
+    assert new_hash.startswith(f"$2b${settings.PASSWORD_BCRYPT_ROUNDS:02d}$")
+    assert client.get("/internal/hashing").json()["hashing"]["operations"]["rehash"]["count"] >= 1
+
+
+# T13: تست idempotent بودن لایک و شمارنده like_count
+def test_like_is_idempotent_and_counted(monkeypatch):
+    """لایک/آن‌لایک تکراری شمارنده را تغییر نمی‌دهد و توییت ناموجود 404 است."""
+    user1_key = register_user_and_get_api_key(TEST_USER)
+    user2_key = register_user_and_get_api_key(TEST_USER_2)
+    tweet_id = client.post("/tweets", json={"tweet_data": "count me"}, headers={"Api-Key": user1_key}).json()["tweet_id"]
+
+    for key in (user1_key, user2_key, user2_key):
+        assert client.post(f"/tweets/{tweet_id}/likes", headers={"Api-Key": key}).status_code == 200
+    assert client.get("/tweets").json()["tweets"][0]["like_count"] == 2
+
+    # فید فقط چند لایک‌کننده اول را بارگذاری می‌کند؛ تعداد کل از like_count
+    monkeypatch.setattr(settings, "FEED_LIKERS_PREVIEW", 1)
+    feed_cache.clear()
+    tweet = client.get("/tweets").json()["tweets"][0]
+    assert tweet["like_count"] == 2 and [like["name"] for like in tweet["likes"]] == [TEST_USER["name"]]
+
+    for _ in range(2):
+        assert client.delete(f"/tweets/{tweet_id}/likes", headers={"Api-Key": user2_key}).status_code == 200
+    assert client.get("/tweets").json()["tweets"][0]["like_count"] == 1
+
+    assert client.post("/tweets/999999/likes", headers={"Api-Key": user1_key}).status_code == 404
+    assert client.delete("/tweets/999999/likes", headers={"Api-Key": user1_key}).status_code == 404
+
+
+def test_delete_tweet_does_not_load_likers_or_attachments():
+    """حذف توییت ردیف‌های likes و tweet_media را مستقیماً حذف می‌کند و لایک‌کنندگان را بارگذاری نمی‌کند."""
+    user1_key = register_user_and_get_api_key(TEST_USER)
+    user2_key = register_user_and_get_api_key(TEST_USER_2)
+    tweet_id = client.post("/tweets", json={"tweet_data": "bye"}, headers={"Api-Key": user1_key}).json()["tweet_id"]
+    for key in (user1_key, user2_key):
+        assert client.post(f"/tweets/{tweet_id}/likes", headers={"Api-Key": key}).status_code == 200
+
+    statements = []
+
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    try:
+        response = client.delete(f"/tweets/{tweet_id}", headers={"Api-Key": user1_key})
+    finally:
+        event.remove(engine, "before_cursor_execute", _before_cursor_execute)
+    assert response.status_code == 200
+    selects = [s for s in statements if s.lstrip().upper().startswith("SELECT")]
+    assert not [s for s in selects if "likes" in s or "tweet_media" in s]
+
+    db = TestingSessionLocal()
+    assert db.execute(select(models.likes_table.c.user_id)).all() == []
+    assert db.get(models.Tweet, tweet_id) is None
+    db.close()
+
+
+# T14: تست idempotent بودن فالو و صفحه‌بندی لیست دنبال‌کنندگان
+def test_follow_is_idempotent_and_followers_paginate():
+    """فالو/آنفالو تکراری شمارنده‌ها را تغییر نمی‌دهد و لیست‌ها با cursor پیمایش می‌شوند."""
+    target_key = register_user_and_get_api_key(TEST_USER)
+    target_id = _get_user_id(TEST_USER["email"])
+    follower_ids = []
+    for i in range(5):
+        data = {"name": f"F{i}", "email": f"f{i}@example.com", "password": "pw"}
+        key = register_user_and_get_api_key(data)
+        follower_ids.append(_get_user_id(data["email"]))
+        for _ in range(2):
+            assert client.post(f"/users/{target_id}/follow", headers={"Api-Key": key}).status_code == 200
+
+    profile = client.get(f"/users/{target_id}", headers={"Api-Key": target_key}).json()["user"]
+    assert profile["followers_count"] == 5
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        page = client.get(f"/users/{target_id}/followers", params=params, headers={"Api-Key": target_key}).json()
+        seen.extend(u["id"] for u in page["users"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == list(reversed(follower_ids))
+
+    # شمارنده‌ها به ترتیب صعودی ID به‌روز می‌شوند (قفل سطرها با ترتیب ثابت، بدون deadlock)
+    updated = []
+
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith(('UPDATE user ', 'UPDATE "user"')):
+            updated.append(parameters[-1])
+
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    try:
+        assert client.delete(f"/users/{target_id}/follow", headers={"Api-Key": key}).status_code == 200
+    finally:
+        event.remove(engine, "before_cursor_execute", _before_cursor_execute)
+    assert updated == [target_id, follower_ids[-1]]
+
+    assert client.post(f"/users/{target_id}/follow", headers={"Api-Key": target_key}).status_code == 400
+    assert client.post("/users/999999/follow", headers={"Api-Key": target_key}).status_code == 404
+    assert client.delete("/users/999999/follow", headers={"Api-Key": target_key}).status_code == 404
+
+
+# T15: آپلود مبتنی بر هش محتوا، حذف تکرار و محدودیت حجم
+def test_media_upload_is_deduplicated_and_size_limited(tmp_path, monkeypatch):
+    """آپلود یکسان یک فایل و یک سطر با ref_count=2 دارد؛ فایل بزرگ با 413 رد می‌شود."""
+    from src.api import media as media_api
+
+    monkeypatch.setattr(media_api, "media_storage", LocalStorage(str(tmp_path)))
+    monkeypatch.setattr(settings, "MEDIA_UPLOAD_CHUNK_BYTES", 4)
+    monkeypatch.setattr(settings, "MEDIA_MAX_UPLOAD_BYTES", 32)
+    api_key = register_user_and_get_api_key(TEST_USER)
+    headers = {"Api-Key": api_key}
+
+    ids = []
+    for name in ("a.png", "b.png"):
+        response = client.post(
+            "/medias", files={"file": (name, b"same image bytes", "application/octet-stream")}, headers=headers
+        )
+        assert response.status_code == 200
+        ids.append(response.json()["media_id"])
+    assert ids[0] == ids[1]
+    expected_sha = hashlib.sha256(b"same image bytes").hexdigest()
+    stored = [p.relative_to(tmp_path).as_posix() for p in tmp_path.rglob("*") if p.is_file()]
+    assert stored == [shard_key(expected_sha)]
+
+    db = TestingSessionLocal()
+    media = db.get(models.Media, ids[0])
+    assert (media.sha256, media.size, media.ref_count) == (expected_sha, 16, 2)
+    db.close()
+
+    too_large = client.post(
+        "/medias", files={"file": ("big.png", b"x" * 33, "application/octet-stream")}, headers=headers
+    )
+    assert too_large.status_code == 413
+    # فایل موقت آپلود رد شده باقی نمی‌ماند
+    assert [p for p in tmp_path.rglob("*") if p.is_file()] == [tmp_path / shard_key(expected_sha)]
+
+    served = client.get(f"/medias/{ids[0]}")
+    assert served.status_code == 200
+    assert served.content == b"same image bytes"
+
+
+def test_media_is_released_with_its_last_tweet(tmp_path, monkeypatch):
+    """حذف توییت ref_count رسانه را کم می‌کند؛ در صفر سطر و فایل‌ها حذف می‌شوند."""
+    from src.api import media as media_api
+
+    storage = LocalStorage(str(tmp_path))
+    monkeypatch.setattr(media_api, "media_storage", storage)
+    api_key = register_user_and_get_api_key(TEST_USER)
+    headers = {"Api-Key": api_key}
+
+    media_ids = [
+        client.post(
+            "/medias", files={"file": ("a.bin", b"shared bytes", "application/octet-stream")}, headers=headers
+        ).json()["media_id"]
+        for _ in range(2)
+    ]
+    media_id = media_ids[0]
+    tweet_ids = [
+        client.post("/tweets", json={"tweet_data": f"t{i}", "tweet_media_ids": [media_id]}, headers=headers)
+        .json()["tweet_id"]
+        for i in range(2)
+    ]
+    key = shard_key(hashlib.sha256(b"shared bytes").hexdigest())
+    thumb = media_api.variant_key(key, "thumb")
+    with open(tmp_path / "thumb.tmp", "wb") as f:
+        f.write(b"thumb")
+    storage.put_file(thumb, str(tmp_path / "thumb.tmp"))
+    assert client.get(f"/medias/{media_id}").status_code == 200
+
+    assert client.delete(f"/tweets/{tweet_ids[0]}", headers=headers).status_code == 200
+    db = TestingSessionLocal()
+    assert db.get(models.Media, media_id).ref_count == 1
+    db.close()
+    assert storage.exists(key)
+
+    assert client.delete(f"/tweets/{tweet_ids[1]}", headers=headers).status_code == 200
+    db = TestingSessionLocal()
+    assert db.get(models.Media, media_id) is None
+    db.close()
+    assert not storage.exists(key) and not storage.exists(thumb)
+    # متادیتای کش شده هم حذف شده است
+    assert client.get(f"/medias/{media_id}").status_code == 404
+
+
+def test_media_upload_is_rejected_by_content_length(monkeypatch):
+    """Content-Length بزرگ‌تر از حد آپلود پیش از خواندن بدنه با 413 رد می‌شود."""
+    from src.api import media as media_api
+
+    def _unexpected(source):
+        raise AssertionError("upload body should not be read")
+
+    monkeypatch.setattr(media_api, "_store_upload", _unexpected)
+    monkeypatch.setattr(settings, "MEDIA_MAX_UPLOAD_BYTES", 32)
+    api_key = register_user_and_get_api_key(TEST_USER)
+    body = b"x" * (32 + media_api.MULTIPART_OVERHEAD_BYTES + 1)
+    response = client.post(
+        "/medias", files={"file": ("big.bin", body, "application/octet-stream")}, headers={"Api-Key": api_key}
+    )
+    assert response.status_code == 413
+
+
+# T16: کش HTTP رسانه (ETag، 304، Range) و کش متادیتا
+def test_media_conditional_get_and_ranges(tmp_path, monkeypatch):
+    """ETag از هش محتوا، If-None-Match -> 304، Range تکی/چندتایی و بدون کوئری در تکرار."""
+    from src.api import media as media_api
+
+    monkeypatch.setattr(media_api, "media_storage", LocalStorage(str(tmp_path)))
+    api_key = register_user_and_get_api_key(TEST_USER)
+    body = bytes(range(256)) * 4
+    media_id = client.post(
+        "/medias", files={"file": ("a.bin", body, "application/octet-stream")}, headers={"Api-Key": api_key}
+    ).json()["media_id"]
+
+    first = client.get(f"/medias/{media_id}")
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+    assert etag == f'"{hashlib.sha256(body).hexdigest()}"'
+    assert "immutable" in first.headers["cache-control"]
+
+    statements = []
+
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    try:
+        not_modified = client.get(f"/medias/{media_id}", headers={"If-None-Match": f'W/{etag}, "other"'})
+        single = client.get(f"/medias/{media_id}", headers={"Range": "bytes=10-19"})
+        multi = client.get(f"/medias/{media_id}", headers={"Range": "bytes=0-1,-2"})
+    finally:
+        event.remove(engine, "before_cursor_execute", _before_cursor_execute)
+
+    assert statements == []
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+    assert not_modified.headers["etag"] == etag
+    assert single.status_code == 206
+    assert single.content == body[10:20]
+    assert single.headers["content-range"] == f"bytes 10-19/{len(body)}"
+    assert multi.status_code == 206
+    assert multi.headers["content-type"].startswith("multipart/byteranges")
+    assert body[:2] in multi.content and body[-2:] in multi.content
+
+
+# T17: نسخه‌های کوچک‌شده تصویر (پس‌زمینه، lazy و بازگشت به فایل اصلی)
+def _png_bytes(width: int, height: int) -> bytes:
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), (200, 30, 30)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def _wait_for(pool: DerivativePool, completed: int) -> None:
+    deadline = time.monotonic() + 10
+    while pool.stats()["completed"] < completed:
+        assert time.monotonic() < deadline, pool.stats()
+        time.sleep(0.01)
+
+
+def test_media_variants_are_generated_in_background(tmp_path, monkeypatch):
+    """آپلود تصویر نسخه‌ها را می‌سازد؛ نسخه ناموجود فایل اصلی را برمی‌گرداند و lazy ساخته می‌شود."""
+    from PIL import Image
+    from src.api import media as media_api
+
+    storage = LocalStorage(str(tmp_path))
+    pool = DerivativePool(workers=1, max_pending=4, kind="thread")
+    monkeypatch.setattr(media_api, "media_storage", storage)
+    monkeypatch.setattr(media_api, "derivative_pool", pool)
+    api_key = register_user_and_get_api_key(TEST_USER)
+    original = _png_bytes(800, 400)
+    media_id = client.post(
+        "/medias", files={"file": ("a.png", original, "image/png")}, headers={"Api-Key": api_key}
+    ).json()["media_id"]
+    _wait_for(pool, 1)
+
+    thumb = client.get(f"/medias/{media_id}", params={"variant": "thumb"})
+    assert thumb.status_code == 200
+    assert "immutable" in thumb.headers["cache-control"]
+    assert Image.open(io.BytesIO(thumb.content)).size == (settings.MEDIA_THUMBNAIL_SIZE, settings.MEDIA_THUMBNAIL_SIZE // 2)
+    assert thumb.headers["etag"] != client.get(f"/medias/{media_id}").headers["etag"]
+    # بررسی وجود نسخه‌ها در آمار کش رسانه شمرده نمی‌شود
+    assert media_cache.stats()["entries"] == 1 and variant_cache.stats()["entries"] == 1
+
+    # نسخه‌ها پاک شده‌اند (مثلاً رسانه قبل از این قابلیت آپلود شده): اول فایل اصلی، سپس نسخه
+    for path in tmp_path.rglob("*.medium.*"):
+        path.unlink()
+    variant_cache.clear()
+    fallback = client.get(f"/medias/{media_id}", params={"variant": "medium"})
+    assert fallback.status_code == 200
+    assert fallback.content == original
+    assert fallback.headers["cache-control"] == media_api.FALLBACK_CACHE_CONTROL
+    _wait_for(pool, 2)
+    medium = client.get(f"/medias/{media_id}", params={"variant": "medium"})
+    assert Image.open(io.BytesIO(medium.content)).size == (settings.MEDIA_MEDIUM_SIZE, settings.MEDIA_MEDIUM_SIZE // 2)
+
+    assert client.get(f"/medias/{media_id}", params={"variant": "huge"}).status_code == 400
+    pool.shutdown()
+
+
+def test_only_undecodable_images_are_marked_unsupported(tmp_path):
+    """فایل غیرتصویری دوباره صف نمی‌شود؛ خطای گذرا (مثلاً I/O) در درخواست بعدی دوباره تلاش می‌شود."""
+    storage = LocalStorage(str(tmp_path))
+    pool = DerivativePool(workers=1, max_pending=4, kind="thread")
+
+    def _failed(count):
+        deadline = time.monotonic() + 10
+        while pool.stats()["failed"] < count:
+            assert time.monotonic() < deadline, pool.stats()
+            time.sleep(0.01)
+
+    (tmp_path / "text.png").write_bytes(b"not an image")
+    assert pool.schedule(storage, "text.png", "image/png") is not None
+    _failed(1)
+    assert pool.schedule(storage, "text.png", "image/png") is None
+
+    # فایل اصلی (موقتاً) در دسترس نیست
+    future = pool.schedule(storage, "missing.png", "image/png")
+    assert isinstance(future.exception(timeout=10), OSError)
+    _failed(2)
+    (tmp_path / "missing.png").write_bytes(_png_bytes(400, 200))
+    pool.schedule(storage, "missing.png", "image/png").result(timeout=10)
+    _wait_for(pool, 1)
+    assert storage.exists(variant_key("missing.png", "thumb"))
+    pool.shutdown()
+
+
+# T18: مسیر سریع JSON همان خروجی مسیر استاندارد را می‌دهد
+def test_fast_json_responses_match_standard_path(monkeypatch):
+    """با FAST_JSON_RESPONSES بدنه فید، تایم‌لاین و پروفایل‌ها با مسیر استاندارد یکسان است."""
+    api_key = register_user_and_get_api_key(TEST_USER)
+    other_key = register_user_and_get_api_key(TEST_USER_2)
+    user_id = _get_user_id(TEST_USER["email"])
+    headers = {"Api-Key": api_key}
+    db = TestingSessionLocal()
+    media = models.Media(file_path="media/a.png", file_type="image/png")
+    db.add(media)
+    db.commit()
+    media_id = media.id
+    db.close()
+    tweet_id = client.post(
+        "/tweets", json={"tweet_data": "fast", "tweet_media_ids": [media_id]}, headers=headers
+    ).json()["tweet_id"]
+    client.post(f"/tweets/{tweet_id}/likes", headers={"Api-Key": other_key})
+    client.post(f"/users/{user_id}/follow", headers={"Api-Key": other_key})
+
+    # مسیر بدون کش فید تا هر دو حالت از route عبور کنند
+    monkeypatch.setattr(feed_cache, "backend", None)
+    paths = ["/tweets", "/tweets/home", "/users/me", f"/users/{user_id}", f"/users/{user_id}/followers"]
+    standard = [client.get(path, headers=headers).json() for path in paths]
+    monkeypatch.setattr(settings, "FAST_JSON_RESPONSES", True)
+    fast = [client.get(path, headers=headers).json() for path in paths]
+    assert fast == standard
+    assert fast[0]["tweets"][0]["likes"][0]["name"] == TEST_USER_2["name"]
+
+    # LikeBase و MediaBase مستقیماً از مدل‌های ORM هم ساخته می‌شوند
+    db = TestingSessionLocal()
+    tweet = db.get(models.Tweet, tweet_id)
+    like = LikeBase.model_validate(tweet.likes[0])
+    attachment = MediaBase.model_validate(tweet.attachments[0])
+    db.close()
+    assert like.user_id == _get_user_id(TEST_USER_2["email"])
+    assert attachment.url == f"/api/medias/{media_id}"
+
+
+# T19: endpointهای دسته‌ای
+def test_batch_reads_and_actions():
+    """دریافت دسته‌ای توییت/کاربر و لایک/فالو دسته‌ای با نتیجه جداگانه برای هر عملیات."""
+    api_key = register_user_and_get_api_key(TEST_USER)
+    other_key = register_user_and_get_api_key(TEST_USER_2)
+    me_id = _get_user_id(TEST_USER["email"])
+    other_id = _get_user_id(TEST_USER_2["email"])
+    tweet_ids = [
+        client.post(
+            "/tweets", json={"tweet_data": f"t{i}", "tweet_media_ids": []}, headers={"Api-Key": other_key}
+        ).json()["tweet_id"]
+        for i in range(3)
+    ]
+
+    tweets = client.get("/tweets/batch", params={"ids": [tweet_ids[2], 999999, tweet_ids[0]]}).json()
+    assert [t["id"] for t in tweets["tweets"]] == [tweet_ids[2], tweet_ids[0]]
+    users = client.get(
+        "/users/batch", params={"ids": [other_id, me_id, other_id]}, headers={"Api-Key": api_key}
+    ).json()
+    assert [u["id"] for u in users["users"]] == [other_id, me_id]
+    assert client.get("/users/batch", params={"ids": list(range(1000))}, headers={"Api-Key": api_key}).status_code == 422
+
+    liked = client.post(
+        "/tweets/likes/batch",
+        json={"actions": [
+            {"tweet_id": tweet_ids[0], "action": "like"},
+            {"tweet_id": tweet_ids[0], "action": "like"},
+            {"tweet_id": 999999, "action": "like"},
+            {"tweet_id": tweet_ids[1], "action": "like"},
+            {"tweet_id": tweet_ids[1], "action": "unlike"},
+        ]},
+        headers={"Api-Key": api_key},
+    )
+    assert liked.status_code == 200
+    assert [r["status"] for r in liked.json()["results"]] == ["ok", "unchanged", "not_found", "ok", "ok"]
+    like_counts = {t["id"]: t["like_count"] for t in client.get("/tweets/batch", params={"ids": tweet_ids}).json()["tweets"]}
+    assert like_counts == {tweet_ids[0]: 1, tweet_ids[1]: 0, tweet_ids[2]: 0}
+
+    followed = client.post(
+        "/users/follows/batch",
+        json={"actions": [
+            {"user_id": other_id, "action": "follow"},
+            {"user_id": me_id, "action": "follow"},
+            {"user_id": 999999, "action": "unfollow"},
+            {"user_id": other_id, "action": "follow"},
+        ]},
+        headers={"Api-Key": api_key},
+    )
+    assert [r["status"] for r in followed.json()["results"]] == ["ok", "invalid", "not_found", "unchanged"]
+    profile = client.get(f"/users/{other_id}", headers={"Api-Key": api_key}).json()["user"]
+    assert profile["followers_count"] == 1
+    # backfill تایم‌لاین مانند فالو تکی انجام می‌شود
+    assert _home_contents(api_key) == ["t2", "t1", "t0"]
+
+
+# T20: جستجوی متن کامل
+def test_full_text_search_is_ranked_paginated_and_synced():
+    """نتایج از ایندکس FTS می‌آیند، رتبه‌بندی و صفحه‌بندی می‌شوند و با حذف توییت به‌روز می‌مانند."""
+    api_key = register_user_and_get_api_key(TEST_USER)
+    headers = {"Api-Key": api_key}
+    contents = [
+        "python tips for fastapi",
+        "python python python everywhere",
+        "nothing relevant here",
+        "fastapi and sqlalchemy",
+        'weird "quoted" python -syntax OR NOT',
+    ]
+    ids = [
+        client.post("/tweets", json={"tweet_data": c, "tweet_media_ids": []}, headers=headers).json()["tweet_id"]
+        for c in contents
+    ]
+
+    first = client.get("/tweets/search", params={"q": "Python", "limit": 2}).json()
+    # تکرار بیشتر کلمه، رتبه بالاتر
+    assert first["tweets"][0]["id"] == ids[1]
+    second = client.get("/tweets/search", params={"q": "Python", "limit": 2, "cursor": first["next_cursor"]}).json()
+    assert second["next_cursor"] is None
+    found = [t["id"] for t in first["tweets"] + second["tweets"]]
+    assert sorted(found) == sorted([ids[0], ids[1], ids[4]])
+
+    both = client.get("/tweets/search", params={"q": "fastapi python"}).json()
+    assert [t["id"] for t in both["tweets"]] == [ids[0]]
+    # نحو FTS در ورودی کاربر خطا نمی‌دهد
+    assert client.get("/tweets/search", params={"q": '"-syntax OR'}).status_code == 200
+    assert client.get("/tweets/search", params={"q": "!!!"}).json()["tweets"] == []
+
+    client.delete(f"/tweets/{ids[1]}", headers=headers)
+    after = client.get("/tweets/search", params={"q": "python"}).json()
+    assert ids[1] not in [t["id"] for t in after["tweets"]]
+
+    # رتبه‌های برابر در مرز صفحه‌ها: هیچ نتیجه‌ای جا نمی‌افتد یا تکرار نمی‌شود
+    tied = [
+        client.post("/tweets", json={"tweet_data": "tied rank", "tweet_media_ids": []}, headers=headers).json()["tweet_id"]
+        for _ in range(5)
+    ]
+    seen, cursor = [], None
+    while True:
+        params = {"q": "tied", "limit": 2, **({"cursor": cursor} if cursor else {})}
+        page = client.get("/tweets/search", params=params).json()
+        assert page["tweets"]  # صفحه خالی با next_cursor قبلی = جا افتادن رتبه‌های برابر
+        seen.extend(t["id"] for t in page["tweets"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == sorted(tied, reverse=True)
+
+
+# T21: هشتگ‌ها، mentionها و trending
+def test_hashtags_mentions_and_trending():
+    """هشتگ‌ها هنگام نوشتن ایندکس می‌شوند؛ فیلتر tag و trending بدون اسکن توییت‌ها کار می‌کنند."""
+    api_key = register_user_and_get_api_key(TEST_USER)
+    headers = {"Api-Key": api_key}
+    contents = [
+        "#FastAPI is great #python",
+        "more #python and #python again, cc @TestUser2",
+        "mail me at a@b.com about c#sharp",
+        "#fastapi tips",
+    ]
+    ids = [
+        client.post("/tweets", json={"tweet_data": c, "tweet_media_ids": []}, headers=headers).json()["tweet_id"]
+        for c in contents
+    ]
+
+    db = TestingSessionLocal()
+    mentions = db.execute(select(models.TweetMention.tweet_id, models.TweetMention.name)).all()
+    tags = db.execute(select(models.TweetHashtag.tag).where(models.TweetHashtag.tweet_id == ids[2])).all()
+    db.close()
+    assert mentions == [(ids[1], "testuser2")]
+    assert tags == []
+
+    page = client.get("/tweets", params={"tag": "#FastAPI", "limit": 1}).json()
+    assert [t["id"] for t in page["tweets"]] == [ids[3]]
+    page = client.get("/tweets", params={"tag": "fastapi", "limit": 1, "cursor": page["next_cursor"]}).json()
+    assert [t["id"] for t in page["tweets"]] == [ids[0]]
+    assert page["next_cursor"] is None
+
+    # شمارنده‌ها تا flush بعدی فقط در حافظه هستند
+    assert client.get("/tweets/trending").json()["hashtags"] == []
+    flush_trending()
+    assert client.get("/tweets/trending").json()["hashtags"] == [
+        {"tag": "fastapi", "count": 2},
+        {"tag": "python", "count": 2},
+    ]
+    client.delete(f"/tweets/{ids[1]}", headers=headers)
+    flush_trending()
+    assert client.get("/tweets/trending", params={"limit": 1}).json()["hashtags"] == [{"tag": "fastapi", "count": 2}]
+    assert [t["id"] for t in client.get("/tweets", params={"tag": "python"}).json()["tweets"]] == [ids[0]]
+
+
+def test_trending_sums_shared_minute_buckets():
+    """trending سطل‌های hashtag_bucket را جمع می‌زند: سطل‌های دیگر workerها دیده و سطل‌های قدیمی کنار گذاشته می‌شوند."""
+    now = minute_of()
+    old = now - settings.TRENDING_WINDOW_MINUTES
+
+    # سطل‌هایی که پردازه دیگری (یا پیش از restart) نوشته است
+    db = TestingSessionLocal()
+    db.execute(insert(models.HashtagBucket), [
+        {"tag": "fresh", "minute": now, "count": 1},
+        {"tag": "fresh", "minute": now - 5, "count": 1},
+        {"tag": "stale", "minute": old, "count": 5},
+    ])
+    db.commit()
+    db.close()
+
+    assert client.get("/tweets/trending").json()["hashtags"] == [{"tag": "fresh", "count": 2}]
+
+    # flush افزایش‌ها را با UPSERT به سطل موجود اضافه و سطل‌های خارج از پنجره را حذف می‌کند
+    trending_buckets.add({("fresh", now): 2, ("other", now): 1})
+    flush_trending()
+    db = TestingSessionLocal()
+    buckets = db.execute(
+        select(models.HashtagBucket.tag, models.HashtagBucket.minute, models.HashtagBucket.count)
+        .order_by(models.HashtagBucket.tag, models.HashtagBucket.minute)
+    ).all()
+    db.close()
+    assert buckets == [("fresh", now - 5, 1), ("fresh", now, 3), ("other", now, 1)]
+    assert client.get("/tweets/trending").json()["hashtags"] == [
+        {"tag": "fresh", "count": 4},
+        {"tag": "other", "count": 1},
+    ]
+
+    # نتیجه تا پایان TTL از کش همین پردازه خوانده می‌شود
+    db = TestingSessionLocal()
+    db.execute(models.HashtagBucket.__table__.delete())
+    db.commit()
+    db.close()
+    assert client.get("/tweets/trending").json()["hashtags"][0] == {"tag": "fresh", "count": 4}
+    trending.clear()
+    assert client.get("/tweets/trending").json()["hashtags"] == []
+
+
+def test_trending_ignores_rolled_back_tweets():
+    """افزایش‌های تراکنشی که commit نشده به سطل‌ها نمی‌رسد."""
+    db = TestingSessionLocal()
+    hashtags.index_tweet(db, 1, "#lost", datetime.utcnow())
+    db.rollback()
+    db.close()
+    assert len(trending_buckets) == 0
+
+
+# T22: سنجه‌های درخواست و SQL
+def test_metrics_endpoint_reports_routes_and_queries():
+    """/metrics زمان پاسخ را با الگوی route و تعداد کوئری‌های هر درخواست گزارش می‌کند."""
+    registry.reset()
+    api_key = register_user_and_get_api_key(TEST_USER)
+    tweet_id = client.post("/tweets", json={"tweet_data": "metrics"}, headers={"Api-Key": api_key}).json()["tweet_id"]
+    client.get(f"/tweets/{tweet_id}/likes/missing")
+    assert client.post(f"/tweets/{tweet_id}/likes", headers={"Api-Key": api_key}).status_code == 200
+
+    route = (("route", "/tweets/{tweet_id}/likes"),)
+    assert registry.value("http_request_duration_seconds", (("method", "POST"),) + route + (("status", "200"),)) == 1
+    assert registry.value("db_queries_total", route) > 0
+    assert registry.value("http_request_duration_seconds", (("method", "GET"), ("route", "unmatched"), ("status", "404"))) == 1
+
+    body = client.get("/metrics").text
+    assert "# TYPE http_request_duration_seconds histogram" in body
+    assert 'http_request_duration_seconds_bucket{method="POST",route="/tweets/{tweet_id}/likes",status="200",le="+Inf"} 1' in body
+    assert 'db_queries_per_request_count{route="/tweets/{tweet_id}/likes"} 1' in body
+    assert f"/tweets/{tweet_id}/" not in body
+
+
+# T23: پروفایل SQL (کوئری کند، N+1 و سقف کوئری)
+def test_query_budget_detects_n_plus_one():
+    """query_budget تعداد کوئری‌ها و تکرار یک شکل کوئری را بررسی می‌کند."""
+    api_key = register_user_and_get_api_key(TEST_USER)
+    for i in range(4):
+        client.post("/tweets", json={"tweet_data": f"budget {i}"}, headers={"Api-Key": api_key})
+    feed_cache.clear()
+
+    with query_budget(max_queries=5, max_repeats=1) as profile:
+        assert client.get("/tweets").status_code == 200
+    assert 0 < profile.count <= 5
+
+    # بارگذاری lazy رابطه‌ها در حلقه: یک کوئری تکراری برای هر توییت
+    with pytest.raises(QueryBudgetExceeded, match="executed 4 times"):
+        with query_budget(max_repeats=2) as profile:
+            db = TestingSessionLocal()
+            for tweet in db.execute(select(models.Tweet)).scalars():
+                tweet.likes
+            db.close()
+    assert len(profile.repeated()) == 1
+
+
+def test_route_query_budget_and_slow_query_log(monkeypatch, caplog):
+    """سقف اعلام شده route در حالت strict خطا می‌دهد و کوئری‌های کند با route و پارامترها لاگ می‌شوند."""
+    from src.api import tweet as tweet_module
+
+    api_key = register_user_and_get_api_key(TEST_USER)
+    client.post("/tweets", json={"tweet_data": "slow"}, headers={"Api-Key": api_key})
+    feed_cache.clear()
+
+    monkeypatch.setattr(settings, "SQL_SLOW_QUERY_MS", 1e-9)
+    with caplog.at_level("WARNING", logger="src.core.profiling"):
+        client.get("/tweets", params={"limit": 7})
+    slow = [r.getMessage() for r in caplog.records if "slow query" in r.getMessage()]
+    assert slow and all("on /tweets:" in message for message in slow)
+    assert any("8" in message.split("parameters=")[1] for message in slow)
+
+    monkeypatch.setattr(settings, "SQL_SLOW_QUERY_MS", 0)
+    monkeypatch.setattr(settings, "SQL_PROFILING_STRICT", True)
+    monkeypatch.setattr(tweet_module.FEED_QUERY_BUDGET, "max_queries", 1)
+    feed_cache.clear()
+    with pytest.raises(QueryBudgetExceeded, match="/tweets: query budget of 1 exceeded"):
+        client.get("/tweets")
+    assert registry.value("db_query_budget_exceeded_total", (("route", "/tweets"),)) >= 1
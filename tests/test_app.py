@@ -0,0 +1,75 @@
+# tests/test_app.py
+# create_app(settings): هر برنامه تنظیمات، پایگاه داده، کش‌ها و storage خودش را دارد
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+
+from src.core.cache import feed_cache
+from src.core.config import Settings, settings, use_settings
+from src.core.derivatives import variants
+from src.core.storage import media_storage
+from src.db.base import Base
+from src.main import create_app
+
+USER = {"name": "Factory", "email": "factory@example.com", "password": "factory-password"}
+
+
+def _create_app(tmp_path, name, **overrides):
+    url = f"sqlite:///{tmp_path / name}.db"
+    engine = create_engine(url)
+    Base.metadata.create_all(bind=engine)
+    engine.dispose()
+    return create_app(Settings(
+        SQLALCHEMY_DATABASE_URL=url,
+        MEDIA_ROOT=str(tmp_path / f"{name}_media"),
+        PASSWORD_BCRYPT_ROUNDS=4,
+        **overrides,
+    ))
+
+
+def _api_key(client):
+    assert client.post("/auth/register", json=USER).status_code == 200
+    token = client.post(
+        "/auth/access-token", data={"username": USER["email"], "password": USER["password"]}
+    ).json()["access_token"]
+    return client.get("/users/me", headers={"Authorization": f"Bearer {token}"}).json()["user"]["api_key"]
+
+
+def test_apps_with_different_settings_are_isolated(tmp_path):
+    """دو برنامه با تنظیمات متفاوت در یک پردازه: هر کدام مطابق تنظیمات خودش رفتار می‌کند."""
+    defaults = settings.model_dump()
+    app_a = _create_app(
+        tmp_path, "a", BATCH_MAX_ITEMS=1, FEED_CACHE_BACKEND="none", FEED_CACHE_TTL_SECONDS=1.0,
+        MEDIA_THUMBNAIL_SIZE=99,
+    )
+    app_b = _create_app(tmp_path, "b")
+
+    with TestClient(app_a) as client_a, TestClient(app_b) as client_b:
+        api_key = _api_key(client_a)
+        headers = {"Api-Key": api_key}
+        # پایگاه داده جداگانه: کاربر برنامه a در برنامه b وجود ندارد
+        assert client_a.get("/users/me", headers=headers).status_code == 200
+        assert client_b.get("/users/me", headers=headers).status_code == 401
+
+        # سقف endpointهای دسته‌ای از تنظیمات همان برنامه خوانده می‌شود
+        ids = {"ids": [1, 2]}
+        assert client_a.get("/tweets/batch", params=ids).status_code == 422
+        assert client_b.get("/tweets/batch", params=ids).status_code == 200
+
+        # رسانه زیر MEDIA_ROOT برنامه a ذخیره می‌شود
+        response = client_a.post(
+            "/medias", files={"file": ("a.bin", b"app a bytes", "application/octet-stream")}, headers=headers
+        )
+        assert response.status_code == 200
+        assert [p for p in (tmp_path / "a_media").rglob("*") if p.is_file()]
+        assert not [p for p in (tmp_path / "b_media").rglob("*") if p.is_file()]
+
+    a, b = app_a.state.settings, app_b.state.settings
+    assert media_storage.resolve(a).root != media_storage.resolve(b).root
+    assert feed_cache.resolve(a).backend is None and feed_cache.resolve(a).ttl == 1.0
+    assert feed_cache.resolve(b).backend is not None and feed_cache.resolve(b).ttl == b.FEED_CACHE_TTL_SECONDS
+    with use_settings(a):
+        assert variants()["thumb"] == 99
+    # تنظیمات مشترک (بیرون از برنامه‌ها) تغییر نکرده است
+    assert settings.model_dump() == defaults
+    assert variants()["thumb"] == defaults["MEDIA_THUMBNAIL_SIZE"]
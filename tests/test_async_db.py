@@ -0,0 +1,91 @@
+# tests/test_async_db.py
+# اجرای همان مسیرها روی AsyncSession (aiosqlite) به جای Session همگام
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from src.api.deps import token_cache
+from src.core.auth_cache import api_key_cache, user_principals
+from src.core.cache import feed_cache
+from src.db.base import Base
+from src.db.session import get_db
+from src.main import app
+
+DATABASE_FILE = "./test_async.db"
+
+
+@pytest.fixture()
+def async_client():
+    """کلاینتی که get_db آن یک AsyncSession روی aiosqlite برمی‌گرداند"""
+    sync_engine = create_engine(f"sqlite:///{DATABASE_FILE}")
+    Base.metadata.drop_all(bind=sync_engine)
+    Base.metadata.create_all(bind=sync_engine)
+    sync_engine.dispose()
+
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{DATABASE_FILE}")
+    AsyncTestingSessionLocal = async_sessionmaker(
+        async_engine, autoflush=False, expire_on_commit=False
+    )
+
+    async def override_get_async_db():
+        async with AsyncTestingSessionLocal() as db:
+            yield db
+
+    previous_override = app.dependency_overrides.get(get_db)
+    app.dependency_overrides[get_db] = override_get_async_db
+    caches = (feed_cache, api_key_cache, token_cache, user_principals)
+    for cache in caches:
+        cache.clear()
+    try:
+        with TestClient(app) as client:
+            yield client
+    finally:
+        if previous_override is None:
+            app.dependency_overrides.pop(get_db, None)
+        else:
+            app.dependency_overrides[get_db] = previous_override
+        for cache in caches:
+            cache.clear()
+
+
+def _register(client: TestClient, name: str, email: str) -> str:
+    assert client.post(
+        "/auth/register",
+        json={"name": name, "email": email, "password": "secret"},
+    ).status_code == 200
+    token = client.post(
+        "/auth/access-token", data={"username": email, "password": "secret"}
+    ).json()["access_token"]
+    me = client.get("/users/me", headers={"Authorization": f"Bearer {token}"})
+    assert me.status_code == 200
+    return me.json()["user"]["api_key"]
+
+
+def test_routes_on_async_session(async_client):
+    """ثبت نام، توییت، لایک، فالو و فید با AsyncSession"""
+    key1 = _register(async_client, "Async1", "async1@example.com")
+    key2 = _register(async_client, "Async2", "async2@example.com")
+    user2_id = async_client.get("/users/me", headers={"Api-Key": key2}).json()["user"]["id"]
+
+    assert async_client.post(f"/users/{user2_id}/follow", headers={"Api-Key": key1}).status_code == 200
+    tweet_id = async_client.post(
+        "/tweets", json={"tweet_data": "async tweet"}, headers={"Api-Key": key2}
+    ).json()["tweet_id"]
+    assert async_client.post(f"/tweets/{tweet_id}/likes", headers={"Api-Key": key1}).status_code == 200
+
+    feed = async_client.get("/tweets").json()["tweets"]
+    assert feed[0]["content"] == "async tweet"
+    assert feed[0]["likes"][0]["name"] == "Async1"
+
+    home = async_client.get("/tweets/home", headers={"Api-Key": key1}).json()["tweets"]
+    assert [t["id"] for t in home] == [tweet_id]
+
+    profile = async_client.get(f"/users/{user2_id}", headers={"Api-Key": key1}).json()
+    assert profile["user"]["followers_count"] == 1
+    followers = async_client.get(f"/users/{user2_id}/followers", headers={"Api-Key": key1}).json()
+    assert followers["users"][0]["name"] == "Async1"
+
+    assert async_client.delete(f"/tweets/{tweet_id}", headers={"Api-Key": key2}).status_code == 200
+    assert async_client.get("/tweets").json()["tweets"] == []
@@ -0,0 +1,95 @@
+# tests/test_benchmarks.py
+
+import asyncio
+import subprocess
+import sys
+
+from sqlalchemy import create_engine, func, select, text
+
+from benchmarks import load, report, startup
+from benchmarks.dataset import DatasetConfig, generate
+from src.db import models
+from src.db.session import get_db
+from src.main import app
+
+
+def _snapshot(engine):
+    with engine.connect() as conn:
+        return (
+            conn.execute(select(models.Tweet.id, models.Tweet.content, models.Tweet.like_count)).all(),
+            conn.execute(select(models.follows_table.c.follower_id, models.follows_table.c.followed_id)).all(),
+        )
+
+
+def test_dataset_is_reproducible_and_consistent(tmp_path):
+    """با seed یکسان داده یکسان ساخته می‌شود و شمارنده‌ها با سطرها سازگارند."""
+    config = DatasetConfig(users=120, seed=7)
+    first = create_engine(f"sqlite:///{tmp_path / 'a.db'}")
+    second = create_engine(f"sqlite:///{tmp_path / 'b.db'}")
+    counts = generate(first, config)
+    assert generate(second, config) == counts
+    assert _snapshot(first) == _snapshot(second)
+
+    with first.connect() as conn:
+        followers = dict(conn.execute(
+            select(models.follows_table.c.followed_id, func.count())
+            .group_by(models.follows_table.c.followed_id)
+        ).all())
+        users = conn.execute(select(models.User.id, models.User.followers_count)).all()
+        assert all(followers.get(user_id, 0) == count for user_id, count in users)
+        # توزیع توانی: محبوب‌ترین کاربر بسیار بیشتر از میانه دنبال‌کننده دارد
+        ordered = sorted(count for _, count in users)
+        assert ordered[-1] > 5 * max(1, ordered[len(ordered) // 2])
+
+        likes = conn.execute(select(func.count()).select_from(models.likes_table)).scalar_one()
+        assert conn.execute(select(func.sum(models.Tweet.like_count))).scalar_one() == likes == counts["likes"]
+        # ایندکس FTS5 توسط triggerها پر شده است
+        fts = conn.execute(text("SELECT count(*) FROM tweet_fts WHERE tweet_fts MATCH 'feed'")).scalar_one()
+        assert fts == conn.execute(
+            select(func.count()).where(models.Tweet.content.like("%feed%"))
+        ).scalar_one()
+
+
+def test_load_scenarios_report_percentiles(tmp_path, monkeypatch):
+    """سناریوها درون پردازه اجرا می‌شوند و گزارش هر endpoint صدک‌ها و rps دارد."""
+    url = f"sqlite:///{tmp_path / 'bench.db'}"
+    generate(create_engine(url), DatasetConfig(users=60, seed=3))
+    monkeypatch.setattr(app, "dependency_overrides", {get_db: app.dependency_overrides.get(get_db)})
+    accounts, hot_tweets = load.load_accounts(url)
+
+    async def scenario(name):
+        async with load.in_process_client(url) as client:
+            return await load.run(client, accounts, hot_tweets, name, concurrency=2, duration=30, max_operations=6)
+
+    for name in ("feed", "home", "like_storm", "follow_churn", "search"):
+        endpoints = asyncio.run(scenario(name))["endpoints"]
+        assert endpoints["TOTAL"]["errors"] == 0
+        assert endpoints["TOTAL"]["count"] >= 6
+        assert endpoints["TOTAL"]["p50_ms"] <= endpoints["TOTAL"]["p99_ms"]
+
+    table = report.format_table(endpoints, baseline=endpoints)
+    assert "GET /tweets/search" in table and "p95_ms +0.0%" in table
+    assert report.percentile([1, 2, 3, 4], 50) == 2 and report.percentile([1, 2, 3, 4], 99) == 4
+
+
+LAZY_IMPORT_CHECK = """
+import sys
+import src.main
+assert "src.api.router" not in sys.modules and "src.db.session" not in sys.modules
+app = src.main.create_app()
+from src.db import session
+assert session.engines.primary is None and "/tweets" in app.openapi()["paths"]
+"""
+
+
+def test_cold_start_is_lazy_and_benchmark_reports_phases(tmp_path):
+    """import برنامه روترها و engine نمی‌سازد؛ benchmark زمان هر مرحله راه‌اندازی را گزارش می‌کند."""
+    subprocess.run([sys.executable, "-c", LAZY_IMPORT_CHECK], check=True)
+
+    url = f"sqlite:///{tmp_path / 'startup.db'}"
+    generate(create_engine(url), DatasetConfig(users=20, seed=5))
+    phases = startup.measure(runs=1, paths=["/", "/tweets"], database_url=url)["endpoints"]
+    assert set(phases) == {
+        "import src.main", "create_app", "startup", "first GET /", "first GET /tweets", "cold start",
+    }
+    assert all(stats["count"] == 1 and stats["errors"] == 0 for stats in phases.values())
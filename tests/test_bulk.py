@@ -0,0 +1,105 @@
+# tests/test_bulk.py
+
+import json
+
+import pytest
+from sqlalchemy import create_engine, func, select, text
+
+from src.db import models
+from src.db.base import Base
+from src.db.bulk import export_file, import_file, rebuild_timeline
+from src.utils import get_password_hash
+
+
+def _engine(path):
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+
+def _write(path, lines):
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return str(path)
+
+
+def test_bulk_import_maintains_derived_data_and_round_trips(tmp_path):
+    """import دسته‌ای شمارنده‌ها، هشتگ‌ها، FTS و تایم‌لاین را به‌روز می‌کند و export/import برگشت‌پذیر است."""
+    engine = _engine(tmp_path / "a.db")
+    hashed = get_password_hash("secret")
+    users = _write(tmp_path / "users.ndjson", [
+        json.dumps({"id": i, "name": f"u{i}", "email": f"u{i}@example.com", "hashed_password": hashed})
+        for i in (1, 2, 3)
+    ])
+    follows = _write(tmp_path / "follows.csv", ["follower_id,followed_id,created_at", "2,1,", "3,1,2024-05-01T10:00:00"])
+    tweets = _write(tmp_path / "tweets.ndjson", [
+        json.dumps({"id": 1, "content": "hello #Bulk world @u2", "author_id": 1, "created_at": "2024-06-01T12:00:00"}),
+        json.dumps({"id": 2, "content": "bulk import, no tags", "author_id": 2}),
+    ])
+    likes = _write(tmp_path / "likes.csv", ["user_id,tweet_id", "2,1", "3,1", "1,2"])
+
+    assert import_file(engine, "users", users, batch_size=2) == 3
+    assert import_file(engine, "follows", follows) == 2
+    assert import_file(engine, "tweets", tweets, batch_size=1) == 2
+    assert import_file(engine, "likes", likes) == 3
+
+    with engine.connect() as conn:
+        counts = dict(conn.execute(select(models.User.id, models.User.followers_count)).all())
+        assert counts == {1: 2, 2: 0, 3: 0}
+        assert dict(conn.execute(select(models.Tweet.id, models.Tweet.like_count)).all()) == {1: 2, 2: 1}
+        assert conn.execute(select(models.TweetHashtag.tag)).scalars().all() == ["bulk"]
+        assert conn.execute(select(models.TweetMention.name)).scalars().all() == ["u2"]
+        assert conn.execute(text("SELECT rowid FROM tweet_fts WHERE tweet_fts MATCH 'bulk'")).scalars().all() == [1, 2]
+        timeline = conn.execute(
+            select(models.TimelineEntry.user_id, models.TimelineEntry.tweet_id).order_by("user_id", "tweet_id")
+        ).all()
+        assert timeline == [(1, 1), (2, 1), (2, 2), (3, 1)]
+
+    with engine.begin() as conn:
+        conn.execute(models.TimelineEntry.__table__.delete())
+    rebuild_timeline(engine)
+    with engine.connect() as conn:
+        assert conn.execute(select(func.count()).select_from(models.TimelineEntry)).scalar_one() == 4
+
+    # export و import دوباره در پایگاه داده خالی
+    copy = _engine(tmp_path / "b.db")
+    for name, ext in (("users", "csv"), ("follows", "ndjson"), ("tweets", "csv"), ("likes", "ndjson")):
+        path = str(tmp_path / f"export_{name}.{ext}")
+        exported = export_file(engine, name, path)
+        assert import_file(copy, name, path) == exported
+    for table in (models.User.__table__, models.Tweet.__table__, models.follows_table, models.likes_table):
+        query = select(table).order_by(*table.primary_key.columns)
+        with engine.connect() as a, copy.connect() as b:
+            assert a.execute(query).all() == b.execute(query).all()
+
+
+def test_bulk_import_requires_prehashed_passwords(tmp_path):
+    engine = _engine(tmp_path / "a.db")
+    users = _write(tmp_path / "users.csv", ["name,email,password", "u,u@example.com,plain"])
+    with pytest.raises(ValueError, match="hashed_password"):
+        import_file(engine, "users", users)
+    with engine.connect() as conn:
+        assert conn.execute(select(func.count()).select_from(models.User)).scalar_one() == 0
+
+
+def test_bulk_import_fills_defaults_for_heterogeneous_rows(tmp_path):
+    """ستون‌ها از مدل گرفته می‌شوند، نه از اولین سطر: کلیدهای سطرهای بعدی حذف نمی‌شوند و کلیدهای غایب پیش‌فرض می‌گیرند."""
+    engine = _engine(tmp_path / "a.db")
+    hashed = get_password_hash("secret")
+    users = _write(tmp_path / "users.ndjson", [
+        json.dumps({"id": 1, "name": "u1", "email": "u1@example.com", "hashed_password": hashed}),
+        json.dumps({"id": 2, "name": "u2", "email": "u2@example.com", "hashed_password": hashed,
+                    "is_superuser": True, "token_version": 3}),
+        json.dumps({"name": "u3", "email": "u3@example.com", "hashed_password": hashed, "is_active": False}),
+    ])
+    media = _write(tmp_path / "media.csv", ["id,file_path,ref_count", "1,a.png,", "2,b.png,4"])
+
+    assert import_file(engine, "users", users) == 3
+    assert import_file(engine, "media", media) == 2
+
+    user = models.User.__table__
+    with engine.connect() as conn:
+        rows = conn.execute(
+            select(user.c.id, user.c.is_active, user.c.is_superuser, user.c.token_version).order_by(user.c.id)
+        ).all()
+        assert rows == [(1, True, False, 0), (2, True, True, 3), (3, False, False, 0)]
+        assert dict(conn.execute(select(models.Media.id, models.Media.ref_count)).all()) == {1: 1, 2: 4}
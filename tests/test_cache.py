@@ -0,0 +1,87 @@
+# tests/test_cache.py
+
+import time
+
+from src.core.cache import FeedCache, LRUCacheBackend, RedisCacheBackend
+
+
+class LocalRedisStandIn:
+    """جایگزین محلی حداقلی برای کلاینت redis (فقط دستورات مورد استفاده)"""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    def mget(self, keys):
+        return [self.data.get(key) for key in keys]
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    def incr(self, key):
+        self.data[key] = int(self.data.get(key, 0)) + 1
+        return self.data[key]
+
+    def sadd(self, key, member):
+        self.data.setdefault(key, set()).add(member)
+
+    def smembers(self, key):
+        return set(self.data.get(key, set()))
+
+    def expire(self, key, seconds):
+        pass
+
+
+def test_lru_eviction_and_ttl():
+    """قدیمی‌ترین کلید استفاده‌نشده حذف می‌شود و کلیدهای منقضی برگردانده نمی‌شوند."""
+    backend = LRUCacheBackend(max_entries=2)
+    backend.set("a", b"1", ttl=60)
+    backend.set("b", b"2", ttl=60)
+    assert backend.get("a") == b"1"  # a تازه‌تر از b می‌شود
+    backend.set("c", b"3", ttl=60)
+    assert backend.get("b") is None
+    assert backend.get("a") == b"1"
+
+    backend.set("short", b"x", ttl=0.01)
+    time.sleep(0.02)
+    assert backend.get("short") is None
+
+
+def test_tag_invalidation_on_both_backends():
+    """ابطال برچسب فقط صفحات حاوی توییت را حذف می‌کند و نسخه head را جلو می‌برد."""
+    for backend in (LRUCacheBackend(), RedisCacheBackend(LocalRedisStandIn())):
+        cache = FeedCache(backend, ttl=60)
+        head_key = cache.page_key(20, None)
+        cache.set_page(head_key, b"head", [1, 2])
+        cache.set_page(cache.page_key(20, "c"), b"older", [3])
+
+        cache.tweet_changed(2)
+        assert cache.get_page(head_key) is None
+        assert cache.get_page(cache.page_key(20, "c")) == b"older"
+
+        cache.tweet_created()
+        assert cache.page_key(20, None) != head_key
+        assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_read_started_before_invalidation_is_not_cached():
+    """صفحه‌ای که خواندنش پیش از ابطال یکی از توییت‌هایش شروع شده ذخیره نمی‌شود."""
+    for backend in (LRUCacheBackend(), RedisCacheBackend(LocalRedisStandIn())):
+        cache = FeedCache(backend, ttl=60)
+        key = cache.page_key(20, "c")
+        since = cache.generation()
+        cache.tweet_changed(2)  # لایک همزمان با خواندن صفحه از پایگاه داده
+        cache.set_page(key, b"stale", [1, 2], since=since)
+        assert cache.get_page(key) is None
+
+        # ابطال توییت‌های دیگر مانع ذخیره نمی‌شود
+        since = cache.generation()
+        cache.tweet_changed(9)
+        cache.set_page(key, b"fresh", [1, 2], since=since)
+        assert cache.get_page(key) == b"fresh"
@@ -0,0 +1,67 @@
+# tests/test_pool.py
+
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from src.core.config import settings
+from src.db.pool import InstrumentedQueuePool, instrument_engine, pool_stats
+from src.main import app, create_app
+
+
+@pytest.fixture()
+def pool_engine():
+    engine = create_engine(
+        "sqlite:///./test_pool.db",
+        poolclass=InstrumentedQueuePool,
+        pool_size=1,
+        max_overflow=1,
+        pool_timeout=0.1,
+    )
+    stats = instrument_engine(engine, "test_pool")
+    yield engine, stats
+    pool_stats.pop("test_pool", None)
+    engine.dispose()
+
+
+def test_pool_occupancy_overflow_and_timeouts(pool_engine):
+    """اشغال pool، استفاده از overflow و timeout ها ثبت می‌شوند."""
+    engine, stats = pool_engine
+    first = engine.connect()
+    second = engine.connect()  # از overflow
+    assert stats.snapshot()["checked_out"] == 2
+    assert stats.snapshot()["overflow_checkouts"] == 1
+
+    with pytest.raises(PoolTimeoutError):
+        engine.connect()
+
+    # اتصال آزاد شده توسط نخ دیگر، انتظار checkout را پایان می‌دهد
+    timer = threading.Timer(0.05, second.close)
+    timer.start()
+    third = engine.connect()
+    third.execute(text("select 1"))
+    third.close()
+    first.close()
+
+    snapshot = stats.snapshot()
+    assert snapshot["timeouts"] == 1
+    assert snapshot["checkouts"] == 3
+    assert snapshot["checked_out"] == 0
+    assert snapshot["peak_checked_out"] == 2
+    assert snapshot["wait_max_ms"] > 0
+
+
+def test_pool_stats_endpoint(pool_engine):
+    engine, _ = pool_engine
+    with engine.connect():
+        response = TestClient(app).get("/internal/pool")
+    assert response.status_code == 200
+    assert response.json()["pools"]["test_pool"]["checked_out"] == 1
+
+
+def test_internal_endpoints_are_off_by_default(monkeypatch):
+    monkeypatch.setattr(settings, "INTERNAL_ENDPOINTS_ENABLED", False)
+    assert TestClient(create_app()).get("/internal/pool").status_code == 404
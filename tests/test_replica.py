@@ -0,0 +1,128 @@
+# tests/test_replica.py
+# مسیریابی خواندن‌ها به replica با دو فایل SQLite به جای primary و replica
+
+import hashlib
+import sqlite3
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.api.deps import token_cache
+from src.core.auth_cache import api_key_cache, user_principals
+from src.core.cache import feed_cache
+from src.db.base import Base
+from src.db.replica import ReplicaRouter, client_keys
+from src.db.session import get_db, routed_sync_db
+from src.main import app
+
+USER = {"name": "Replica", "email": "replica@example.com", "password": "replica-password"}
+
+
+def _sessionmaker(url):
+    engine = create_engine(url, connect_args={"check_same_thread": False})
+    return engine, sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture()
+def cluster(tmp_path, monkeypatch):
+    """primary و replica (بدون تکثیر خودکار)؛ replicate() وضعیت primary را کپی می‌کند"""
+    primary_path, replica_path = tmp_path / "primary.db", tmp_path / "replica.db"
+    primary_engine, primary = _sessionmaker(f"sqlite:///{primary_path}")
+    replica_engine, replica = _sessionmaker(f"sqlite:///{replica_path}")
+    Base.metadata.create_all(bind=primary_engine)
+    Base.metadata.create_all(bind=replica_engine)
+
+    def replicate():
+        source, target = sqlite3.connect(primary_path), sqlite3.connect(replica_path)
+        source.backup(target)
+        source.close()
+        target.close()
+
+    lag = [0.0]
+    router = ReplicaRouter(
+        sticky_seconds=0.3, max_lag_seconds=1.0, check_interval=0.0, retry_seconds=60.0,
+        lag_probe=lambda db: lag[0],
+    )
+    monkeypatch.setitem(app.dependency_overrides, get_db, routed_sync_db(primary, replica, router))
+    monkeypatch.setattr(feed_cache, "backend", None)
+    caches = (api_key_cache, token_cache, user_principals)
+    for cache in caches:
+        cache.clear()
+    try:
+        with TestClient(app) as client:
+            yield client, router, replicate, lag
+    finally:
+        for cache in caches:
+            cache.clear()
+        primary_engine.dispose()
+        replica_engine.dispose()
+
+
+def _register(client):
+    assert client.post("/auth/register", json=USER).status_code == 200
+    token = client.post(
+        "/auth/access-token", data={"username": USER["email"], "password": USER["password"]}
+    ).json()["access_token"]
+    return client.get("/users/me", headers={"Authorization": f"Bearer {token}"}).json()["user"]["api_key"]
+
+
+def _feed(client, **headers):
+    return [t["content"] for t in client.get("/tweets", headers=headers).json()["tweets"]]
+
+
+def test_reads_go_to_replica_with_read_your_writes(cluster):
+    client, router, replicate, lag = cluster
+    # توکن صادر شده در ورود هم sticky است: /users/me با توکن تازه از primary خوانده می‌شود
+    api_key = _register(client)
+    replicate()
+    time.sleep(0.35)
+    # کلاینت دیگری پشت همان آدرس (NAT/proxy) در پنجره نویسنده قرار نمی‌گیرد
+    reader = TestClient(app)
+
+    assert client.post("/tweets", json={"tweet_data": "fresh"}, headers={"Api-Key": api_key}).status_code == 200
+    # نویسنده در پنجره sticky از primary می‌خواند؛ بقیه از replica عقب‌مانده
+    assert _feed(client, **{"Api-Key": api_key}) == ["fresh"]
+    assert _feed(reader) == []
+    stats = router.stats()
+    assert stats["replica_reads"] == 1 and stats["primary_reads"] == 2 and stats["fallbacks"] == 0
+
+    # پس از پایان پنجره، نویسنده هم از replica می‌خواند
+    time.sleep(0.35)
+    assert _feed(client, **{"Api-Key": api_key}) == []
+    replicate()
+    assert _feed(reader) == ["fresh"]
+
+    # تأخیر بیش از حد: بازگشت به primary برای retry_seconds
+    client.post("/tweets", json={"tweet_data": "second"}, headers={"Api-Key": api_key})
+    lag[0] = 5.0
+    assert _feed(reader) == ["second", "fresh"]
+    lag[0] = 0.0
+    assert _feed(reader) == ["second", "fresh"]
+    assert router.stats()["fallbacks"] == 2 and router.stats()["lag_seconds"] == 5.0
+
+
+def test_unreachable_replica_falls_back_to_primary(tmp_path, monkeypatch):
+    _, primary = _sessionmaker(f"sqlite:///{tmp_path / 'primary.db'}")
+    Base.metadata.create_all(bind=primary.kw["bind"])
+    _, replica = _sessionmaker(f"sqlite:///{tmp_path / 'missing' / 'replica.db'}")
+    router = ReplicaRouter(sticky_seconds=5.0, max_lag_seconds=1.0, check_interval=0.0, retry_seconds=60.0)
+    monkeypatch.setitem(app.dependency_overrides, get_db, routed_sync_db(primary, replica, router))
+    monkeypatch.setattr(feed_cache, "backend", None)
+
+    with TestClient(app) as client:
+        assert client.get("/tweets").status_code == 200
+        assert client.get("/tweets").status_code == 200
+    stats = router.stats()
+    assert stats["available"] is False
+    assert stats["fallbacks"] == 2 and stats["replica_reads"] == 0
+
+
+def test_client_keys_hash_credentials_only():
+    """کلیدهای sticky فقط digest اعتبارنامه‌ها هستند (بدون آدرس و بدون مقدار خام)"""
+    digest = lambda value: hashlib.sha256(value.encode()).hexdigest()
+    assert client_keys({"api-key": "key"}) == (digest("key"),)
+    assert client_keys({"authorization": "Bearer token"}, issued=("new-token",)) == (digest("token"), digest("new-token"))
+    assert client_keys({}) == ()
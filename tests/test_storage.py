@@ -0,0 +1,110 @@
+# tests/test_storage.py
+
+import hashlib
+import io
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from src.core.storage import LocalStorage, ObjectStoreStorage, shard_key
+from src.db import models
+from src.db.base import Base
+from src.db.reshard_media import reshard_media
+
+
+class NoSuchKey(Exception):
+    """خطای کلید ناموجود با همان شکل ClientError در boto3"""
+
+    def __init__(self):
+        super().__init__("NoSuchKey")
+        self.response = {"Error": {"Code": "404"}}
+
+
+class LocalObjectStoreStandIn:
+    """جایگزین محلی حداقلی برای کلاینت S3 (فقط متدهای مورد استفاده)"""
+
+    def __init__(self):
+        self.objects = {}
+        self.puts = 0
+
+    def put_object(self, Bucket, Key, Body):
+        self.puts += 1
+        self.objects[(Bucket, Key)] = Body.read()
+
+    def get_object(self, Bucket, Key):
+        if (Bucket, Key) not in self.objects:
+            raise NoSuchKey()
+        return {"Body": io.BytesIO(self.objects[(Bucket, Key)])}
+
+    def head_object(self, Bucket, Key):
+        if (Bucket, Key) not in self.objects:
+            raise NoSuchKey()
+        return {"ContentLength": len(self.objects[(Bucket, Key)])}
+
+    def delete_object(self, Bucket, Key):
+        self.objects.pop((Bucket, Key), None)
+
+
+def _temp_file(tmp_path, name: str, content: bytes) -> str:
+    path = tmp_path / name
+    path.write_bytes(content)
+    return str(path)
+
+
+def test_local_and_object_store_backends_share_semantics(tmp_path):
+    """put_file فایل موقت را مصرف می‌کند و محتوای تکراری دوباره نوشته نمی‌شود."""
+    client = LocalObjectStoreStandIn()
+    backends = [
+        LocalStorage(str(tmp_path / "root")),
+        ObjectStoreStorage(client, "media", prefix="m/"),
+    ]
+    key = shard_key(hashlib.sha256(b"blob").hexdigest())
+    for backend in backends:
+        assert not backend.exists(key)
+        for i in range(2):
+            temp = _temp_file(tmp_path, f"upload-{i}", b"blob")
+            backend.put_file(key, temp)
+            assert not (tmp_path / f"upload-{i}").exists()
+        assert backend.exists(key)
+        with backend.open(key) as body:
+            assert body.read() == b"blob"
+        backend.delete(key)
+        assert not backend.exists(key)
+
+    assert client.puts == 1
+    assert backends[0].local_path(key) == str(tmp_path / "root" / key)
+    assert backends[1].local_path(key) is None
+
+
+def test_reshard_moves_legacy_files_and_merges_duplicates(tmp_path):
+    """فایل‌های پوشه تخت قدیمی sharded می‌شوند و سطرهای هم‌محتوا ادغام می‌شوند."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'reshard.db'}")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+
+    root = tmp_path / "media"
+    root.mkdir()
+    author = models.User(name="a", email="a@example.com", hashed_password="x", api_key="k")
+    first = models.Media(file_path=_temp_file(root, "1_100.png", b"same"), file_type="image/png")
+    second = models.Media(file_path=_temp_file(root, "1_200.png", b"same"), file_type="image/png")
+    other = models.Media(file_path=_temp_file(root, "2_300.png", b"other"), file_type="image/png")
+    tweet = models.Tweet(content="t", author=author, attachments=[second])
+    db.add_all([author, first, second, other, tweet])
+    db.commit()
+
+    storage = LocalStorage(str(root))
+    assert reshard_media(db, storage, batch_size=2, dry_run=True) == {"moved": 2, "merged": 1, "missing": 0}
+    assert reshard_media(db, storage, batch_size=2) == {"moved": 2, "merged": 1, "missing": 0}
+    assert reshard_media(db, storage) == {"moved": 0, "merged": 0, "missing": 0}
+
+    rows = db.execute(select(models.Media).order_by(models.Media.id)).scalars().all()
+    same_key = shard_key(hashlib.sha256(b"same").hexdigest())
+    assert [(m.file_path, m.ref_count) for m in rows] == [
+        (same_key, 2),
+        (shard_key(hashlib.sha256(b"other").hexdigest()), 1),
+    ]
+    db.refresh(tweet)
+    assert [m.id for m in tweet.attachments] == [rows[0].id]
+    files = sorted(p.relative_to(root).as_posix() for p in root.rglob("*") if p.is_file())
+    assert files == sorted(m.file_path for m in rows)
+    db.close()